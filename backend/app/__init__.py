@@ -6,8 +6,30 @@ import os
 # Crear instancia global de SQLAlchemy
 db = SQLAlchemy()
 
-def create_app():
-    """Factory function para crear la aplicación Flask"""
+def _opciones_engine(uri):
+    """Opciones del pool de conexiones, configurables por variables de entorno"""
+    opciones = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        # Los errores de la base no copian los valores de la fila (PII) a logs y respuestas
+        'hide_parameters': True,
+    }
+    
+    # SQLite no usa QueuePool: tamaño y overflow solo aplican a servidores
+    if uri and not uri.startswith('sqlite'):
+        opciones.update({
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        })
+    return opciones
+
+def create_app(crear_tablas=True):
+    """Factory function para crear la aplicación Flask.
+    
+    En producción (wsgi.py) se llama con crear_tablas=False: el esquema se
+    crea una vez en el despliegue con `flask crear-tablas`, no en cada worker.
+    """
     
     # Crear instancia de Flask
     app = Flask(__name__)
@@ -15,7 +37,25 @@ def create_app():
     # Configuración
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or os.getenv('SQLALCHEMY_DATABASE_URI')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _opciones_engine(app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+    app.config['ESTADISTICAS_TTL'] = int(os.getenv('ESTADISTICAS_TTL', '30'))
+    app.config['TESELAS_TTL'] = int(os.getenv('TESELAS_TTL', '300'))
+    app.config['MODELO_TTL'] = int(os.getenv('MODELO_TTL', '30'))
+    app.config['SERIES_TTL'] = int(os.getenv('SERIES_TTL', '3600'))
+    app.config['PRONOSTICOS_DIR'] = os.getenv('PRONOSTICOS_DIR') or os.path.join(app.instance_path, 'pronosticos')
+    app.config['CAMBIOS_SONDEO'] = float(os.getenv('CAMBIOS_SONDEO', '2'))
+    app.config['CAMBIOS_LATIDO'] = int(os.getenv('CAMBIOS_LATIDO', '15'))
+    # Streams SSE por worker: cada uno ocupa un hilo (ver gunicorn.conf.py)
+    app.config['CAMBIOS_MAX_STREAMS'] = int(
+        os.getenv('CAMBIOS_MAX_STREAMS') or max(1, int(os.getenv('GUNICORN_THREADS', '4')) // 2)
+    )
+    app.config['CAMBIOS_REINTENTO'] = int(os.getenv('CAMBIOS_REINTENTO', '30'))
+    app.config['CACHES_SONDEO'] = float(os.getenv('CACHES_SONDEO', '2'))
+    
+    # Logs JSON asíncronos (nivel con LOG_LEVEL)
+    from .utils.logs import configurar_logs
+    configurar_logs(app)
     
     # CORS
     CORS(app, resources={
@@ -26,7 +66,7 @@ def create_app():
                 "https://*.onrender.com",
             ],
             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "Content-Encoding", "Last-Event-ID"],
             "supports_credentials": True
         }
     })
@@ -34,17 +74,37 @@ def create_app():
     # Inicializar SQLAlchemy con la app
     db.init_app(app)
     
-    # Crear tablas dentro del contexto de la aplicación
-    with app.app_context():
-        # Importar modelos para que SQLAlchemy los conozca
-        from . import models
-        
-        # Crear todas las tablas
-        db.create_all()
-        print("✓ Base de datos inicializada")
+    # Importar modelos para que SQLAlchemy los conozca
+    from . import models
+    
+    # Crear tablas dentro del contexto de la aplicación (servidor de desarrollo)
+    if crear_tablas:
+        with app.app_context():
+            db.create_all()
+            print("✓ Base de datos inicializada")
     
     # Registrar blueprints
     from .routes import api
     app.register_blueprint(api)
     
+    # Latencia, tiempo en BD y consultas por ruta (Server-Timing y /api/metricas)
+    from .utils.metricas import configurar_metricas, registrar_coleccion
+    from .utils.scoring import estadisticas_cache
+    from .utils.cambios import estadisticas_cambios
+    configurar_metricas(app)
+    registrar_coleccion('scoring_cache', estadisticas_cache)
+    registrar_coleccion('cambios', estadisticas_cambios)
+    
+    # Pesos de síntomas versionados: cada proceso recarga el modelo activo sin reiniciar
+    from .utils.modelos import configurar_modelos
+    configurar_modelos(app)
+    
+    # Cachés por proceso: cada worker aplica las escrituras de los demás (registro de cambios)
+    from .utils.invalidacion import configurar_invalidacion
+    configurar_invalidacion(app)
+    
+    # Comandos de mantenimiento (flask reconstruir-resumen, ...)
+    from .comandos import registrar_comandos
+    registrar_comandos(app)
+    
     return app
\ No newline at end of file
@@ -0,0 +1,315 @@
+import multiprocessing
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+from . import db
+from .models import Caso
+from .utils.geo import celda_geo
+from .utils.fonetica import clave_fonetica
+from .utils.duplicados import agrupar_duplicados
+from .utils.scoring import enfermedad_principal, modelo_actual
+from .utils.modelos import activar_modelo, leer_archivo, publicar_modelo, reescorar_casos
+from .utils.estadisticas import invalidar_estadisticas
+from .utils.cambios import purgar_cambios
+from .utils.sincronizacion import purgar_claves
+from .utils.resumen import compactar_resumen, reconstruir_resumen
+
+
+# Columnas agregadas a casos después de su creación: (nombre, tipo SQL, indexada).
+# crear-tablas las agrega vacías; los comandos calcular-* completan sus valores.
+COLUMNAS_NUEVAS = [
+    ('celda', 'BIGINT', True),
+    ('enfermedad_principal', 'VARCHAR(30)', False),
+    ('modelo_version', 'VARCHAR(40)', False),
+    ('clave_fonetica', 'VARCHAR(60)', False),
+    ('duplicado_de', 'INTEGER', True),
+]
+
+
+@click.command('crear-tablas')
+@with_appcontext
+def crear_tablas_comando():
+    """Crea las tablas, columnas e índices que falten (se ejecuta una vez por despliegue)"""
+    db.create_all()
+
+    # create_all no agrega columnas ni índices nuevos a tablas que ya existían;
+    # las columnas van primero porque los índices nuevos las usan
+    for nombre, tipo_sql, indexada in COLUMNAS_NUEVAS:
+        _asegurar_columna(nombre, tipo_sql, indexada=indexada)
+    _asegurar_columna('ultimo_cambio_id', 'INTEGER', tabla='deteccion_brotes')
+    for indice in Caso.__table__.indexes:
+        indice.create(db.engine, checkfirst=True)
+    click.echo("✓ Base de datos inicializada")
+
+
+@click.command('reconstruir-resumen')
+@with_appcontext
+def reconstruir_resumen_comando():
+    """Recalcula resumen_casos desde la tabla casos"""
+    filas = reconstruir_resumen()
+    invalidar_estadisticas()
+    click.echo(f"✓ Resumen reconstruido: {filas} filas")
+
+
+@click.command('compactar-resumen')
+@with_appcontext
+def compactar_resumen_comando():
+    """Junta en una fila por combinación los deltas acumulados en resumen_casos"""
+    click.echo(f"✓ Resumen compactado: {compactar_resumen()} filas menos")
+
+
+def _asegurar_columna(nombre, tipo_sql, indexada=False, tabla='casos'):
+    """Agrega a la tabla una columna nueva del modelo en bases creadas antes de ella"""
+    columnas = {c['name'] for c in inspect(db.engine).get_columns(tabla)}
+    if nombre in columnas:
+        return
+    with db.engine.begin() as conexion:
+        conexion.execute(db.text(f'ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo_sql}'))
+        if indexada:
+            conexion.execute(db.text(f'CREATE INDEX IF NOT EXISTS ix_{tabla}_{nombre} ON {tabla} ({nombre})'))
+    click.echo(f"✓ Columna {tabla}.{nombre} creada")
+
+
+def _completar_columna(columna, pendientes, origen, calcular, lote):
+    """Recorre por lotes los casos pendientes y guarda el valor calculado"""
+    total = 0
+    ultimo_id = 0
+    while True:
+        filas = db.session.execute(
+            db.select(Caso.id, *origen).where(pendientes, Caso.id > ultimo_id).order_by(Caso.id).limit(lote)
+        ).all()
+        if not filas:
+            break
+        db.session.execute(
+            db.update(Caso.__table__).where(Caso.__table__.c.id == db.bindparam('caso_id')),
+            [{'caso_id': fila.id, columna: calcular(fila)} for fila in filas]
+        )
+        db.session.commit()
+        ultimo_id = filas[-1].id
+        total += len(filas)
+    return total
+
+
+@click.command('calcular-celdas')
+@click.option('--lote', default=5000, help='Casos por transacción')
+@with_appcontext
+def calcular_celdas_comando(lote):
+    """Agrega la columna casos.celda si falta y la calcula para los casos sin celda"""
+    _asegurar_columna('celda', 'BIGINT', indexada=True)
+    total = _completar_columna(
+        'celda', Caso.celda.is_(None), [Caso.lat, Caso.lon],
+        lambda fila: celda_geo(fila.lat, fila.lon), lote
+    )
+    click.echo(f"✓ Celdas calculadas: {total} casos")
+
+
+@click.command('calcular-enfermedad-principal')
+@click.option('--lote', default=5000, help='Casos por transacción')
+@with_appcontext
+def calcular_enfermedad_principal_comando(lote):
+    """Agrega casos.enfermedad_principal si falta y la deriva de probabilidades"""
+    _asegurar_columna('enfermedad_principal', 'VARCHAR(30)')
+    total = _completar_columna(
+        'enfermedad_principal',
+        Caso.enfermedad_principal.is_(None),
+        [Caso.probabilidades],
+        lambda fila: enfermedad_principal(fila.probabilidades),
+        lote
+    )
+    click.echo(f"✓ Enfermedad principal calculada: {total} casos")
+
+
+@click.command('calcular-claves-foneticas')
+@click.option('--lote', default=5000, help='Casos por transacción')
+@with_appcontext
+def calcular_claves_foneticas_comando(lote):
+    """Agrega las columnas de duplicados si faltan y calcula la clave fonética de los casos sin ella"""
+    _asegurar_columna('clave_fonetica', 'VARCHAR(60)')
+    _asegurar_columna('duplicado_de', 'INTEGER', indexada=True)
+    for indice in Caso.__table__.indexes:
+        if indice.name in ('ix_casos_fonetica_timestamp', 'ix_casos_telefono_timestamp'):
+            indice.create(db.engine, checkfirst=True)
+    total = _completar_columna(
+        'clave_fonetica', Caso.clave_fonetica.is_(None), [Caso.nombre, Caso.apellido],
+        lambda fila: clave_fonetica(fila.nombre, fila.apellido), lote
+    )
+    click.echo(f"✓ Claves fonéticas calculadas: {total} casos")
+
+
+@click.command('agrupar-duplicados')
+@with_appcontext
+def agrupar_duplicados_comando():
+    """Recalcula en toda la tabla los grupos de probables duplicados"""
+    inicio = time.perf_counter()
+    resumen = agrupar_duplicados()
+    click.echo(
+        f"✓ Duplicados: {resumen['grupos']} grupos con {resumen['marcados']} casos marcados, "
+        f"{resumen['actualizados']} actualizados; {resumen['comparaciones']} comparaciones "
+        f"para {resumen['casos']} casos ({time.perf_counter() - inicio:.2f} s)"
+    )
+
+
+@click.command('detectar-brotes')
+@click.option('--reiniciar', is_flag=True, help='Borra los brotes y reprocesa todo el histórico')
+@click.option('--intervalo', default=0, help='Repetir cada N segundos (0 = una sola vez)')
+@with_appcontext
+def detectar_brotes_comando(reiniciar, intervalo):
+    """Detecta brotes espacio-temporales sobre los casos nuevos"""
+    # scikit-learn solo se carga en el proceso del detector, no en los workers web
+    from .utils.brotes import detectar_brotes
+
+    while True:
+        inicio = time.perf_counter()
+        resumen = detectar_brotes(reiniciar=reiniciar)
+        duracion = time.perf_counter() - inicio
+        click.echo(
+            f"✓ Brotes: {resumen['casos_nuevos']} casos nuevos, "
+            f"{resumen['brotes_creados']} creados, {resumen['brotes_actualizados']} actualizados, "
+            f"{resumen['brotes_activos']} activos ({duracion:.2f} s)"
+        )
+        if not intervalo:
+            break
+        reiniciar = False
+        db.session.remove()
+        time.sleep(intervalo)
+
+
+@click.command('publicar-modelo')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--no-activar', is_flag=True, help='Solo guardar la versión, sin activarla')
+@with_appcontext
+def publicar_modelo_comando(archivo, no_activar):
+    """Publica una versión de pesos desde un JSON {"version": ..., "enfermedades": {...}}"""
+    try:
+        version, enfermedades = leer_archivo(archivo)
+        publicar_modelo(version, enfermedades, activar=not no_activar)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    estado = 'guardado' if no_activar else 'activo'
+    click.echo(f"✓ Modelo {version} {estado}; los workers lo cargan en {current_app.config['MODELO_TTL']} s")
+
+
+@click.command('activar-modelo')
+@click.argument('version')
+@with_appcontext
+def activar_modelo_comando(version):
+    """Activa una versión publicada ('base' vuelve a los pesos del código)"""
+    try:
+        activar_modelo(version)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✓ Modelo {version} activo")
+
+
+@click.command('reescorar')
+@click.option('--lote', default=5000, help='Casos por transacción')
+@click.option('--pausa', default=0.0, help='Segundos de espera entre lotes')
+@click.option('--intervalo', default=0, help='Seguir esperando versiones nuevas cada N segundos (0 = una vez)')
+@with_appcontext
+def reescorar_comando(lote, pausa, intervalo):
+    """Recalcula las probabilidades de los casos puntuados con otra versión del modelo"""
+
+    def progreso(total, ultimo_id):
+        if total % (lote * 20) == 0:
+            click.echo(f"  {total} casos (id {ultimo_id})")
+
+    while True:
+        inicio = time.perf_counter()
+        total = reescorar_casos(lote=lote, pausa=pausa, al_avanzar=progreso)
+        click.echo(
+            f"✓ Re-escoring con el modelo {modelo_actual().version}: {total} casos "
+            f"({time.perf_counter() - inicio:.2f} s)"
+        )
+        if not intervalo:
+            break
+        db.session.remove()
+        time.sleep(intervalo)
+
+
+@click.command('entrenar-pronosticos')
+@click.option('--procesos', default=0, help='Procesos del pool (0 = uno por CPU)')
+@click.option('--completo', is_flag=True, help='Reentrenar todos los municipios aunque su serie no cambió')
+@click.option('--intervalo', default=0, help='Repetir cada N segundos (0 = una sola vez)')
+@with_appcontext
+def entrenar_pronosticos_comando(procesos, completo, intervalo):
+    """Entrena los modelos por municipio y guarda los pronósticos a 7/14 días"""
+    # scikit-learn solo se carga en el proceso de entrenamiento, no en los workers web
+    from .utils.pronostico import entrenar_pronosticos
+
+    directorio = current_app.config['PRONOSTICOS_DIR']
+    while True:
+        inicio = time.perf_counter()
+        resumen = entrenar_pronosticos(directorio, procesos=procesos or None, completo=completo)
+        click.echo(
+            f"✓ Pronósticos: {resumen['entrenados']} municipios entrenados, "
+            f"{resumen['sin_cambios']} sin cambios ({time.perf_counter() - inicio:.2f} s)"
+        )
+        if not intervalo:
+            break
+        completo = False
+        db.session.remove()
+        time.sleep(intervalo)
+
+
+@click.command('trabajador')
+@click.option('--procesos', default=2, help='Procesos que atienden la cola')
+@click.option('--espera', default=1.0, help='Segundos entre consultas con la cola vacía')
+@with_appcontext
+def trabajador_comando(procesos, espera):
+    """Atiende la cola de trabajos (jobs) con un pool de procesos"""
+    from .utils.trabajos import TAREAS, bucle_trabajador, proceso_trabajador
+
+    click.echo(f"✓ Trabajador: {procesos} procesos; tareas: {', '.join(sorted(TAREAS))}")
+    if procesos <= 1:
+        bucle_trabajador(espera)
+        return
+
+    # spawn: cada proceso crea su app y su engine (no hereda conexiones abiertas)
+    contexto = multiprocessing.get_context('spawn')
+    pool = [contexto.Process(target=proceso_trabajador, args=(espera,)) for _ in range(procesos)]
+    for proceso in pool:
+        proceso.start()
+    try:
+        for proceso in pool:
+            proceso.join()
+    except KeyboardInterrupt:
+        for proceso in pool:
+            proceso.terminate()
+        for proceso in pool:
+            proceso.join()
+
+
+@click.command('purgar-cambios')
+@click.option('--dias', default=7, help='Conservar los cambios de los últimos N días')
+@with_appcontext
+def purgar_cambios_comando(dias):
+    """Borra los cambios viejos del feed; los clientes más atrasados recargan el listado"""
+    click.echo(f"✓ Cambios purgados: {purgar_cambios(dias)}")
+
+
+@click.command('purgar-claves-sync')
+@click.option('--dias', default=30, help='Conservar las claves de idempotencia de los últimos N días')
+@with_appcontext
+def purgar_claves_sync_comando(dias):
+    """Borra las claves viejas de /api/sync; un reintento posterior cuenta como conflicto, no como duplicado"""
+    click.echo(f"✓ Claves purgadas: {purgar_claves(dias)}")
+
+
+def registrar_comandos(app):
+    app.cli.add_command(crear_tablas_comando)
+    app.cli.add_command(reconstruir_resumen_comando)
+    app.cli.add_command(compactar_resumen_comando)
+    app.cli.add_command(calcular_celdas_comando)
+    app.cli.add_command(calcular_enfermedad_principal_comando)
+    app.cli.add_command(calcular_claves_foneticas_comando)
+    app.cli.add_command(agrupar_duplicados_comando)
+    app.cli.add_command(detectar_brotes_comando)
+    app.cli.add_command(publicar_modelo_comando)
+    app.cli.add_command(activar_modelo_comando)
+    app.cli.add_command(reescorar_comando)
+    app.cli.add_command(entrenar_pronosticos_comando)
+    app.cli.add_command(trabajador_comando)
+    app.cli.add_command(purgar_cambios_comando)
+    app.cli.add_command(purgar_claves_sync_comando)
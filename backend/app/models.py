@@ -1,8 +1,39 @@
 from backend.app import db
+from backend.app.utils.fonetica import clave_fonetica
+from backend.app.utils.geo import celda_geo
+from backend.app.utils.scoring import enfermedad_principal
 from datetime import datetime
 
+
+def _celda_por_defecto(contexto):
+    # Se calcula también en inserciones Core (carga por lotes), no solo vía ORM
+    parametros = contexto.get_current_parameters()
+    return celda_geo(parametros.get('lat'), parametros.get('lon'))
+
+
+def _enfermedad_por_defecto(contexto):
+    return enfermedad_principal(contexto.get_current_parameters().get('probabilidades'))
+
+
+def _clave_fonetica_por_defecto(contexto):
+    parametros = contexto.get_current_parameters()
+    return clave_fonetica(parametros.get('nombre'), parametros.get('apellido'))
+
+
 class Caso(db.Model):
     __tablename__ = 'casos'
+    
+    # Índices según los patrones de acceso de GET /api/casos:
+    # filtro de igualdad + orden (timestamp desc, id desc) sin sort adicional
+    __table_args__ = (
+        db.Index('ix_casos_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_casos_municipio_timestamp', 'municipio', 'timestamp', 'id'),
+        db.Index('ix_casos_estado_timestamp', 'estado', 'timestamp', 'id'),
+        db.Index('ix_casos_eps_timestamp', 'eps', 'timestamp', 'id'),
+        # Bloques de la detección de duplicados: misma persona (o teléfono) en una ventana de fechas
+        db.Index('ix_casos_fonetica_timestamp', 'clave_fonetica', 'timestamp'),
+        db.Index('ix_casos_telefono_timestamp', 'telefono', 'timestamp'),
+    )
    
     id = db.Column(db.Integer, primary_key=True)
     
@@ -18,6 +49,8 @@ class Caso(db.Model):
     eps = db.Column(db.String(100))
     sintomas = db.Column(db.JSON, nullable=False)
     probabilidades = db.Column(db.JSON)
+    enfermedad_principal = db.Column(db.String(30), default=_enfermedad_por_defecto)
+    modelo_version = db.Column(db.String(40))  # Modelo de pesos que calculó probabilidades
     estado = db.Column(db.String(20), default='pendiente')
     
     # ========== DATOS DE UBICACIÓN ==========
@@ -27,6 +60,15 @@ class Caso(db.Model):
     barrio = db.Column(db.String(100))
     es_residencia_permanente = db.Column(db.Boolean, default=True)
     
+    # Geohash entero de (lat, lon) para búsquedas por zona
+    celda = db.Column(db.BigInteger, default=_celda_por_defecto, index=True)
+    
+    # ========== DUPLICADOS ==========
+    # Fonética de nombre y apellido (ver utils/fonetica.py)
+    clave_fonetica = db.Column(db.String(60), default=_clave_fonetica_por_defecto)
+    # Caso más antiguo del grupo de probables duplicados al que pertenece
+    duplicado_de = db.Column(db.Integer, index=True)
+    
     # ========== ZONA RURAL ==========
     es_zona_rural = db.Column(db.Boolean, default=False)
     nombre_zona_rural = db.Column(db.String(200))
@@ -49,6 +91,7 @@ class Caso(db.Model):
             'eps': self.eps,
             'sintomas': self.sintomas,
             'probabilidades': self.probabilidades,
+            'modelo_version': self.modelo_version,
             'estado': self.estado,
             'lat': self.lat,
             'lon': self.lon,
@@ -57,5 +100,242 @@ class Caso(db.Model):
             'es_residencia_permanente': self.es_residencia_permanente,
             'es_zona_rural': self.es_zona_rural,
             'nombre_zona_rural': self.nombre_zona_rural,
+            'duplicado_de': self.duplicado_de,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
-        }
\ No newline at end of file
+        }
+
+# Índice parcial: los casos rurales son minoría y se consultan por separado.
+# El filtro de get_casos usa la misma expresión para que el planificador lo reconozca.
+db.Index(
+    'ix_casos_rural_timestamp', Caso.timestamp, Caso.id,
+    postgresql_where=(Caso.es_zona_rural == db.true()),
+    sqlite_where=(Caso.es_zona_rural == db.true())
+)
+
+
+class ResumenCaso(db.Model):
+    """Contadores por día × municipio × estado × género × EPS × zona.
+
+    Se mantiene en la misma transacción que las escrituras sobre casos, que
+    agregan filas con deltas: hay varias filas por combinación y las lecturas
+    siempre suman. `flask compactar-resumen` las junta periódicamente.
+    """
+    __tablename__ = 'resumen_casos'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # ========== DIMENSIONES ==========
+    fecha = db.Column(db.Date, nullable=False, index=True)
+    municipio = db.Column(db.String(100))
+    estado = db.Column(db.String(20))
+    genero = db.Column(db.String(20))
+    eps = db.Column(db.String(100))
+    es_zona_rural = db.Column(db.Boolean)
+
+    # ========== CONTADORES ==========
+    total = db.Column(db.Integer, nullable=False, default=0)
+    suma_edad = db.Column(db.BigInteger, nullable=False, default=0)
+    con_edad = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumenCaso {self.fecha} {self.municipio} {self.estado}: {self.total}>'
+
+
+class Brote(db.Model):
+    """Agrupamiento espacio-temporal de casos detectado por utils/brotes.py"""
+    __tablename__ = 'brotes'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # ========== UBICACIÓN ==========
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    radio_km = db.Column(db.Float, nullable=False)
+    municipio = db.Column(db.String(100))
+
+    # ========== PERIODO ==========
+    inicio = db.Column(db.DateTime, nullable=False)
+    fin = db.Column(db.DateTime, nullable=False, index=True)
+
+    # ========== MAGNITUD ==========
+    total_casos = db.Column(db.Integer, nullable=False)
+    peso = db.Column(db.Float, nullable=False)
+    enfermedad_principal = db.Column(db.String(30))
+    por_enfermedad = db.Column(db.JSON)
+
+    # ========== METADATA ==========
+    estado = db.Column(db.String(20), default='activo', index=True)
+    detectado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<Brote {self.id} - {self.municipio} ({self.total_casos} casos)>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lat': self.lat,
+            'lon': self.lon,
+            'radio_km': self.radio_km,
+            'municipio': self.municipio,
+            'inicio': self.inicio.isoformat() if self.inicio else None,
+            'fin': self.fin.isoformat() if self.fin else None,
+            'total_casos': self.total_casos,
+            'peso': self.peso,
+            'enfermedad_principal': self.enfermedad_principal,
+            'por_enfermedad': self.por_enfermedad,
+            'estado': self.estado,
+            'detectado': self.detectado.isoformat() if self.detectado else None,
+            'actualizado': self.actualizado.isoformat() if self.actualizado else None
+        }
+
+
+class CasoBrote(db.Model):
+    """Casos que forman cada brote: al actualizarlo se suman los nuevos sin perder los anteriores"""
+    __tablename__ = 'casos_brotes'
+
+    brote_id = db.Column(db.Integer, db.ForeignKey('brotes.id', ondelete='CASCADE'), primary_key=True)
+    caso_id = db.Column(db.Integer, primary_key=True, index=True)
+
+
+class DeteccionBrotes(db.Model):
+    """Marca de agua del detector: posición procesada del registro de cambios y última ejecución"""
+    __tablename__ = 'deteccion_brotes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ultimo_caso_id = db.Column(db.Integer, nullable=False, default=0)
+    # Posición en cambios_casos; None en bases anteriores a ella (se usa ultimo_caso_id)
+    ultimo_cambio_id = db.Column(db.Integer)
+    ejecutado = db.Column(db.DateTime)
+
+
+class ModeloPesos(db.Model):
+    """Versión publicada de los pesos síntoma-enfermedad (ver utils/modelos.py)"""
+    __tablename__ = 'modelos_pesos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(40), unique=True, nullable=False)
+    enfermedades = db.Column(db.JSON, nullable=False)
+    activo = db.Column(db.Boolean, default=False, nullable=False, index=True)
+    creado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    activado = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ModeloPesos {self.version}{" (activo)" if self.activo else ""}>'
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'enfermedades': self.enfermedades,
+            'activo': self.activo,
+            'creado': self.creado.isoformat() if self.creado else None,
+            'activado': self.activado.isoformat() if self.activado else None
+        }
+
+
+class Pronostico(db.Model):
+    """Pronóstico diario precalculado por municipio (ver utils/pronostico.py)"""
+    __tablename__ = 'pronosticos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    municipio = db.Column(db.String(100), unique=True, nullable=False)
+    hasta = db.Column(db.Date, nullable=False)  # Último día observado
+    modelo = db.Column(db.String(30), nullable=False)
+    huella = db.Column(db.String(40), nullable=False)  # Serie con la que se entrenó
+    predicciones = db.Column(db.JSON, nullable=False)  # [{fecha, esperado, inferior, superior}]
+    error_medio = db.Column(db.JSON)  # Error absoluto medio por horizonte (backtest)
+    generado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self, horizonte=None):
+        predicciones = self.predicciones[:horizonte] if horizonte else self.predicciones
+        return {
+            'municipio': self.municipio,
+            'hasta': self.hasta.isoformat() if self.hasta else None,
+            'modelo': self.modelo,
+            'predicciones': predicciones,
+            'total_esperado': round(sum(p['esperado'] for p in predicciones), 1),
+            'error_medio': self.error_medio[:len(predicciones)] if self.error_medio else None,
+            'generado': self.generado.isoformat() if self.generado else None
+        }
+
+
+class Trabajo(db.Model):
+    """Tarea pesada encolada para los procesos de `flask trabajador` (ver utils/trabajos.py)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Orden en que los workers reclaman trabajos pendientes
+        db.Index('ix_jobs_estado_disponible', 'estado', 'disponible_desde', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(40), nullable=False)
+    parametros = db.Column(db.JSON)
+
+    # ========== EJECUCIÓN ==========
+    estado = db.Column(db.String(20), default='pendiente', nullable=False)  # pendiente, en_curso, completado, fallido
+    progreso = db.Column(db.Float, default=0.0, nullable=False)
+    mensaje = db.Column(db.String(200))
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    max_intentos = db.Column(db.Integer, default=3, nullable=False)
+    disponible_desde = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    worker = db.Column(db.String(60))
+    latido = db.Column(db.DateTime)
+
+    # ========== RESULTADO ==========
+    resultado = db.Column(db.JSON)
+    error = db.Column(db.Text)
+
+    # ========== METADATA ==========
+    creado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    iniciado = db.Column(db.DateTime)
+    terminado = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Trabajo {self.id} {self.tipo} ({self.estado})>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'parametros': self.parametros,
+            'estado': self.estado,
+            'progreso': round(self.progreso or 0.0, 4),
+            'mensaje': self.mensaje,
+            'intentos': self.intentos,
+            'max_intentos': self.max_intentos,
+            'error': self.error,
+            'creado': self.creado.isoformat() if self.creado else None,
+            'iniciado': self.iniciado.isoformat() if self.iniciado else None,
+            'terminado': self.terminado.isoformat() if self.terminado else None
+        }
+
+
+class CambioCaso(db.Model):
+    """Registro de altas, modificaciones y bajas de casos para el feed de cambios (ver utils/cambios.py)"""
+    __tablename__ = 'cambios_casos'
+    # AUTOINCREMENT: SQLite no reutiliza ids aunque se purguen los últimos
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    # Posición en el feed: creciente y en el mismo orden en que se confirman
+    id = db.Column(db.Integer, primary_key=True)
+    caso_id = db.Column(db.Integer, nullable=False)  # Sin FK: las bajas sobreviven al caso
+    operacion = db.Column(db.String(12), nullable=False)  # alta, modificacion, baja
+    creado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<CambioCaso {self.id} {self.operacion} {self.caso_id}>'
+
+
+class ClaveSincronizacion(db.Model):
+    """Resultado de cada caso subido por /api/sync, por clave de idempotencia (ver utils/sincronizacion.py)"""
+    __tablename__ = 'claves_sincronizacion'
+
+    id = db.Column(db.Integer, primary_key=True)
+    clave = db.Column(db.String(64), unique=True, nullable=False)
+    dispositivo = db.Column(db.String(100), nullable=False)
+    caso_id = db.Column(db.Integer)
+    resultado = db.Column(db.JSON, nullable=False)  # {'estado', 'caso_id', 'error'} devuelto la primera vez
+    creado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ClaveSincronizacion {self.clave} ({self.dispositivo})>'
@@ -1,10 +1,40 @@
-from flask import Blueprint, jsonify, request
-from datetime import datetime
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from datetime import date, datetime
+import logging
+import queue
+from itertools import islice
 from . import db
-from .models import Caso
-from .utils.scoring import calcular_probabilidades
+from .models import Brote, Caso, Pronostico, Trabajo
+from .utils.resumen import registrar_en_resumen, retirar_de_resumen, mover_en_resumen, clave_caso
+from .utils.validacion import validar_caso
+from .utils.ingesta import MAX_LOTE_CASOS, leer_lote, ingerir_lote
+from .utils.scoring import calcular_probabilidades, calcular_probabilidades_lote, modelo_actual
+from .utils.estadisticas import obtener_estadisticas, invalidar_estadisticas
+from .utils.series import FILTROS_SERIE, GRANULARIDADES, obtener_serie, invalidar_series
+from .utils.geo import (
+    parsear_bbox, parsear_cercania, bbox_radio, haversine_km
+)
+from .utils.metricas import tramo, exportar_prometheus
+from .utils.serializacion import dumps, filas_a_dicts, lineas_ndjson, respuesta_json
+from .utils.trabajos import encolar, validar_http
+from .utils.cambios import (
+    CambiosPurgados, registrar_cambios, avisar_cambios, cambios_desde, ultimo_cambio,
+    evento_sse, suscribir, cancelar
+)
+from .utils.exportacion import FORMATOS, TIPOS_MIME, generar_exportacion
+from .utils.sincronizacion import (
+    leer_cuerpo, decodificar_token, campos_sincronizacion, subir_casos, bajar_cambios
+)
+from .utils.duplicados import marcar_duplicados, retirar_de_grupo, similares_a, grupos_duplicados
+from .utils.mapa import MAX_ZOOM, filtro_zona, obtener_tesela, invalidar_teselas
+from .utils.paginacion import (
+    TAMANO_PAGINA, TAMANO_PAGINA_MAX, TAMANO_LOTE_STREAM,
+    CAMPOS_CASO, parsear_campos, columnas_para, codificar_cursor, decodificar_cursor,
+    despues_de_cursor
+)
 
 api = Blueprint('api', __name__)
+logger = logging.getLogger(__name__)
 # ==================== RUTA PRINCIPAL ====================
 @api.route('/')
 def home():
@@ -15,8 +45,22 @@ def home():
         "endpoints": {
             "health": "/api/health",
             "evaluar": "/evaluar-sintomas",
+            "evaluar_lote": "/evaluar-sintomas/lote",
             "casos": "/api/casos",
-            "estadisticas": "/api/estadisticas"
+            "casos_lote": "/api/casos/lote",
+            "casos_export": "/api/casos/export",
+            "casos_cambios": "/api/casos/cambios",
+            "casos_cambios_stream": "/api/casos/cambios/stream",
+            "casos_duplicados": "/api/casos/duplicados",
+            "sync": "/api/sync",
+            "estadisticas": "/api/estadisticas",
+            "series": "/api/series",
+            "pronosticos": "/api/pronosticos",
+            "mapa": "/api/mapa/tiles/{z}/{x}/{y}",
+            "brotes": "/api/brotes",
+            "modelo": "/api/modelo",
+            "trabajos": "/api/trabajos",
+            "metricas": "/api/metricas"
         }
     })
 
@@ -24,13 +68,14 @@ def home():
 @api.route('/api/health', methods=['GET'])
 def health():
     try:
-        db.session.execute('SELECT 1')
+        db.session.execute(db.text('SELECT 1'))
         return jsonify({
             "status": "ok", 
             "message": "API funcionando correctamente",
             "database": "conectada"
         })
     except Exception as e:
+        logger.exception('Health check: error en la base de datos')
         return jsonify({
             "status": "error",
             "message": "Error en la base de datos",
@@ -42,7 +87,7 @@ def health():
 def evaluar_sintomas():
     try:
         data = request.json
-        print(f"📥 Datos recibidos para evaluación: {data}")
+        logger.debug('Evaluación de síntomas recibida', extra={'datos': data})
         
         sintomas = data.get('sintomas', [])
         
@@ -52,20 +97,55 @@ def evaluar_sintomas():
                 'advertencia': 'Selecciona al menos un síntoma'
             }), 400
         
+        # La versión se lee antes de calcular: si el modelo cambia entre medias,
+        # el caso queda marcado con la anterior y el re-escoring lo corrige
+        modelo_version = modelo_actual().version
         probabilidades = calcular_probabilidades(sintomas)
         
         if not probabilidades:
             return jsonify({
                 'mensaje': 'Baja probabilidad de enfermedades vectoriales. Monitorea tus síntomas.',
-                'advertencia': 'Esto es una estimación; consulta un médico.'
+                'advertencia': 'Esto es una estimación; consulta un médico.',
+                'modelo_version': modelo_version
             })
         
         return jsonify({
             'probabilidades': probabilidades,
+            'modelo_version': modelo_version,
             'advertencia': 'Esto es una estimación; consulta un médico.'
         })
     except Exception as e:
-        print(f"❌ Error en evaluar_sintomas: {str(e)}")
+        logger.exception('Error en evaluar_sintomas')
+        return jsonify({'error': str(e)}), 500
+
+# ==================== EVALUAR SÍNTOMAS EN LOTE ====================
+MAX_LOTE_EVALUACION = 10000
+
+@api.route('/evaluar-sintomas/lote', methods=['POST'])
+def evaluar_sintomas_lote():
+    try:
+        data = request.json or {}
+        lote = data.get('lote')
+        
+        if not isinstance(lote, list) or not lote:
+            return jsonify({'error': 'Se requiere "lote": una lista de listas de síntomas'}), 400
+        if len(lote) > MAX_LOTE_EVALUACION:
+            return jsonify({'error': f'El lote no puede superar {MAX_LOTE_EVALUACION} elementos'}), 400
+        if not all(isinstance(sintomas, list) for sintomas in lote):
+            return jsonify({'error': 'Cada elemento del lote debe ser una lista de síntomas'}), 400
+        
+        # Una sola multiplicación de matrices para todo el lote
+        modelo_version = modelo_actual().version
+        resultados = calcular_probabilidades_lote(lote)
+        
+        return jsonify({
+            'total': len(resultados),
+            'resultados': resultados,
+            'modelo_version': modelo_version,
+            'advertencia': 'Esto es una estimación; consulta un médico.'
+        })
+    except Exception as e:
+        logger.exception('Error en evaluar_sintomas_lote')
         return jsonify({'error': str(e)}), 500
 
 # ==================== REGISTRAR CASO ====================
@@ -73,34 +153,15 @@ def evaluar_sintomas():
 def registrar_caso():
     try:
         data = request.json
-        print(f"\n{'='*60}")
-        print(f"📥 DATOS RECIBIDOS PARA REGISTRO DE CASO")
-        print(f"{'='*60}")
-        print(f"🆔 Identificación: {data.get('identificacion')}")
-        print(f"👤 Nombre: {data.get('nombre')} {data.get('apellido')}")
-        print(f"📱 Teléfono: {data.get('telefono')}")
-        print(f"🎂 Edad: {data.get('edad')}")
-        print(f"⚧ Género: {data.get('genero')}")
-        print(f"🏥 EPS: {data.get('eps')}")
-        print(f"🏘️ Barrio: {data.get('barrio')}")
-        print(f"🏠 Residencia Permanente: {data.get('es_residencia_permanente')}")
-        print(f"🌾 Zona Rural: {data.get('es_zona_rural')}")
-        if data.get('es_zona_rural'):
-            print(f"🌳 Nombre Zona: {data.get('nombre_zona_rural')}")
-        print(f"🏙️ Municipio: {data.get('municipio')}")
-        print(f"🩺 Síntomas: {data.get('sintomas')}")
-        print(f"📊 Probabilidades: {data.get('probabilidades')}")
-        print(f"📍 Ubicación: lat={data.get('lat')}, lon={data.get('lon')}")
-        print(f"📋 Estado: {data.get('estado')}")
-        print(f"{'='*60}\n")
+        logger.debug('Datos recibidos para registro de caso', extra={'datos': data})
         
         # ============ VALIDACIONES ============
         
         # 1. Validar identificación (OBLIGATORIO)
-        if not data.get('identificacion') or not data.get('identificacion').strip():
+        if not isinstance(data, dict) or not str(data.get('identificacion') or '').strip():
             return jsonify({'error': 'El número de identificación es requerido'}), 400
         
-        identificacion = data.get('identificacion').strip()
+        identificacion = str(data.get('identificacion')).strip()
         
         # Verificar si la identificación ya existe
         caso_existente = Caso.query.filter_by(identificacion=identificacion).first()
@@ -114,141 +175,247 @@ def registrar_caso():
                 }
             }), 400
         
-        # 2. Validar nombre (OBLIGATORIO)
-        if not data.get('nombre') or not data.get('nombre').strip():
-            return jsonify({'error': 'El nombre es requerido'}), 400
-        
-        # 3. Validar edad (OBLIGATORIO)
-        edad = data.get('edad')
-        if not edad:
-            return jsonify({'error': 'La edad es requerida'}), 400
-        
+        # 2-6. Resto de validaciones compartidas con la carga por lotes
         try:
-            edad = int(edad)
-            if edad < 1 or edad > 120:
-                return jsonify({'error': 'La edad debe estar entre 1 y 120 años'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'error': 'La edad debe ser un número válido'}), 400
-        
-        # 4. Validar coordenadas (OBLIGATORIO)
-        if not data.get('lat') or not data.get('lon'):
-            return jsonify({'error': 'Latitud y longitud son requeridas'}), 400
-        
-        # 5. Validar síntomas (OBLIGATORIO)
-        if not data.get('sintomas'):
-            return jsonify({'error': 'Los síntomas son requeridos'}), 400
-        
-        # 6. Validar teléfono (opcional pero con formato)
-        telefono = data.get('telefono', '').strip() if data.get('telefono') else None
-        if telefono and len(telefono) < 7:
-            return jsonify({'error': 'El teléfono debe tener al menos 7 dígitos'}), 400
+            valores = validar_caso(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # ============ CREAR CASO ============
-        nuevo_caso = Caso(
-            # Identificación
-            identificacion=identificacion,
-            
-            # Datos personales
-            nombre=data.get('nombre').strip(),
-            apellido=data.get('apellido', '').strip() if data.get('apellido') else None,
-            telefono=telefono,
-            edad=edad,
-            genero=data.get('genero') if data.get('genero') else None,
-            
-            # Datos de salud
-            eps=data.get('eps'),
-            sintomas=data.get('sintomas'),
-            probabilidades=data.get('probabilidades'),
-            estado=data.get('estado', 'pendiente'),
-            
-            # Ubicación GPS
-            lat=float(data.get('lat')),
-            lon=float(data.get('lon')),
-            
-            # Ubicación geográfica
-            municipio=data.get('municipio', 'Buenaventura').strip(),
-            barrio=data.get('barrio', '').strip() if data.get('barrio') else None,
-            es_residencia_permanente=data.get('es_residencia_permanente', True),
-            
-            # Zona rural
-            es_zona_rural=data.get('es_zona_rural', False),
-            nombre_zona_rural=data.get('nombre_zona_rural').strip() if data.get('nombre_zona_rural') and data.get('es_zona_rural') else None
-        )
+        nuevo_caso = Caso(**valores)
         
         # Guardar en la base de datos
         db.session.add(nuevo_caso)
+        db.session.flush()
+        registrar_en_resumen(nuevo_caso)
+        # La misma persona con otra identificación o un nombre mal escrito
+        posible_duplicado = marcar_duplicados([nuevo_caso]).get(nuevo_caso.id)
+        registrar_cambios([nuevo_caso.id], 'alta')
         db.session.commit()
-        
-        print(f"✅ Caso registrado exitosamente:")
-        print(f"   ID Interno: {nuevo_caso.id}")
-        print(f"   Identificación: {nuevo_caso.identificacion}")
-        print(f"   Paciente: {nuevo_caso.nombre} {nuevo_caso.apellido or ''}")
-        print(f"   Teléfono: {nuevo_caso.telefono or 'No proporcionado'}")
-        print(f"   EPS: {nuevo_caso.eps or 'No especificada'}")
-        print(f"   Timestamp: {nuevo_caso.timestamp}")
-        print(f"{'='*60}\n")
-        print(f"🌾 Zona Rural: {data.get('es_zona_rural')}")
-        if data.get('es_zona_rural'):
-            print(f"🌳 Nombre Zona: {data.get('nombre_zona_rural')}")
+        invalidar_estadisticas()
+        invalidar_teselas(nuevo_caso.lat, nuevo_caso.lon)
+        avisar_cambios()
+        
+        logger.info('Caso registrado', extra={'datos': {
+            'caso_id': nuevo_caso.id,
+            'identificacion': nuevo_caso.identificacion,
+            'municipio': nuevo_caso.municipio,
+            'es_zona_rural': nuevo_caso.es_zona_rural,
+            'duplicado_de': posible_duplicado and posible_duplicado['duplicado_de']
+        }})
         
         return jsonify({
             'mensaje': 'Caso registrado exitosamente',
-            'caso': nuevo_caso.to_dict()
+            'caso': nuevo_caso.to_dict(),
+            'posible_duplicado': posible_duplicado
         }), 201
         
     except Exception as e:
         db.session.rollback()
-        print(f"\n{'='*60}")
-        print(f"❌ ERROR AL REGISTRAR CASO")
-        print(f"{'='*60}")
-        print(f"Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print(f"{'='*60}\n")
+        logger.exception('Error al registrar caso')
         return jsonify({'error': f'Error al registrar caso: {str(e)}'}), 500
 
+# ==================== REGISTRAR CASOS EN LOTE ====================
+@api.route('/api/casos/lote', methods=['POST'])
+def registrar_casos_lote():
+    try:
+        # Arreglo JSON, NDJSON o CSV según el Content-Type
+        try:
+            registros = leer_lote(request)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not registros:
+            return jsonify({'error': 'El lote está vacío'}), 400
+        if len(registros) > MAX_LOTE_CASOS:
+            return jsonify({'error': f'El lote no puede superar {MAX_LOTE_CASOS} casos'}), 400
+        
+        resultados = ingerir_lote(registros)
+        aceptados = sum(1 for r in resultados if r['estado'] == 'aceptado')
+        logger.info('Lote de casos procesado', extra={'datos': {
+            'recibidos': len(resultados),
+            'aceptados': aceptados
+        }})
+        if aceptados:
+            invalidar_estadisticas()
+            avisar_cambios()
+            for resultado in resultados:
+                if resultado['estado'] == 'aceptado':
+                    registro = registros[resultado['fila']]
+                    invalidar_teselas(float(registro['lat']), float(registro['lon']))
+        
+        return jsonify({
+            'mensaje': f'{aceptados} de {len(resultados)} casos registrados',
+            'aceptados': aceptados,
+            'rechazados': len(resultados) - aceptados,
+            'resultados': resultados
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Error al registrar lote de casos')
+        return jsonify({'error': f'Error al registrar lote de casos: {str(e)}'}), 500
+
 # ==================== OBTENER TODOS LOS CASOS ====================
+def _filtrar_casos(query, args):
+    """Aplica los filtros opcionales de la query string a un select sobre Caso"""
+    identificacion = args.get('identificacion')
+    municipio = args.get('municipio')
+    estado = args.get('estado')
+    eps = args.get('eps')
+    zona_rural = args.get('zona_rural')
+    busqueda = (args.get('q') or '').strip()
+    
+    if identificacion:
+        query = query.where(Caso.identificacion == identificacion)
+    if municipio:
+        query = query.where(Caso.municipio == municipio)
+    if estado:
+        query = query.where(Caso.estado == estado)
+    if eps:
+        query = query.where(Caso.eps == eps)
+    if zona_rural:
+        # Literal (no parámetro) para que pueda usarse el índice parcial de zona rural
+        rural = zona_rural.lower() == 'true'
+        query = query.where(Caso.es_zona_rural == (db.true() if rural else db.false()))
+    if busqueda:
+        # Búsqueda libre de la tabla de casos: cédula, nombre, apellido o teléfono
+        query = query.where(db.or_(
+            Caso.identificacion.contains(busqueda, autoescape=True),
+            Caso.nombre.icontains(busqueda, autoescape=True),
+            Caso.apellido.icontains(busqueda, autoescape=True),
+            Caso.telefono.contains(busqueda, autoescape=True)
+        ))
+    
+    # Filtros espaciales: rangos de celda indexados + caja exacta de lat/lon
+    if args.get('bbox'):
+        query = query.where(filtro_zona(*parsear_bbox(args.get('bbox'))))
+    if args.get('near'):
+        lat, lon, radio_km = parsear_cercania(args.get('near'), args.get('radius_km'))
+        query = query.where(filtro_zona(*bbox_radio(lat, lon, radio_km)))
+    
+    return query
+
+def _refinar_cercania(filas, args):
+    """Descarta las filas de la caja que quedan fuera del radio (haversine exacto)"""
+    if not args.get('near'):
+        return filas
+    lat, lon, radio_km = parsear_cercania(args.get('near'), args.get('radius_km'))
+    return (f for f in filas if haversine_km(lat, lon, f.lat, f.lon) <= radio_km)
+
+def _stream_ndjson(query, campos, limit=None):
+    """Genera una línea JSON por caso leyendo del cursor del servidor por lotes"""
+    resultado = db.session.execute(
+        query.execution_options(yield_per=TAMANO_LOTE_STREAM)
+    )
+    filas = _refinar_cercania(resultado, request.args)
+    if limit:
+        filas = islice(filas, limit)
+    yield from lineas_ndjson(filas, campos)
+
 @api.route('/api/casos', methods=['GET'])
 def get_casos():
     try:
-        # Parámetros de filtrado opcionales
-        identificacion = request.args.get('identificacion')
-        municipio = request.args.get('municipio')
-        estado = request.args.get('estado')
-        eps = request.args.get('eps')
-        zona_rural = request.args.get('zona_rural')
+        # Paginación, proyección y formato
         limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        formato = request.args.get('formato', 'json')
+        if limit is not None and limit < 1:
+            return jsonify({'error': 'limit debe ser mayor que 0'}), 400
         
-        # Query base
-        query = Caso.query
-        
-        # Aplicar filtros
-        if identificacion:
-            query = query.filter_by(identificacion=identificacion)
-        if municipio:
-            query = query.filter_by(municipio=municipio)
-        if estado:
-            query = query.filter_by(estado=estado)
-        if eps:
-            query = query.filter_by(eps=eps)
-        if zona_rural:
-            query = query.filter_by(es_zona_rural=(zona_rural.lower() == 'true'))
-        
-        # Ordenar por más reciente
-        query = query.order_by(Caso.timestamp.desc())
-        
-        # Aplicar límite si se especifica
-        if limit:
-            query = query.limit(limit)
-        
-        casos = query.all()
+        try:
+            campos = parsear_campos(request.args.get('fields'))
+            posicion = decodificar_cursor(cursor) if cursor else None
+            
+            # Query base: solo las columnas pedidas, sin instancias ORM
+            extra = ['lat', 'lon'] if request.args.get('near') else []
+            query = _filtrar_casos(db.select(*columnas_para(campos, extra)), request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Continuar desde el último caso de la página anterior
+        if posicion:
+            query = query.where(despues_de_cursor(*posicion))
+        
+        # Ordenar por más reciente (id desempata timestamps iguales)
+        query = query.order_by(Caso.timestamp.desc(), Caso.id.desc())
+        
+        # Modo streaming: sin límite por defecto, memoria constante
+        if formato == 'ndjson':
+            if limit and not request.args.get('near'):
+                query = query.limit(limit)
+            return Response(
+                stream_with_context(_stream_ndjson(query, campos, limit)),
+                mimetype='application/x-ndjson'
+            )
+        
+        # Modo página: se pide una fila extra para saber si hay siguiente
+        limit = min(limit or TAMANO_PAGINA, TAMANO_PAGINA_MAX)
+        if request.args.get('near'):
+            # El radio se refina en Python: se lee la caja hasta llenar la página
+            resultado = db.session.execute(query.execution_options(yield_per=limit + 1))
+            filas = list(islice(_refinar_cercania(resultado, request.args), limit + 1))
+            resultado.close()
+        else:
+            filas = db.session.execute(query.limit(limit + 1)).all()
+        hay_mas = len(filas) > limit
+        filas = filas[:limit]
+        
+        siguiente = None
+        if hay_mas:
+            siguiente = codificar_cursor(filas[-1].timestamp, filas[-1].id)
+        
+        # Tuplas a JSON sin pasar por instancias ORM ni to_dict()
+        with tramo('serializacion'):
+            return respuesta_json({
+                'total': len(filas),
+                'casos': filas_a_dicts(filas, campos),
+                'siguiente': siguiente
+            })
+    except Exception as e:
+        logger.exception('Error al obtener casos')
+        return jsonify({'error': str(e)}), 500
+
+# ==================== EXPORTAR CASOS ====================
+@api.route('/api/casos/export', methods=['GET'])
+def exportar_casos():
+    try:
+        formato = request.args.get('formato', 'csv')
+        comprimir = request.args.get('gzip', 'false').lower() == 'true'
+        if formato not in FORMATOS:
+            return jsonify({'error': f"formato debe ser uno de: {', '.join(FORMATOS)}"}), 400
+        if request.args.get('near'):
+            return jsonify({'error': 'La exportación no admite near; usa bbox'}), 400
         
-        return jsonify({
-            'total': len(casos),
-            'casos': [caso.to_dict() for caso in casos]
-        })
+        try:
+            query = _filtrar_casos(
+                db.select(*columnas_para(CAMPOS_CASO, ['enfermedad_principal'])), request.args
+            )
+            desde = request.args.get('desde')
+            hasta = request.args.get('hasta')
+            if desde:
+                query = query.where(Caso.timestamp >= datetime.fromisoformat(desde))
+            if hasta:
+                query = query.where(Caso.timestamp < datetime.fromisoformat(hasta))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if formato == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return jsonify({'error': 'Exportación Parquet no disponible: falta pyarrow'}), 501
+        
+        # Orden por id: recorrido estable del cursor del servidor
+        cuerpo = generar_exportacion(query.order_by(Caso.id), formato, comprimir)
+        
+        nombre = f"casos_{datetime.utcnow():%Y%m%d_%H%M%S}.{formato}"
+        if comprimir and formato != 'parquet':
+            nombre += '.gz'
+        respuesta = Response(stream_with_context(cuerpo), content_type=TIPOS_MIME[formato])
+        respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return respuesta
     except Exception as e:
-        print(f"❌ Error al obtener casos: {str(e)}")
+        logger.exception('Error al exportar casos')
         return jsonify({'error': str(e)}), 500
 
 # ==================== BUSCAR CASO POR IDENTIFICACIÓN ====================
@@ -267,7 +434,7 @@ def buscar_por_identificacion(identificacion):
                 'mensaje': f'No se encontró ningún caso con la identificación {identificacion}'
             }), 404
     except Exception as e:
-        print(f"❌ Error al buscar caso: {str(e)}")
+        logger.exception('Error al buscar caso')
         return jsonify({'error': str(e)}), 500
 
 # ==================== OBTENER UN CASO ESPECÍFICO ====================
@@ -285,6 +452,7 @@ def actualizar_caso(caso_id):
     try:
         caso = Caso.query.get_or_404(caso_id)
         data = request.json
+        clave_anterior = clave_caso(caso)
         
         # Campos actualizables
         if 'estado' in data:
@@ -296,7 +464,17 @@ def actualizar_caso(caso_id):
         if 'es_residencia_permanente' in data:
             caso.es_residencia_permanente = data['es_residencia_permanente']
         
+        mover_en_resumen(caso, clave_anterior)
+        registrar_cambios([caso.id], 'modificacion')
         db.session.commit()
+        invalidar_estadisticas()
+        invalidar_series()
+        invalidar_teselas(caso.lat, caso.lon)
+        avisar_cambios()
+        logger.info('Caso actualizado', extra={'datos': {
+            'caso_id': caso_id,
+            'campos': sorted(data.keys())
+        }})
         
         return jsonify({
             'mensaje': 'Caso actualizado exitosamente',
@@ -304,6 +482,7 @@ def actualizar_caso(caso_id):
         })
     except Exception as e:
         db.session.rollback()
+        logger.exception('Error al actualizar caso', extra={'datos': {'caso_id': caso_id}})
         return jsonify({'error': str(e)}), 500
 
 # ==================== ELIMINAR UN CASO ====================
@@ -311,8 +490,17 @@ def actualizar_caso(caso_id):
 def eliminar_caso(caso_id):
     try:
         caso = Caso.query.get_or_404(caso_id)
+        retirar_de_resumen(caso)
+        reagrupados = retirar_de_grupo(caso)
         db.session.delete(caso)
+        registrar_cambios([caso_id], 'baja')
+        registrar_cambios(reagrupados, 'modificacion')
         db.session.commit()
+        invalidar_estadisticas()
+        invalidar_series()
+        invalidar_teselas(caso.lat, caso.lon)
+        avisar_cambios()
+        logger.info('Caso eliminado', extra={'datos': {'caso_id': caso_id}})
         
         return jsonify({
             'mensaje': 'Caso eliminado exitosamente',
@@ -320,64 +508,408 @@ def eliminar_caso(caso_id):
         })
     except Exception as e:
         db.session.rollback()
+        logger.exception('Error al eliminar caso', extra={'datos': {'caso_id': caso_id}})
+        return jsonify({'error': str(e)}), 500
+
+# ==================== DUPLICADOS ====================
+@api.route('/api/casos/duplicados', methods=['GET'])
+def duplicados_casos():
+    try:
+        # Grupos de probables duplicados, paginados por el id de su caso más antiguo
+        try:
+            desde = int(request.args.get('desde', 0))
+            limit = min(int(request.args.get('limit', TAMANO_PAGINA)), TAMANO_PAGINA_MAX)
+            if desde < 0 or limit < 1:
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'desde y limit deben ser enteros positivos'}), 400
+        
+        grupos, hay_mas = grupos_duplicados(desde, limit)
+        return jsonify({
+            'grupos': grupos,
+            'siguiente': grupos[-1]['caso_id'] if hay_mas else None
+        })
+    except Exception as e:
+        logger.exception('Error al listar duplicados')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/casos/<int:caso_id>/similares', methods=['GET'])
+def similares_caso(caso_id):
+    caso = db.session.get(Caso, caso_id)
+    if caso is None:
+        return jsonify({'error': 'Caso no encontrado'}), 404
+    try:
+        similares = similares_a(caso)
+        casos = {c.id: c for c in Caso.query.filter(Caso.id.in_([i for i, _ in similares]))}
+        return jsonify({
+            'caso_id': caso_id,
+            'duplicado_de': caso.duplicado_de,
+            'similares': [
+                {'similitud': puntaje, 'caso': casos[i].to_dict()} for i, puntaje in similares if i in casos
+            ]
+        })
+    except Exception as e:
+        logger.exception('Error al buscar casos similares', extra={'datos': {'caso_id': caso_id}})
+        return jsonify({'error': str(e)}), 500
+
+# ==================== FEED DE CAMBIOS ====================
+@api.route('/api/casos/cambios', methods=['GET'])
+def cambios_casos():
+    try:
+        desde = request.args.get('since', type=int)
+        limit = min(request.args.get('limit', TAMANO_PAGINA_MAX, type=int), TAMANO_PAGINA_MAX)
+        if limit < 1:
+            return jsonify({'error': 'limit debe ser mayor que 0'}), 400
+
+        # Sin since: solo la posición actual, desde la que pedir los siguientes
+        if desde is None:
+            return jsonify({'cambios': [], 'ultimo': ultimo_cambio(), 'hay_mas': False})
+
+        try:
+            cambios, hay_mas = cambios_desde(desde, limit)
+        except CambiosPurgados as e:
+            return jsonify({'error': str(e)}), 410
+
+        return respuesta_json({
+            'cambios': cambios,
+            'ultimo': cambios[-1]['id'] if cambios else desde,
+            'hay_mas': hay_mas
+        })
+    except Exception as e:
+        logger.exception('Error al obtener cambios')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/casos/cambios/stream', methods=['GET'])
+def stream_cambios():
+    # EventSource reenvía el último id recibido al reconectar
+    desde = request.headers.get('Last-Event-ID', type=int)
+    if desde is None:
+        desde = request.args.get('since', type=int)
+    latido = current_app.config['CAMBIOS_LATIDO']
+    suscripcion = suscribir(current_app.config['CAMBIOS_MAX_STREAMS'])
+    if suscripcion is None:
+        # Cada stream retiene un hilo del worker: por encima del tope se pide volver
+        # más tarde en lugar de dejar sin hilos al resto de la API
+        reintento = current_app.config['CAMBIOS_REINTENTO']
+        respuesta = Response(b'retry: %d\n\n' % (reintento * 1000), status=503, mimetype='text/event-stream')
+        respuesta.headers['Retry-After'] = str(reintento)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
+
+    def generar():
+        try:
+            yield b'retry: 3000\n\n'
+            enviado = suscripcion.desde
+
+            # Reconexión: lo que falta se lee de la tabla; lo nuevo llega por la suscripción
+            if desde is not None:
+                enviado = desde
+                try:
+                    hay_mas = True
+                    while hay_mas:
+                        cambios, hay_mas = cambios_desde(enviado)
+                        if cambios:
+                            enviado = cambios[-1]['id']
+                            yield b''.join(evento_sse(cambio) for cambio in cambios)
+                except CambiosPurgados as e:
+                    # El cliente recarga el listado y sigue desde la posición actual
+                    yield b'event: reinicio\ndata: %s\n\n' % dumps({'error': str(e)})
+                    enviado = suscripcion.desde
+                finally:
+                    # La espera no retiene una conexión del pool
+                    db.session.remove()
+
+            yield b'event: inicio\ndata: %s\n\n' % dumps({'ultimo': enviado})
+
+            while not suscripcion.desbordada:
+                try:
+                    eventos = suscripcion.cola.get(timeout=latido)
+                except queue.Empty:
+                    # Mantiene viva la conexión y detecta clientes que se fueron
+                    yield b': latido\n\n'
+                    continue
+                nuevos = [evento for cambio_id, evento in eventos if cambio_id > enviado]
+                if nuevos:
+                    enviado = eventos[-1][0]
+                    yield b''.join(nuevos)
+        finally:
+            cancelar(suscripcion)
+
+    respuesta = Response(stream_with_context(generar()), mimetype='text/event-stream')
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    # También si el cliente se va antes de que empiece generar(): el cupo se libera
+    respuesta.call_on_close(lambda: cancelar(suscripcion))
+    return respuesta
+
+# ==================== SINCRONIZACIÓN SIN CONEXIÓN ====================
+@api.route('/api/sync', methods=['POST'])
+def sincronizar():
+    try:
+        # Una petición por sincronización: sube la cola del dispositivo y baja los cambios
+        try:
+            cuerpo = leer_cuerpo(request)
+            dispositivo = str(cuerpo.get('dispositivo') or '').strip()[:100]
+            casos = cuerpo.get('casos') or []
+            token = cuerpo.get('token')
+            if not dispositivo:
+                raise ValueError('Se requiere "dispositivo"')
+            if not isinstance(casos, list):
+                raise ValueError('"casos" debe ser una lista')
+            if len(casos) > MAX_LOTE_CASOS:
+                raise ValueError(f'El lote no puede superar {MAX_LOTE_CASOS} casos')
+            campos = campos_sincronizacion(cuerpo.get('campos'))
+            municipio = cuerpo.get('municipio') or None
+            if municipio is not None and not isinstance(municipio, str):
+                raise ValueError('"municipio" debe ser texto')
+            # Antes de subir nada: un token inválido no deja la subida a medias
+            if token:
+                decodificar_token(token)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        resultados, insertados, atrasados = subir_casos(dispositivo, casos, campos) if casos else ([], {}, False)
+        if insertados:
+            invalidar_estadisticas()
+            # Capturas de días anteriores caen en cubetas ya cerradas de las series
+            if atrasados:
+                invalidar_series()
+            for lat, lon in insertados.values():
+                invalidar_teselas(lat, lon)
+            avisar_cambios()
+        
+        try:
+            bajada = bajar_cambios(token, campos, municipio, excluir_altas=insertados)
+        except CambiosPurgados as e:
+            # Token demasiado viejo: el dispositivo descarga todo y sigue desde el token nuevo
+            bajada = dict(bajar_cambios(None), reiniciar=True, error=str(e))
+        
+        logger.info('Sincronización', extra={'datos': {
+            'dispositivo': dispositivo,
+            'subidos': len(casos),
+            'aceptados': len(insertados),
+            'conflictos': sum(1 for r in resultados if r['estado'] == 'conflicto'),
+            'bajados': len(bajada['casos']) + len(bajada['bajas'])
+        }})
+        
+        return respuesta_json(
+            dict(bajada, resultados=resultados),
+            comprimir=request.accept_encodings['gzip'] > 0
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Error en la sincronización')
         return jsonify({'error': str(e)}), 500
 
 # ==================== ESTADÍSTICAS ====================
 @api.route('/api/estadisticas', methods=['GET'])
 def estadisticas():
     try:
-        # Total de casos
-        total_casos = Caso.query.count()
-        
-        # Casos por municipio
-        casos_por_municipio = db.session.query(
-            Caso.municipio, 
-            db.func.count(Caso.id)
-        ).group_by(Caso.municipio).all()
-        
-        # Casos por estado
-        casos_por_estado = db.session.query(
-            Caso.estado,
-            db.func.count(Caso.id)
-        ).group_by(Caso.estado).all()
-        
-        # Casos por género
-        casos_por_genero = db.session.query(
-            Caso.genero,
-            db.func.count(Caso.id)
-        ).group_by(Caso.genero).all()
-        
-        # Casos por EPS
-        casos_por_eps = db.session.query(
-            Caso.eps,
-            db.func.count(Caso.id)
-        ).group_by(Caso.eps).all()
-        
-        # Casos en zona rural
-        casos_zona_rural = Caso.query.filter_by(es_zona_rural=True).count()
-        casos_zona_urbana = Caso.query.filter_by(es_zona_rural=False).count()
-        
-        # Promedio de edad
-        edad_promedio = db.session.query(
-            db.func.avg(Caso.edad)
-        ).scalar()
+        # Rango opcional de fechas (YYYY-MM-DD) sobre el resumen diario
+        try:
+            desde = request.args.get('desde')
+            hasta = request.args.get('hasta')
+            desde = date.fromisoformat(desde).isoformat() if desde else None
+            hasta = date.fromisoformat(hasta).isoformat() if hasta else None
+        except ValueError:
+            return jsonify({'error': 'Las fechas deben tener formato YYYY-MM-DD'}), 400
+        
+        # Una consulta por versión de los datos, compartida entre todos los clientes
+        cuerpo, etag = obtener_estadisticas(desde, hasta)
+        
+        respuesta = Response(cuerpo, mimetype='application/json')
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        
+        # 304 si el dashboard ya tiene esta versión
+        return respuesta.make_conditional(request)
+    except Exception as e:
+        logger.exception('Error al obtener estadísticas')
+        return jsonify({'error': str(e)}), 500
+
+# ==================== SERIES DE TIEMPO ====================
+@api.route('/api/series', methods=['GET'])
+def series():
+    try:
+        granularidad = request.args.get('granularidad', 'dia')
+        if granularidad not in GRANULARIDADES:
+            return jsonify({'error': f"granularidad debe ser {' o '.join(GRANULARIDADES)}"}), 400
+        try:
+            desde = request.args.get('desde')
+            hasta = request.args.get('hasta')
+            desde = date.fromisoformat(desde) if desde else None
+            hasta = date.fromisoformat(hasta) if hasta else None
+        except ValueError:
+            return jsonify({'error': 'Las fechas deben tener formato YYYY-MM-DD'}), 400
+        filtros = {campo: request.args[campo] for campo in FILTROS_SERIE if request.args.get(campo)}
+        
+        # Las cubetas cerradas salen de caché; solo la abierta se consulta siempre
+        try:
+            cuerpo, etag = obtener_serie(granularidad, filtros, desde, hasta)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        respuesta = Response(cuerpo, mimetype='application/json')
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta.make_conditional(request)
+    except Exception as e:
+        logger.exception('Error al obtener series')
+        return jsonify({'error': str(e)}), 500
+
+# ==================== PRONÓSTICOS ====================
+HORIZONTES_PRONOSTICO = (7, 14)
+
+@api.route('/api/pronosticos', methods=['GET'])
+def pronosticos():
+    try:
+        horizonte = request.args.get('horizonte', 7, type=int)
+        if horizonte not in HORIZONTES_PRONOSTICO:
+            return jsonify({'error': 'horizonte debe ser 7 o 14'}), 400
         
+        # Solo se leen resultados precalculados por `flask entrenar-pronosticos`
+        municipio = request.args.get('municipio')
+        if municipio:
+            pronostico = db.session.execute(
+                db.select(Pronostico).where(Pronostico.municipio == municipio)
+            ).scalar_one_or_none()
+            if pronostico is None:
+                return jsonify({'error': f'Sin pronóstico para {municipio}'}), 404
+            return jsonify(pronostico.to_dict(horizonte))
+        
+        lista = db.session.execute(db.select(Pronostico).order_by(Pronostico.municipio)).scalars()
         return jsonify({
-            'total_casos': total_casos,
-            'por_municipio': dict(casos_por_municipio),
-            'por_estado': dict(casos_por_estado),
-            'por_genero': dict(casos_por_genero),
-            'por_eps': dict(casos_por_eps),
-            'por_zona': {
-                'rural': casos_zona_rural,
-                'urbana': casos_zona_urbana
-            },
-            'edad_promedio': round(edad_promedio, 1) if edad_promedio else None
+            'horizonte': horizonte,
+            'pronosticos': [p.to_dict(horizonte) for p in lista]
         })
     except Exception as e:
-        print(f"❌ Error al obtener estadísticas: {str(e)}")
+        logger.exception('Error al obtener pronósticos')
         return jsonify({'error': str(e)}), 500
 
+# ==================== MAPA: TESELAS CON CLUSTERS ====================
+@api.route('/api/mapa/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def tesela_mapa(z, x, y):
+    try:
+        if z > MAX_ZOOM or x >= (1 << z) or y >= (1 << z):
+            return jsonify({'error': f'Tesela fuera de rango (zoom máximo {MAX_ZOOM})'}), 400
+        
+        # Clusters agregados en SQL; el tamaño depende de la tesela, no de los casos
+        cuerpo, etag = obtener_tesela(z, x, y)
+        
+        respuesta = Response(cuerpo, mimetype='application/json')
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta.make_conditional(request)
+    except Exception as e:
+        logger.exception('Error al obtener tesela', extra={'datos': {'z': z, 'x': x, 'y': y}})
+        return jsonify({'error': str(e)}), 500
+
+# ==================== BROTES DETECTADOS ====================
+@api.route('/api/brotes', methods=['GET'])
+def get_brotes():
+    try:
+        # Por defecto solo los brotes activos, los más recientes primero
+        estado = request.args.get('estado', 'activo')
+        municipio = request.args.get('municipio')
+        limit = min(request.args.get('limit', TAMANO_PAGINA, type=int), TAMANO_PAGINA_MAX)
+        if limit < 1:
+            return jsonify({'error': 'limit debe ser mayor que 0'}), 400
+        
+        query = db.select(Brote)
+        if estado != 'todos':
+            query = query.where(Brote.estado == estado)
+        if municipio:
+            query = query.where(Brote.municipio == municipio)
+        query = query.order_by(Brote.fin.desc(), Brote.id.desc()).limit(limit)
+        
+        brotes = db.session.execute(query).scalars().all()
+        
+        return jsonify({
+            'total': len(brotes),
+            'brotes': [brote.to_dict() for brote in brotes]
+        })
+    except Exception as e:
+        logger.exception('Error al obtener brotes')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/brotes/<int:brote_id>', methods=['GET'])
+def get_brote(brote_id):
+    brote = db.session.get(Brote, brote_id)
+    if not brote:
+        return jsonify({'error': 'Brote no encontrado'}), 404
+    return jsonify(brote.to_dict())
+
+# ==================== TRABAJOS EN SEGUNDO PLANO ====================
+@api.route('/api/trabajos', methods=['POST'])
+def crear_trabajo():
+    try:
+        data = request.json or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Se requiere un objeto JSON'}), 400
+        try:
+            validar_http(data.get('tipo'), data.get('parametros'))
+            trabajo = encolar(data.get('tipo'), data.get('parametros'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 202: lo ejecuta `flask trabajador`; el cliente consulta el estado
+        respuesta = jsonify(trabajo.to_dict())
+        respuesta.status_code = 202
+        respuesta.headers['Location'] = f'/api/trabajos/{trabajo.id}'
+        return respuesta
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Error al encolar trabajo')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/trabajos', methods=['GET'])
+def listar_trabajos():
+    try:
+        consulta = db.select(Trabajo).order_by(Trabajo.id.desc()).limit(50)
+        if request.args.get('estado'):
+            consulta = consulta.where(Trabajo.estado == request.args.get('estado'))
+        if request.args.get('tipo'):
+            consulta = consulta.where(Trabajo.tipo == request.args.get('tipo'))
+        trabajos = db.session.execute(consulta).scalars()
+        return jsonify({'trabajos': [t.to_dict() for t in trabajos]})
+    except Exception as e:
+        logger.exception('Error al listar trabajos')
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/trabajos/<int:trabajo_id>', methods=['GET'])
+def estado_trabajo(trabajo_id):
+    trabajo = db.session.get(Trabajo, trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(trabajo.to_dict())
+
+@api.route('/api/trabajos/<int:trabajo_id>/resultado', methods=['GET'])
+def resultado_trabajo(trabajo_id):
+    trabajo = db.session.get(Trabajo, trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    if trabajo.estado == 'fallido':
+        return jsonify({'error': trabajo.error, 'estado': trabajo.estado}), 409
+    if trabajo.estado != 'completado':
+        # Aún no termina: mismo cuerpo que el estado, con 202
+        return jsonify(trabajo.to_dict()), 202
+    return jsonify({'id': trabajo.id, 'tipo': trabajo.tipo, 'resultado': trabajo.resultado})
+
+# ==================== MODELO DE PESOS ====================
+@api.route('/api/modelo', methods=['GET'])
+def modelo_pesos():
+    modelo = modelo_actual()
+    return jsonify({
+        'version': modelo.version,
+        'enfermedades': modelo.nombres,
+        'sintomas': modelo.sintomas
+    })
+
+# ==================== MÉTRICAS ====================
+@api.route('/api/metricas', methods=['GET'])
+def metricas():
+    return Response(exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
 # ==================== MANEJO DE ERRORES ====================
 @api.errorhandler(404)
 def not_found(error):
@@ -386,4 +918,5 @@ def not_found(error):
 @api.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
+    logger.error('Error interno del servidor', extra={'datos': {'ruta': request.path}})
     return jsonify({'error': 'Error interno del servidor'}), 500
@@ -0,0 +1,270 @@
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+import numpy as np
+from sklearn.cluster import DBSCAN
+from backend.app import db
+from backend.app.models import Brote, CambioCaso, Caso, CasoBrote, DeteccionBrotes
+from backend.app.utils.cambios import ultimo_cambio
+from backend.app.utils.geo import RADIO_TIERRA_KM, bbox_radio, haversine_km, rangos_bbox
+
+# Solo los casos de los últimos VENTANA_DIAS días pueden formar un brote activo
+VENTANA_DIAS = 21
+
+# Dos casos son vecinos si están a EPS_KM en espacio o EPS_DIAS en tiempo (combinados)
+EPS_KM = 0.5
+EPS_DIAS = 7
+
+# Peso mínimo (suma de probabilidades) para que un grupo sea brote
+MIN_PESO = 5
+PESO_MINIMO_CASO = 0.1
+
+# Por encima de este número de rangos de celda se lee la ventana completa
+MAX_RANGOS_ZONA = 200
+
+
+def peso_caso(probabilidades):
+    """Peso del caso en la detección: la mayor probabilidad estimada, entre 0.1 y 1"""
+    if not probabilidades or not isinstance(probabilidades, dict):
+        return PESO_MINIMO_CASO
+    try:
+        maximo = max(float(p) for p in probabilidades.values()) / 100
+    except (TypeError, ValueError):
+        return PESO_MINIMO_CASO
+    return min(max(maximo, PESO_MINIMO_CASO), 1.0)
+
+
+def _caracteristicas(lat, lon, dias, lat_ref):
+    """Proyecta (lat, lon, t) a km, con el tiempo escalado para que EPS_DIAS equivalga a EPS_KM"""
+    x = np.radians(lon) * RADIO_TIERRA_KM * math.cos(math.radians(lat_ref))
+    y = np.radians(lat) * RADIO_TIERRA_KM
+    t = dias * (EPS_KM / EPS_DIAS)
+    return np.column_stack([x, y, t])
+
+
+_columnas = [
+    Caso.id, Caso.lat, Caso.lon, Caso.timestamp, Caso.probabilidades, Caso.municipio, Caso.enfermedad_principal
+]
+
+
+def _rangos_de(puntos):
+    """Rangos de celda que cubren la vecindad de los puntos; None si son demasiados"""
+    rangos = set()
+    for fila in puntos:
+        rangos.update(rangos_bbox(*bbox_radio(fila.lat, fila.lon, 2 * EPS_KM)))
+        if len(rangos) > MAX_RANGOS_ZONA:
+            return None
+    return rangos
+
+
+def _leer_ventana(inicio, fin, rangos):
+    """Casos de la ventana dentro de los rangos de celda (todos con rangos=None)"""
+    consulta = db.select(*_columnas).where(Caso.timestamp >= inicio, Caso.timestamp <= fin)
+    if rangos is not None:
+        consulta = consulta.where(db.or_(*[db.and_(Caso.celda >= a, Caso.celda < b) for a, b in rangos]))
+    return db.session.execute(consulta).all()
+
+
+def _grupos_con_nuevos(filas, inicio_ventana, ids_nuevos):
+    """DBSCAN ponderado sobre la ventana: índices de los grupos que tienen casos nuevos"""
+    if not filas:
+        return []
+    lat = np.array([f.lat for f in filas])
+    lon = np.array([f.lon for f in filas])
+    dias = np.array([(f.timestamp - inicio_ventana).total_seconds() / 86400 for f in filas])
+    pesos = np.array([peso_caso(f.probabilidades) for f in filas])
+
+    etiquetas = DBSCAN(
+        eps=EPS_KM, min_samples=MIN_PESO, algorithm='ball_tree'
+    ).fit_predict(_caracteristicas(lat, lon, dias, float(lat.mean())), sample_weight=pesos)
+
+    grupos = []
+    for etiqueta in set(etiquetas) - {-1}:
+        indices = np.flatnonzero(etiquetas == etiqueta)
+        # Los grupos sin casos nuevos no cambiaron desde la última ejecución
+        if any(filas[i].id in ids_nuevos for i in indices):
+            grupos.append(indices)
+    return grupos
+
+
+def _miembros(brote):
+    """Casos del brote; los detectados antes de casos_brotes toman los de su extensión y periodo"""
+    filas = db.session.execute(
+        db.select(*_columnas).join(CasoBrote, CasoBrote.caso_id == Caso.id).where(CasoBrote.brote_id == brote.id)
+    ).all()
+    if filas:
+        return filas
+    rangos = rangos_bbox(*bbox_radio(brote.lat, brote.lon, brote.radio_km))
+    filas = db.session.execute(
+        db.select(*_columnas).where(
+            Caso.timestamp.between(brote.inicio, brote.fin),
+            db.or_(*[db.and_(Caso.celda >= a, Caso.celda < b) for a, b in rangos])
+        )
+    ).all()
+    return [f for f in filas if haversine_km(brote.lat, brote.lon, f.lat, f.lon) <= brote.radio_km]
+
+
+def _resumir(filas, pesos):
+    lat = float(np.average([f.lat for f in filas], weights=pesos))
+    lon = float(np.average([f.lon for f in filas], weights=pesos))
+    radio = max(haversine_km(lat, lon, f.lat, f.lon) for f in filas)
+    por_enfermedad = Counter(f.enfermedad_principal for f in filas if f.enfermedad_principal)
+    municipios = Counter(f.municipio for f in filas if f.municipio)
+    return {
+        'lat': lat,
+        'lon': lon,
+        'radio_km': round(max(radio, EPS_KM), 3),
+        'municipio': municipios.most_common(1)[0][0] if municipios else None,
+        'inicio': min(f.timestamp for f in filas),
+        'fin': max(f.timestamp for f in filas),
+        'total_casos': len(filas),
+        'peso': round(float(sum(pesos)), 3),
+        'enfermedad_principal': por_enfermedad.most_common(1)[0][0] if por_enfermedad else None,
+        'por_enfermedad': dict(por_enfermedad)
+    }
+
+
+def _brote_existente(activos, resumen):
+    """Brote activo con el que se solapa el grupo, si lo hay"""
+    for brote in activos:
+        distancia = haversine_km(brote.lat, brote.lon, resumen['lat'], resumen['lon'])
+        cercano = distancia <= max(brote.radio_km, resumen['radio_km']) + EPS_KM
+        reciente = brote.fin >= resumen['inicio'] - timedelta(days=EPS_DIAS)
+        if cercano and reciente:
+            return brote
+    return None
+
+
+def _procesar_paso(nuevos, referencia, activos):
+    """Agrupa la ventana que termina en referencia alrededor de los casos nuevos"""
+    inicio_ventana = referencia - timedelta(days=VENTANA_DIAS)
+    ids_nuevos = {f.id for f in nuevos}
+
+    # Un grupo se encadena más allá de la vecindad de los casos nuevos: la lectura
+    # se amplía alrededor de sus miembros hasta que ninguno quede en el borde
+    puntos = {f.id: f for f in nuevos}
+    rangos = _rangos_de(puntos.values())
+    while True:
+        filas = _leer_ventana(inicio_ventana, referencia, rangos)
+        grupos = _grupos_con_nuevos(filas, inicio_ventana, ids_nuevos)
+        if rangos is None:
+            break
+        puntos.update((filas[i].id, filas[i]) for indices in grupos for i in indices)
+        ampliados = _rangos_de(puntos.values())
+        if ampliados is not None and ampliados <= rangos:
+            break
+        rangos = ampliados
+
+    creados, actualizados = 0, 0
+    for indices in grupos:
+        miembros = [filas[i] for i in indices]
+        resumen = _resumir(miembros, [peso_caso(f.probabilidades) for f in miembros])
+        brote = _brote_existente(activos, resumen)
+        if brote:
+            # Se suman los casos nuevos a los que ya tenía: el grupo de esta ventana
+            # no incluye los que salieron de ella
+            anteriores = _miembros(brote)
+            ids = {f.id for f in anteriores}
+            miembros = anteriores + [f for f in miembros if f.id not in ids]
+            for campo, valor in _resumir(miembros, [peso_caso(f.probabilidades) for f in miembros]).items():
+                setattr(brote, campo, valor)
+            actualizados += 1
+        else:
+            brote = Brote(**resumen)
+            db.session.add(brote)
+            activos.append(brote)
+            ids = set()
+            creados += 1
+        db.session.flush()
+        nuevos_miembros = [{'brote_id': brote.id, 'caso_id': f.id} for f in miembros if f.id not in ids]
+        if nuevos_miembros:
+            db.session.execute(CasoBrote.__table__.insert(), nuevos_miembros)
+
+    _cerrar_inactivos(activos, inicio_ventana)
+    return creados, actualizados
+
+
+def _cerrar_inactivos(activos, limite):
+    """Cierra los brotes sin casos desde limite"""
+    for brote in list(activos):
+        if brote.fin < limite:
+            brote.estado = 'cerrado'
+            activos.remove(brote)
+
+
+def _casos_nuevos(estado):
+    """Casos dados de alta después de la marca de agua, en orden de captura.
+
+    Los ids de cambios_casos se confirman en orden (ver registrar_cambios), así
+    que un caso cuyo INSERT confirma tarde queda igual después de la marca; un
+    id de caso menor que el último visto sí podría confirmarse después. Sin
+    marca de cambios, o si los cambios pendientes ya se purgaron, se recurre
+    al id de caso.
+    """
+    consulta = db.select(Caso.id, Caso.lat, Caso.lon, Caso.timestamp)
+    primero = db.session.execute(db.select(db.func.min(CambioCaso.id))).scalar()
+    if estado.ultimo_cambio_id is None or (primero and estado.ultimo_cambio_id < primero - 1):
+        consulta = consulta.where(Caso.id > estado.ultimo_caso_id)
+    else:
+        consulta = consulta.where(Caso.id.in_(
+            db.select(CambioCaso.caso_id).where(
+                CambioCaso.id > estado.ultimo_cambio_id, CambioCaso.operacion == 'alta'
+            )
+        ))
+    return db.session.execute(consulta.order_by(Caso.timestamp, Caso.id)).all()
+
+
+def detectar_brotes(reiniciar=False):
+    """Procesa los casos nuevos desde la última ejecución en pasos de EPS_DIAS.
+
+    Cada paso solo relee la ventana deslizante alrededor de los casos nuevos,
+    así que el costo depende del volumen reciente y no del histórico completo.
+    """
+    estado = db.session.get(DeteccionBrotes, 1)
+    if estado is None:
+        estado = DeteccionBrotes(id=1, ultimo_caso_id=0)
+        db.session.add(estado)
+    if reiniciar:
+        db.session.execute(db.delete(CasoBrote))
+        db.session.execute(db.delete(Brote))
+        estado.ultimo_caso_id = 0
+        estado.ultimo_cambio_id = None
+
+    # La posición se lee antes que los casos: lo confirmado entre ambas lecturas
+    # se vuelve a procesar en la siguiente ejecución, y los miembros no se duplican
+    posicion = ultimo_cambio()
+    nuevos = _casos_nuevos(estado)
+
+    activos = list(db.session.execute(
+        db.select(Brote).where(Brote.estado == 'activo')
+    ).scalars())
+
+    creados, actualizados = 0, 0
+    inicio = 0
+    while inicio < len(nuevos):
+        limite = nuevos[inicio].timestamp + timedelta(days=EPS_DIAS)
+        fin = inicio
+        while fin < len(nuevos) and nuevos[fin].timestamp < limite:
+            fin += 1
+        paso = nuevos[inicio:fin]
+        c, a = _procesar_paso(paso, paso[-1].timestamp, activos)
+        creados += c
+        actualizados += a
+        inicio = fin
+
+    # También sin casos nuevos: un brote sin casos recientes deja de estar activo
+    ahora = datetime.utcnow()
+    _cerrar_inactivos(activos, ahora - timedelta(days=VENTANA_DIAS))
+
+    if nuevos:
+        estado.ultimo_caso_id = max(estado.ultimo_caso_id, max(f.id for f in nuevos))
+    estado.ultimo_cambio_id = posicion
+    estado.ejecutado = ahora
+    db.session.commit()
+
+    return {
+        'casos_nuevos': len(nuevos),
+        'brotes_creados': creados,
+        'brotes_actualizados': actualizados,
+        'brotes_activos': len(activos)
+    }
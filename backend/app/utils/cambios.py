@@ -0,0 +1,254 @@
+import logging
+import queue
+import select
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from backend.app import db
+from backend.app.models import Caso, CambioCaso
+from backend.app.utils.paginacion import CAMPOS_CASO, columnas_para
+from backend.app.utils.serializacion import dumps
+
+logger = logging.getLogger(__name__)
+
+OPERACIONES = ('alta', 'modificacion', 'baja')
+
+# Canal de LISTEN/NOTIFY en PostgreSQL
+CANAL = 'casos_cambios'
+
+# Clave del advisory lock que ordena las escrituras al registro de cambios
+_CLAVE_BLOQUEO = 0x6d6f736b
+
+TAMANO_PAGINA_CAMBIOS = 1000
+
+# Lotes de cambios pendientes por suscriptor antes de darlo por desbordado
+MAX_PENDIENTES = 100
+
+# Con LISTEN, relectura de respaldo por si se perdiera algún NOTIFY
+SONDEO_POSTGRES = 60
+
+
+class CambiosPurgados(Exception):
+    """La posición pedida es anterior al cambio más antiguo que se conserva"""
+
+
+# ==================== ESCRITURA ====================
+def registrar_cambios(caso_ids, operacion):
+    """Agrega los cambios a la transacción en curso; se publican al confirmarla.
+
+    En PostgreSQL el advisory lock (hasta el COMMIT) hace que los ids del
+    registro se confirmen en orden: un lector que ya vio el id N no puede
+    encontrarse después un N-1 nuevo. El NOTIFY también se entrega al confirmar.
+    """
+    filas = [{'caso_id': caso_id, 'operacion': operacion} for caso_id in caso_ids]
+    if not filas:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.select(db.func.pg_advisory_xact_lock(_CLAVE_BLOQUEO)))
+        db.session.execute(db.select(db.func.pg_notify(CANAL, '')))
+    db.session.execute(db.insert(CambioCaso), filas)
+
+
+def avisar_cambios():
+    """Despierta al difusor de este proceso; se llama después del commit.
+
+    En PostgreSQL lo hace el NOTIFY (también en los demás procesos); en SQLite
+    los otros procesos los ven en su siguiente sondeo.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        _difusor.despertar()
+
+
+def purgar_cambios(dias):
+    """Borra los cambios de más de `dias` días; siempre conserva el último"""
+    limite = datetime.utcnow() - timedelta(days=dias)
+    ultimo = db.session.execute(db.select(db.func.max(CambioCaso.id))).scalar() or 0
+    borrados = db.session.execute(
+        db.delete(CambioCaso).where(CambioCaso.creado < limite, CambioCaso.id < ultimo)
+    ).rowcount
+    db.session.commit()
+    return borrados
+
+
+# ==================== LECTURA ====================
+def _consulta_cambios(desde, limite):
+    """Cambios posteriores a desde con el estado actual del caso (None si ya no existe)"""
+    return (
+        db.select(CambioCaso.id.label('cambio_id'), CambioCaso.operacion, CambioCaso.caso_id,
+                  CambioCaso.creado, *columnas_para(CAMPOS_CASO))
+        .outerjoin(Caso, Caso.id == CambioCaso.caso_id)
+        .where(CambioCaso.id > desde)
+        .order_by(CambioCaso.id)
+        .limit(limite)
+    )
+
+
+def _a_dict(fila):
+    datos = fila._mapping
+    caso = None
+    if fila.operacion != 'baja' and datos['id'] is not None:
+        caso = {campo: datos[campo] for campo in CAMPOS_CASO}
+    return {
+        'id': fila.cambio_id,
+        'operacion': fila.operacion,
+        'caso_id': fila.caso_id,
+        'fecha': fila.creado,
+        'caso': caso
+    }
+
+
+def _verificar_posicion(conexion, desde):
+    primero = conexion.execute(db.select(db.func.min(CambioCaso.id))).scalar()
+    if desde and primero and desde < primero - 1:
+        raise CambiosPurgados(f'Los cambios anteriores a {primero} ya no se conservan; recarga el listado completo')
+
+
+def ultimo_cambio(conexion=None):
+    """Posición actual del feed (0 si no hay cambios)"""
+    return (conexion or db.session).execute(
+        db.select(db.func.coalesce(db.func.max(CambioCaso.id), 0))
+    ).scalar()
+
+
+def cambios_desde(desde, limite=TAMANO_PAGINA_CAMBIOS):
+    """(cambios, hay_mas) posteriores a la posición desde.
+
+    Lanza CambiosPurgados si desde es anterior a lo que se conserva.
+    """
+    _verificar_posicion(db.session, desde)
+    filas = db.session.execute(_consulta_cambios(desde, limite + 1)).all()
+    return [_a_dict(fila) for fila in filas[:limite]], len(filas) > limite
+
+
+def evento_sse(cambio):
+    """Evento SSE de un cambio; el id permite reanudar con Last-Event-ID"""
+    return b'id: %d\nevent: cambio\ndata: %s\n\n' % (cambio['id'], dumps(cambio))
+
+
+# ==================== DIFUSIÓN ====================
+class Suscripcion:
+    def __init__(self, desde):
+        self.desde = desde
+        self.cola = queue.Queue(MAX_PENDIENTES)
+        self.desbordada = False
+
+
+class Difusor:
+    """Un hilo por proceso lee cada cambio una vez y lo reparte a todas las conexiones SSE.
+
+    Con PostgreSQL espera NOTIFY en una conexión dedicada; con otras bases
+    despierta con avisar_cambios() o cada CAMBIOS_SONDEO segundos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = set()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._engine = None
+        self._sondeo = 2.0
+        self.ultimo = 0
+        self.rechazadas = 0
+
+    def suscribir(self, maximo=None):
+        """Nueva suscripción que recibe los cambios posteriores a su .desde.
+
+        Devuelve None si ya hay `maximo` suscripciones abiertas en este proceso.
+        """
+        with self._lock:
+            if maximo and len(self._suscriptores) >= maximo:
+                self.rechazadas += 1
+                return None
+            if self._hilo is None or not self._hilo.is_alive():
+                # El hilo no tiene contexto de app: se guardan engine y configuración
+                self._engine = db.engine
+                self._sondeo = current_app.config.get('CAMBIOS_SONDEO', 2.0)
+                with self._engine.connect() as conexion:
+                    self.ultimo = ultimo_cambio(conexion)
+                self._hilo = threading.Thread(target=self._bucle, name='difusor-cambios', daemon=True)
+                self._hilo.start()
+            suscripcion = Suscripcion(self.ultimo)
+            self._suscriptores.add(suscripcion)
+            return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscriptores.discard(suscripcion)
+
+    def despertar(self):
+        self._despertar.set()
+
+    def estadisticas(self):
+        return {
+            'suscriptores': len(self._suscriptores),
+            'rechazadas': self.rechazadas,
+            'ultimo_cambio': self.ultimo
+        }
+
+    def _repartir(self):
+        """Lee los cambios nuevos y los encola, ya serializados, en cada suscripción"""
+        while True:
+            with self._engine.connect() as conexion:
+                filas = conexion.execute(_consulta_cambios(self.ultimo, TAMANO_PAGINA_CAMBIOS)).all()
+            if not filas:
+                return
+            eventos = [(fila.cambio_id, evento_sse(_a_dict(fila))) for fila in filas]
+            with self._lock:
+                self.ultimo = eventos[-1][0]
+                for suscripcion in list(self._suscriptores):
+                    try:
+                        suscripcion.cola.put_nowait(eventos)
+                    except queue.Full:
+                        # Cliente lento: se corta su stream y se pone al día al reconectar
+                        suscripcion.desbordada = True
+                        self._suscriptores.discard(suscripcion)
+            if len(filas) < TAMANO_PAGINA_CAMBIOS:
+                return
+
+    def _bucle(self):
+        while True:
+            try:
+                if self._engine.dialect.name == 'postgresql':
+                    self._escuchar()
+                else:
+                    self._despertar.wait(self._sondeo)
+                    self._despertar.clear()
+                    self._repartir()
+            except Exception:
+                logger.exception('Error en el difusor de cambios')
+                time.sleep(5)
+
+    def _escuchar(self):
+        conexion = self._engine.raw_connection()
+        # Conexión propia para LISTEN: fuera del pool mientras viva el hilo
+        conexion.detach()
+        driver = conexion.driver_connection
+        try:
+            driver.autocommit = True
+            with driver.cursor() as cursor:
+                cursor.execute(f'LISTEN {CANAL}')
+            # Lo confirmado mientras no se escuchaba
+            self._repartir()
+            while True:
+                if select.select([driver], [], [], SONDEO_POSTGRES)[0]:
+                    driver.poll()
+                    driver.notifies.clear()
+                self._repartir()
+        finally:
+            conexion.close()
+
+
+_difusor = Difusor()
+
+
+def suscribir(maximo=None):
+    return _difusor.suscribir(maximo)
+
+
+def cancelar(suscripcion):
+    _difusor.cancelar(suscripcion)
+
+
+def estadisticas_cambios():
+    return _difusor.estadisticas()
@@ -0,0 +1,338 @@
+import logging
+from collections import defaultdict, deque
+from datetime import timedelta
+from itertools import islice
+from backend.app import db
+from backend.app.models import Caso
+from backend.app.utils.cambios import avisar_cambios, registrar_cambios
+from backend.app.utils.fonetica import (
+    clave_fonetica, distancia_edicion, normalizar_identificacion, similitud_trigramas, trigramas
+)
+from backend.app.utils.geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Dos reportes de la misma persona separados por más de VENTANA_DIAS son casos distintos (reinfección)
+VENTANA_DIAS = 30
+
+# Peso de cada señal en la similitud; un teléfono igual suma BONO_TELEFONO
+PESOS = {'nombre': 0.45, 'identificacion': 0.25, 'edad': 0.15, 'ubicacion': 0.15}
+BONO_TELEFONO = 0.10
+
+# Similitud desde la que un caso se marca como probable duplicado
+UMBRAL_DUPLICADO = 0.7
+
+# Similitud con la que ya no se buscan más candidatos al registrar
+UMBRAL_SEGURO = 0.95
+
+# Similitud desde la que se muestra un caso parecido para revisión manual
+UMBRAL_REVISION = 0.5
+
+# Comparaciones por caso dentro de un bloque: acota el costo de las claves muy comunes.
+# Al registrar se compara solo con los más recientes; el proceso en lote llega a más.
+MAX_CANDIDATOS = 200
+MAX_CANDIDATOS_REGISTRO = 25
+
+TAMANO_CONSULTA = 1000
+TAMANO_LOTE = 5000
+
+CAMPOS_COMPARACION = [
+    'id', 'identificacion', 'nombre', 'apellido', 'edad', 'genero', 'telefono',
+    'lat', 'lon', 'timestamp', 'clave_fonetica', 'duplicado_de'
+]
+_columnas = [getattr(Caso, campo) for campo in CAMPOS_COMPARACION]
+
+
+class Ficha:
+    """Datos de un caso para compararlo con otros; lo costoso se normaliza al primer uso"""
+    __slots__ = ('id', 'edad', 'genero', 'lat', 'lon', 'timestamp', 'clave', 'telefono_bloque',
+                 'duplicado_de', '_nombre', '_identificacion_cruda', '_identificacion', '_telefono',
+                 '_trigramas')
+
+    def __init__(self, caso):
+        self.id = caso.id
+        self.edad = caso.edad
+        self.genero = (caso.genero or '').lower() or None
+        self.lat = caso.lat
+        self.lon = caso.lon
+        self.timestamp = caso.timestamp
+        self.clave = getattr(caso, 'clave_fonetica', None) or clave_fonetica(caso.nombre, caso.apellido)
+        self.telefono_bloque = caso.telefono
+        self.duplicado_de = getattr(caso, 'duplicado_de', None)
+        self._nombre = f'{caso.nombre} {caso.apellido or ""}'
+        self._identificacion_cruda = caso.identificacion
+        self._identificacion = None
+        self._telefono = False
+        self._trigramas = None
+
+    @property
+    def trigramas(self):
+        if self._trigramas is None:
+            self._trigramas = trigramas(self._nombre)
+        return self._trigramas
+
+    @property
+    def identificacion(self):
+        if self._identificacion is None:
+            self._identificacion = normalizar_identificacion(self._identificacion_cruda)
+        return self._identificacion
+
+    @property
+    def telefono(self):
+        if self._telefono is False:
+            self._telefono = ''.join(c for c in str(self.telefono_bloque or '') if c.isdigit()) or None
+        return self._telefono
+
+
+def similitud(a, b, minimo=UMBRAL_DUPLICADO):
+    """Similitud entre 0 y 1 de dos fichas: nombre, identificación, edad, ubicación y teléfono.
+
+    Por debajo de `minimo` el valor es solo una cota inferior (se deja de calcular).
+    """
+    if a.genero and b.genero and a.genero != b.genero:
+        return 0.0
+    puntaje = PESOS['nombre'] * similitud_trigramas(a.trigramas, b.trigramas)
+    # Cota: aun con todo lo demás igual no alcanzaría el umbral
+    if puntaje + 1.0 - PESOS['nombre'] + BONO_TELEFONO < minimo:
+        return puntaje
+
+    distancia = distancia_edicion(a.identificacion, b.identificacion)
+    puntaje += PESOS['identificacion'] * (1.0 if distancia <= 1 else 0.5 if distancia == 2 else 0.0)
+
+    diferencia = abs(a.edad - b.edad)
+    puntaje += PESOS['edad'] * (1.0 if diferencia <= 1 else 0.5 if diferencia <= 3 else 0.0)
+
+    km = haversine_km(a.lat, a.lon, b.lat, b.lon)
+    puntaje += PESOS['ubicacion'] * (1.0 if km <= 1 else 0.5 if km <= 5 else 0.0)
+
+    if a.telefono and a.telefono == b.telefono:
+        puntaje += BONO_TELEFONO
+    return min(puntaje, 1.0)
+
+
+# ==================== AL REGISTRAR ====================
+def _candidatos(fichas, limite, excluir=()):
+    """Casos en los mismos bloques (clave fonética o teléfono) y ventana de fechas que las fichas.
+
+    Hasta `limite` por bloque; con un solo bloque, los más recientes (índice por bloque y fecha).
+    """
+    ventana = timedelta(days=VENTANA_DIAS)
+    desde = min(f.timestamp for f in fichas) - ventana
+    hasta = max(f.timestamp for f in fichas) + ventana
+    encontrados = {}
+    for columna, valores in ((Caso.clave_fonetica, {f.clave for f in fichas if f.clave}),
+                             (Caso.telefono, {f.telefono_bloque for f in fichas if f.telefono_bloque})):
+        valores = sorted(valores)
+        for i in range(0, len(valores), TAMANO_CONSULTA):
+            bloque = valores[i:i + TAMANO_CONSULTA]
+            consulta = db.select(*_columnas).where(columna.in_(bloque), Caso.timestamp.between(desde, hasta))
+            if len(bloque) == 1:
+                consulta = consulta.order_by(Caso.timestamp.desc())
+            filas = db.session.execute(consulta.limit(limite * len(bloque))).all()
+            for fila in filas:
+                if fila.id not in encontrados and fila.id not in excluir:
+                    encontrados[fila.id] = Ficha(fila)
+    return encontrados.values()
+
+
+def _por_bloque(fichas):
+    """Fichas por clave fonética y por teléfono, de la más reciente a la más antigua"""
+    por_clave = defaultdict(list)
+    por_telefono = defaultdict(list)
+    for ficha in sorted(fichas, key=lambda f: -f.id):
+        if ficha.clave:
+            por_clave[ficha.clave].append(ficha)
+        if ficha.telefono_bloque:
+            por_telefono[ficha.telefono_bloque].append(ficha)
+    return por_clave, por_telefono
+
+
+def buscar_duplicados(casos):
+    """Probables duplicados de casos recién insertados entre los registrados antes que ellos.
+
+    Incluye los anteriores del mismo lote. Devuelve {caso_id: {'duplicado_de',
+    'similar_a', 'similitud'}} solo para los casos que superan UMBRAL_DUPLICADO.
+    """
+    nuevas = sorted((Ficha(caso) for caso in casos), key=lambda f: f.id)
+    if not nuevas:
+        return {}
+    # Los del propio lote también son candidatos: el límite deja lugar para ellos
+    por_clave, por_telefono = _por_bloque(_candidatos(nuevas, MAX_CANDIDATOS_REGISTRO + len(nuevas)))
+    ventana = timedelta(days=VENTANA_DIAS)
+
+    raices = {}
+    duplicados = {}
+    for nueva in nuevas:
+        mejor, mejor_puntaje = None, UMBRAL_DUPLICADO
+        vistos = set()
+        for bloque in (por_clave.get(nueva.clave, ()), por_telefono.get(nueva.telefono_bloque, ())):
+            anteriores = (
+                candidato for candidato in bloque
+                if candidato.id < nueva.id and abs(candidato.timestamp - nueva.timestamp) <= ventana
+            )
+            for candidato in islice(anteriores, MAX_CANDIDATOS_REGISTRO):
+                if candidato.id in vistos:
+                    continue
+                vistos.add(candidato.id)
+                puntaje = similitud(nueva, candidato)
+                if puntaje >= mejor_puntaje:
+                    mejor, mejor_puntaje = candidato, puntaje
+                    if puntaje >= UMBRAL_SEGURO:
+                        break
+            if mejor_puntaje >= UMBRAL_SEGURO:
+                break
+        if mejor:
+            # Todo el grupo cuelga del caso más antiguo
+            raiz = raices.get(mejor.id) or mejor.duplicado_de or mejor.id
+            raices[nueva.id] = raiz
+            duplicados[nueva.id] = {'duplicado_de': raiz, 'similar_a': mejor.id, 'similitud': round(mejor_puntaje, 3)}
+    return duplicados
+
+
+def marcar_duplicados(casos):
+    """Busca duplicados de los casos recién insertados y guarda duplicado_de (sin commit)"""
+    duplicados = buscar_duplicados(casos)
+    if duplicados:
+        db.session.execute(
+            db.update(Caso.__table__).where(Caso.__table__.c.id == db.bindparam('caso_id')),
+            [{'caso_id': caso_id, 'duplicado_de': d['duplicado_de']} for caso_id, d in duplicados.items()]
+        )
+    return duplicados
+
+
+def retirar_de_grupo(caso):
+    """Antes de borrar un caso, su grupo pasa a colgar del siguiente más antiguo.
+
+    Devuelve los ids de los casos modificados (sin commit).
+    """
+    if caso.duplicado_de is not None:
+        return []
+    miembros = db.session.execute(
+        db.select(Caso.id).where(Caso.duplicado_de == caso.id).order_by(Caso.id)
+    ).scalars().all()
+    if not miembros:
+        return []
+    db.session.execute(db.update(Caso).where(Caso.id == miembros[0]).values(duplicado_de=None))
+    db.session.execute(
+        db.update(Caso).where(Caso.duplicado_de == caso.id, Caso.id != miembros[0]).values(duplicado_de=miembros[0])
+    )
+    return miembros
+
+
+def similares_a(caso):
+    """Casos de los mismos bloques parecidos a uno dado, del más al menos similar"""
+    ficha = Ficha(caso)
+    similares = []
+    for candidato in _candidatos([ficha], MAX_CANDIDATOS, excluir={caso.id}):
+        if abs(candidato.timestamp - ficha.timestamp) > timedelta(days=VENTANA_DIAS):
+            continue
+        puntaje = similitud(ficha, candidato, UMBRAL_REVISION)
+        if puntaje >= UMBRAL_REVISION:
+            similares.append((candidato.id, round(puntaje, 3)))
+    similares.sort(key=lambda s: -s[1])
+    return similares
+
+
+def grupos_duplicados(desde=0, limite=100):
+    """Grupos de probables duplicados, paginados por el id de su caso más antiguo.
+
+    Devuelve ([{'caso_id', 'casos'}], hay_mas).
+    """
+    raices = db.session.execute(
+        db.select(Caso.duplicado_de).where(Caso.duplicado_de > desde)
+        .group_by(Caso.duplicado_de).order_by(Caso.duplicado_de).limit(limite + 1)
+    ).scalars().all()
+    hay_mas = len(raices) > limite
+    raices = raices[:limite]
+    if not raices:
+        return [], False
+
+    grupos = {raiz: [] for raiz in raices}
+    casos = Caso.query.filter(db.or_(Caso.id.in_(raices), Caso.duplicado_de.in_(raices))).order_by(Caso.id)
+    for caso in casos:
+        grupos[caso.duplicado_de or caso.id].append(caso.to_dict())
+    return [{'caso_id': raiz, 'casos': miembros} for raiz, miembros in grupos.items()], hay_mas
+
+
+# ==================== EN LOTE ====================
+def agrupar_duplicados(al_avanzar=None):
+    """Recalcula los grupos de duplicados de toda la tabla y actualiza duplicado_de.
+
+    Recorre los casos ordenados por bloque (clave fonética y luego teléfono) y
+    fecha, con los índices de esas columnas, y compara cada caso solo con los
+    anteriores de su bloque dentro de la ventana de fechas: el costo crece con
+    n × tamaño de la ventana, no con n². Los pares similares se unen en grupos
+    (union-find) que cuelgan de su caso más antiguo.
+    """
+    ventana = timedelta(days=VENTANA_DIAS)
+    padres = {}
+
+    def raiz(caso_id):
+        while caso_id in padres:
+            # Compresión por mitades: cada paso acorta el camino
+            if padres[caso_id] in padres:
+                padres[caso_id] = padres[padres[caso_id]]
+            caso_id = padres[caso_id]
+        return caso_id
+
+    def unir(a, b):
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            # La raíz es siempre el id menor: el caso más antiguo del grupo
+            padres[max(ra, rb)] = min(ra, rb)
+
+    total = db.session.execute(db.select(db.func.count(Caso.id))).scalar()
+    comparaciones = 0
+    pares = 0
+    for paso, columna in enumerate((Caso.clave_fonetica, Caso.telefono)):
+        consulta = db.select(*_columnas).where(columna.isnot(None)).order_by(columna, Caso.timestamp)
+        bloque = None
+        anteriores = deque()
+        for n, fila in enumerate(db.session.execute(consulta.execution_options(yield_per=TAMANO_LOTE)), 1):
+            valor = getattr(fila, columna.key)
+            if valor != bloque:
+                bloque = valor
+                anteriores.clear()
+            ficha = Ficha(fila)
+            while anteriores and ficha.timestamp - anteriores[0].timestamp > ventana:
+                anteriores.popleft()
+            for anterior in anteriores:
+                comparaciones += 1
+                if similitud(ficha, anterior) >= UMBRAL_DUPLICADO:
+                    unir(ficha.id, anterior.id)
+                    pares += 1
+            anteriores.append(ficha)
+            if len(anteriores) > MAX_CANDIDATOS:
+                anteriores.popleft()
+            if al_avanzar and n % TAMANO_LOTE == 0:
+                al_avanzar(paso * total + n, 2 * total)
+
+    # Solo se escriben los casos cuyo grupo cambió
+    nuevos = {caso_id: raiz(caso_id) for caso_id in list(padres)}
+    actuales = dict(db.session.execute(
+        db.select(Caso.id, Caso.duplicado_de).where(Caso.duplicado_de.isnot(None))
+    ).all())
+    cambios = [
+        {'caso_id': caso_id, 'duplicado_de': nuevos.get(caso_id)}
+        for caso_id in set(nuevos) | set(actuales)
+        if nuevos.get(caso_id) != actuales.get(caso_id)
+    ]
+    for i in range(0, len(cambios), TAMANO_LOTE):
+        db.session.execute(
+            db.update(Caso.__table__).where(Caso.__table__.c.id == db.bindparam('caso_id')),
+            cambios[i:i + TAMANO_LOTE]
+        )
+    registrar_cambios(sorted(c['caso_id'] for c in cambios), 'modificacion')
+    db.session.commit()
+    avisar_cambios()
+
+    resumen = {
+        'casos': total,
+        'comparaciones': comparaciones,
+        'pares': pares,
+        'grupos': len(set(nuevos.values())),
+        'marcados': len(nuevos),
+        'actualizados': len(cambios)
+    }
+    logger.info('Grupos de duplicados recalculados', extra={'datos': resumen})
+    return resumen
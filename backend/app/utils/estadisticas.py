@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from backend.app import db
+from backend.app.models import CambioCaso, ResumenCaso
+
+# Las estadísticas se leen del resumen diario (resumen_casos), no de casos.
+# El rango de fechas es opcional: (:desde IS NULL OR fecha >= :desde)
+FILTRO_FECHAS = """
+    WHERE (:desde IS NULL OR fecha >= :desde)
+      AND (:hasta IS NULL OR fecha <= :hasta)
+"""
+
+# Una sola pasada con todos los agrupamientos del dashboard
+SQL_GROUPING_SETS = text("""
+    SELECT municipio, estado, genero, eps, es_zona_rural,
+           GROUPING(municipio) AS g_municipio,
+           GROUPING(estado) AS g_estado,
+           GROUPING(genero) AS g_genero,
+           GROUPING(eps) AS g_eps,
+           GROUPING(es_zona_rural) AS g_zona,
+           SUM(total) AS total,
+           SUM(suma_edad) AS suma_edad,
+           SUM(con_edad) AS con_edad
+    FROM resumen_casos
+""" + FILTRO_FECHAS + """
+    GROUP BY GROUPING SETS ((municipio), (estado), (genero), (eps), (es_zona_rural), ())
+""")
+
+# Fallback: un único GROUP BY por la combinación de dimensiones, sumado en Python
+SQL_COMBINACIONES = text("""
+    SELECT municipio, estado, genero, eps, es_zona_rural,
+           SUM(total) AS total,
+           SUM(suma_edad) AS suma_edad,
+           SUM(con_edad) AS con_edad
+    FROM resumen_casos
+""" + FILTRO_FECHAS + """
+    GROUP BY municipio, estado, genero, eps, es_zona_rural
+""")
+
+MAX_ENTRADAS_CACHE = 64
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def _sin_ceros(conteos):
+    # Las filas del resumen pueden quedar en cero tras cambios de estado o borrados.
+    # None se serializa como "null" igual que haría json sin ordenar claves.
+    return {('null' if clave is None else clave): n for clave, n in conteos.items() if n}
+
+
+def _resultado(total, por_municipio, por_estado, por_genero, por_eps, por_zona, suma_edad, con_edad):
+    edad_promedio = suma_edad / con_edad if con_edad else None
+    return {
+        'total_casos': total,
+        'por_municipio': _sin_ceros(por_municipio),
+        'por_estado': _sin_ceros(por_estado),
+        'por_genero': _sin_ceros(por_genero),
+        'por_eps': _sin_ceros(por_eps),
+        'por_zona': {
+            'rural': por_zona.get(True, 0),
+            'urbana': por_zona.get(False, 0)
+        },
+        'edad_promedio': round(edad_promedio, 1) if edad_promedio else None
+    }
+
+
+def _agregar_grouping_sets(parametros):
+    dimensiones = {'municipio': {}, 'estado': {}, 'genero': {}, 'eps': {}, 'es_zona_rural': {}}
+    grupos = {
+        'g_municipio': 'municipio', 'g_estado': 'estado', 'g_genero': 'genero',
+        'g_eps': 'eps', 'g_zona': 'es_zona_rural'
+    }
+    total, suma_edad, con_edad = 0, 0, 0
+
+    for fila in db.session.execute(SQL_GROUPING_SETS, parametros).mappings():
+        activas = [col for g, col in grupos.items() if fila[g] == 0]
+        if not activas:
+            total = fila['total'] or 0
+            suma_edad = fila['suma_edad'] or 0
+            con_edad = fila['con_edad'] or 0
+        else:
+            columna = activas[0]
+            dimensiones[columna][fila[columna]] = fila['total'] or 0
+
+    return _resultado(
+        total, dimensiones['municipio'], dimensiones['estado'], dimensiones['genero'],
+        dimensiones['eps'], dimensiones['es_zona_rural'], suma_edad, con_edad
+    )
+
+
+def _agregar_una_pasada(parametros):
+    por_municipio, por_estado, por_genero, por_eps, por_zona = {}, {}, {}, {}, {}
+    total, suma_edad, con_edad = 0, 0, 0
+
+    for fila in db.session.execute(SQL_COMBINACIONES, parametros).mappings():
+        n = fila['total'] or 0
+        total += n
+        suma_edad += fila['suma_edad'] or 0
+        con_edad += fila['con_edad'] or 0
+        por_municipio[fila['municipio']] = por_municipio.get(fila['municipio'], 0) + n
+        por_estado[fila['estado']] = por_estado.get(fila['estado'], 0) + n
+        por_genero[fila['genero']] = por_genero.get(fila['genero'], 0) + n
+        por_eps[fila['eps']] = por_eps.get(fila['eps'], 0) + n
+        zona = bool(fila['es_zona_rural']) if fila['es_zona_rural'] is not None else None
+        por_zona[zona] = por_zona.get(zona, 0) + n
+
+    return _resultado(
+        total, por_municipio, por_estado, por_genero, por_eps, por_zona, suma_edad, con_edad
+    )
+
+
+def calcular_estadisticas(desde=None, hasta=None):
+    """Calcula todas las estadísticas del dashboard en una sola consulta al resumen"""
+    parametros = {'desde': desde, 'hasta': hasta}
+    if db.engine.dialect.name == 'postgresql':
+        return _agregar_grouping_sets(parametros)
+    return _agregar_una_pasada(parametros)
+
+
+def posicion_datos():
+    """(último cambio, última fila del resumen): la misma en todos los procesos.
+
+    Toda escritura sobre casos agrega filas al resumen y al registro de cambios
+    en su transacción, así que la posición avanza con cada una.
+    """
+    return tuple(db.session.execute(db.select(
+        db.select(db.func.coalesce(db.func.max(CambioCaso.id), 0)).scalar_subquery(),
+        db.select(db.func.coalesce(db.func.max(ResumenCaso.id), 0)).scalar_subquery()
+    )).one())
+
+
+def _vigente(entrada, posicion):
+    return entrada and entrada['posicion'] == posicion and time.monotonic() < entrada['expira']
+
+
+def obtener_estadisticas(desde=None, hasta=None):
+    """Devuelve (cuerpo JSON, etag) desde la caché, recalculando si los datos cambiaron.
+
+    El etag sale de la posición de los datos y no del cuerpo: todos los workers
+    dan el mismo para la misma versión, y ninguno sirve una anterior aunque su
+    caché no haya visto la escritura.
+    """
+    ttl = current_app.config.get('ESTADISTICAS_TTL', 30)
+    clave = (desde, hasta)
+    # Se lee antes de calcular: el cuerpo nunca es más viejo que su etag
+    posicion = posicion_datos()
+    entrada = _cache.get(clave)
+    if _vigente(entrada, posicion):
+        return entrada['cuerpo'], entrada['etag']
+
+    # Un solo hilo recalcula; el resto espera y reutiliza el resultado
+    with _lock:
+        entrada = _cache.get(clave)
+        if _vigente(entrada, posicion):
+            return entrada['cuerpo'], entrada['etag']
+
+        cuerpo = current_app.json.dumps(calcular_estadisticas(desde, hasta))
+        if len(_cache) >= MAX_ENTRADAS_CACHE:
+            _cache.clear()
+        _cache[clave] = {
+            'cuerpo': cuerpo,
+            'posicion': posicion,
+            'etag': hashlib.sha1(f'{desde}|{hasta}|{posicion[0]}|{posicion[1]}'.encode()).hexdigest(),
+            'expira': time.monotonic() + ttl
+        }
+        return cuerpo, _cache[clave]['etag']
+
+
+def invalidar_estadisticas():
+    """Descarta la caché; se llama después de cada escritura sobre casos"""
+    _cache.clear()
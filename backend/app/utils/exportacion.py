@@ -0,0 +1,178 @@
+import csv
+import io
+import math
+import zlib
+from backend.app import db
+from backend.app.utils.paginacion import CAMPOS_CASO
+from backend.app.utils.scoring import modelo_actual
+from backend.app.utils.serializacion import lineas_ndjson
+
+FORMATOS = ('csv', 'parquet', 'ndjson')
+TIPOS_MIME = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+    'ndjson': 'application/x-ndjson'
+}
+
+# Filas leídas del cursor del servidor por bloque (= row group en Parquet)
+TAMANO_BLOQUE = 10000
+
+# Columnas escalares: todas las de to_dict() menos las JSON, que se aplanan
+CAMPOS_ESCALARES = [c for c in CAMPOS_CASO if c not in ('sintomas', 'probabilidades')] + ['enfermedad_principal']
+_POSICION_TIMESTAMP = CAMPOS_ESCALARES.index('timestamp')
+
+# Excel y LibreOffice ejecutan como fórmula una celda de texto que empieza así
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def columnas_exportacion(modelo=None):
+    """Encabezado: campos escalares, un 0/1 por síntoma, síntomas fuera del modelo y una probabilidad por enfermedad"""
+    modelo = modelo or modelo_actual()
+    return (
+        CAMPOS_ESCALARES
+        + [f'sintoma_{s}' for s in modelo.sintomas]
+        + ['sintomas_otros']
+        + [f'prob_{e}' for e in modelo.nombres]
+    )
+
+
+def _probabilidad(valor):
+    """Probabilidad como float; None si no es un número finito (datos previos a la validación)"""
+    if isinstance(valor, bool):
+        return None
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return valor if math.isfinite(valor) else None
+
+
+def _aplanar(fila, modelo, texto=False):
+    """Fila del select a lista de valores en el orden de columnas_exportacion()"""
+    datos = fila._mapping
+    valores = [datos[c] for c in CAMPOS_ESCALARES]
+    if texto and valores[_POSICION_TIMESTAMP] is not None:
+        # Mismo formato que la API (isoformat), no el str() de datetime
+        valores[_POSICION_TIMESTAMP] = valores[_POSICION_TIMESTAMP].isoformat()
+
+    sintomas = datos['sintomas'] if isinstance(datos['sintomas'], list) else []
+    presentes = set(sintomas)
+    valores += [1 if s in presentes else 0 for s in modelo.sintomas]
+    otros = [str(s) for s in sintomas if s not in modelo.indice]
+    valores.append(';'.join(otros) if otros else None)
+
+    probabilidades = datos['probabilidades'] if isinstance(datos['probabilidades'], dict) else {}
+    valores += [_probabilidad(probabilidades.get(e)) for e in modelo.nombres]
+    return valores
+
+
+def _sin_formulas(valores):
+    """Antepone ' al texto que una hoja de cálculo tomaría como fórmula (los números no cambian)"""
+    return [f"'{v}" if isinstance(v, str) and v.startswith(INICIOS_FORMULA) else v for v in valores]
+
+
+def _bloques(consulta):
+    """Filas en listas de TAMANO_BLOQUE leídas con cursor del servidor"""
+    resultado = db.session.execute(consulta.execution_options(yield_per=TAMANO_BLOQUE))
+    try:
+        for particion in resultado.partitions():
+            yield particion
+    finally:
+        resultado.close()
+
+
+# ==================== FORMATOS ====================
+def _csv(consulta, modelo):
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(columnas_exportacion(modelo))
+    for bloque in _bloques(consulta):
+        escritor.writerows(_sin_formulas(_aplanar(fila, modelo, texto=True)) for fila in bloque)
+        yield salida.getvalue().encode('utf-8')
+        salida.seek(0)
+        salida.truncate()
+    if salida.tell():
+        yield salida.getvalue().encode('utf-8')
+
+
+class _Sumidero(io.RawIOBase):
+    """Destino de escritura que entrega lo escrito entre bloques en lugar de acumularlo"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _parquet(consulta, modelo, compresion):
+    # pyarrow solo se carga al exportar Parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columnas = columnas_exportacion(modelo)
+    tipos = {
+        'id': pa.int64(), 'edad': pa.int64(), 'duplicado_de': pa.int64(), 'lat': pa.float64(), 'lon': pa.float64(),
+        'es_residencia_permanente': pa.bool_(), 'es_zona_rural': pa.bool_(),
+        'timestamp': pa.timestamp('us')
+    }
+    esquema = pa.schema(
+        [(c, tipos.get(c, pa.string())) for c in CAMPOS_ESCALARES]
+        + [(f'sintoma_{s}', pa.int8()) for s in modelo.sintomas]
+        + [('sintomas_otros', pa.string())]
+        + [(f'prob_{e}', pa.float64()) for e in modelo.nombres]
+    )
+
+    sumidero = _Sumidero()
+    with pq.ParquetWriter(sumidero, esquema, compression=compresion) as escritor:
+        for bloque in _bloques(consulta):
+            filas = [_aplanar(fila, modelo) for fila in bloque]
+            # Un row group por bloque: cada bloque se envía apenas se escribe
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array([f[i] for f in filas], type=esquema.field(i).type) for i in range(len(columnas))],
+                schema=esquema
+            ))
+            yield sumidero.vaciar()
+    yield sumidero.vaciar()
+
+
+def _gzip(partes):
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for parte in partes:
+        comprimido = compresor.compress(parte)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def generar_exportacion(consulta, formato, gzip=False):
+    """Genera el archivo por bloques; la memoria depende de TAMANO_BLOQUE, no del total.
+
+    La consulta debe seleccionar las columnas de CAMPOS_CASO y enfermedad_principal.
+    En Parquet gzip es la compresión interna de las columnas.
+    """
+    modelo = modelo_actual()
+    if formato == 'parquet':
+        return _parquet(consulta, modelo, 'gzip' if gzip else 'zstd')
+    if formato == 'ndjson':
+        partes = (
+            parte for bloque in _bloques(consulta)
+            for parte in lineas_ndjson(bloque, CAMPOS_CASO)
+        )
+    else:
+        partes = _csv(consulta, modelo)
+    return _gzip(partes) if gzip else partes
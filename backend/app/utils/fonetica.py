@@ -0,0 +1,125 @@
+import re
+import unicodedata
+
+# Partículas que no distinguen a una persona ("de la Cruz", "del Castillo")
+PARTICULAS = {'DE', 'DEL', 'LA', 'LAS', 'LOS', 'Y', 'DA', 'E'}
+
+# Reglas de pronunciación del español, en orden: cada una ve el resultado de las anteriores
+_REGLAS = [
+    (re.compile(r'X'), 'S'),
+    (re.compile(r'CH'), 'X'),
+    (re.compile(r'LL'), 'Y'),
+    (re.compile(r'QU'), 'K'),
+    (re.compile(r'G(?=[EI])'), 'J'),
+    (re.compile(r'GU(?=[EI])'), 'G'),
+    (re.compile(r'C(?=[EI])'), 'S'),
+    (re.compile(r'[CQ]'), 'K'),
+    (re.compile(r'Z'), 'S'),
+    (re.compile(r'[VW]'), 'B'),
+    (re.compile(r'H'), ''),
+    (re.compile(r'Y(?![AEIOU])'), 'I'),
+]
+_REPETIDAS = re.compile(r'(.)\1+')
+_VOCALES = re.compile(r'[AEIOU]')
+_NO_LETRAS = re.compile(r'[^A-Z ]+')
+_NO_ALFANUMERICOS = re.compile(r'[^0-9A-Z]+')
+
+
+def normalizar_texto(texto):
+    """Mayúsculas sin tildes ni signos: 'Rentería  Ñañez' -> 'RENTERIA NANEZ'"""
+    if not texto:
+        return ''
+    sin_tildes = unicodedata.normalize('NFD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_NO_LETRAS.sub(' ', sin_tildes.upper()).split())
+
+
+def normalizar_identificacion(identificacion):
+    """Solo dígitos y letras: '1.006.234-5' -> '10062345'"""
+    return _NO_ALFANUMERICOS.sub('', str(identificacion or '').upper())
+
+
+def palabras(texto):
+    """Palabras normalizadas sin partículas"""
+    return [p for p in normalizar_texto(texto).split() if p not in PARTICULAS]
+
+
+def fonetica(palabra):
+    """Esqueleto fonético: primera letra más consonantes según cómo suenan.
+
+    'Rentería', 'Renteria' -> 'RNTR'; 'Jhon', 'John' -> 'JN'; 'Caicedo', 'Caycedo' -> 'KSD'
+    """
+    palabra = normalizar_texto(palabra).replace(' ', '')
+    if not palabra:
+        return ''
+    for patron, reemplazo in _REGLAS:
+        palabra = patron.sub(reemplazo, palabra)
+    palabra = _REPETIDAS.sub(r'\1', palabra)
+    if not palabra:
+        return ''
+    return _REPETIDAS.sub(r'\1', palabra[0] + _VOCALES.sub('', palabra[1:]))
+
+
+def clave_fonetica(nombre, apellido):
+    """Clave de bloqueo de una persona: fonética del primer nombre y del primer apellido.
+
+    Se ordenan para que nombre y apellido intercambiados den la misma clave. Sin
+    apellido se usa la última palabra del nombre ("María Rentería" en un solo campo).
+    """
+    nombres = palabras(nombre)
+    apellidos = palabras(apellido)
+    if not nombres:
+        return None
+    partes = [nombres[0]]
+    if apellidos:
+        partes.append(apellidos[0])
+    elif len(nombres) > 1:
+        partes.append(nombres[-1])
+    return '-'.join(sorted(fonetica(p) for p in partes))[:60]
+
+
+def trigramas(texto):
+    """Trigramas de cada palabra, con relleno para que cuenten inicio y final"""
+    resultado = set()
+    for palabra in sorted(palabras(texto)):
+        relleno = f'  {palabra} '
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return frozenset(resultado)
+
+
+def similitud_trigramas(a, b):
+    """Coeficiente de Dice entre dos conjuntos de trigramas.
+
+    Castiga menos que Jaccard un error en una palabra corta ('Droa' por 'Dora').
+    """
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def distancia_edicion(a, b, maximo=2):
+    """Distancia de Damerau (letras cambiadas, sobrantes, faltantes o transpuestas).
+
+    Corta en maximo + 1: solo interesa saber si dos identificaciones son casi iguales.
+    """
+    # Las partes iguales al principio y al final no cambian la distancia
+    while a and b and a[0] == b[0]:
+        a, b = a[1:], b[1:]
+    while a and b and a[-1] == b[-1]:
+        a, b = a[:-1], b[:-1]
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    if not a or not b:
+        return len(a) + len(b)
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        actual = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            costo = 0 if a[i - 1] == b[j - 1] else 1
+            actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + costo)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                actual[j] = min(actual[j], anterior2[j - 2] + 1)
+        if min(actual) > maximo:
+            return maximo + 1
+        anterior2, anterior = anterior, actual
+    return min(anterior[-1], maximo + 1)
@@ -0,0 +1,116 @@
+import math
+
+# Celda espacial: geohash de 50 bits (10 caracteres, ~1 m) guardado como entero.
+# Un prefijo de geohash equivale a un rango contiguo de enteros, así que las
+# búsquedas por zona son rangos sobre un índice B-tree normal en cualquier motor.
+BITS_CELDA = 50
+
+# Máximo de celdas con que se cubre una caja antes de pasar a un nivel más grueso
+MAX_CELDAS = 16
+
+RADIO_TIERRA_KM = 6371.0088
+
+
+def _bits_por_eje(bits):
+    # El geohash empieza por longitud: con bits impares la longitud lleva uno más
+    return (bits + 1) // 2, bits // 2
+
+
+def _indice(valor, minimo, maximo, bits):
+    n = 1 << bits
+    i = int((valor - minimo) / (maximo - minimo) * n)
+    return min(max(i, 0), n - 1)
+
+
+def _entrelazar(ix, iy, bits):
+    bits_lon, bits_lat = _bits_por_eje(bits)
+    codigo = 0
+    for i in range(bits):
+        if i % 2 == 0:
+            bit = (ix >> (bits_lon - 1 - i // 2)) & 1
+        else:
+            bit = (iy >> (bits_lat - 1 - i // 2)) & 1
+        codigo = (codigo << 1) | bit
+    return codigo
+
+
+def celda_geo(lat, lon, bits=BITS_CELDA):
+    """Geohash entero de una coordenada, o None si no es una coordenada válida"""
+    if lat is None or lon is None:
+        return None
+    lat, lon = float(lat), float(lon)
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        # También descarta NaN: toda comparación con NaN es falsa
+        return None
+    bits_lon, bits_lat = _bits_por_eje(bits)
+    ix = _indice(lon, -180.0, 180.0, bits_lon)
+    iy = _indice(lat, -90.0, 90.0, bits_lat)
+    return _entrelazar(ix, iy, bits)
+
+
+def rangos_bbox(sur, oeste, norte, este):
+    """Rangos [inicio, fin) de celdas que cubren la caja, ya fusionados"""
+    for bits in range(BITS_CELDA, 0, -1):
+        bits_lon, bits_lat = _bits_por_eje(bits)
+        ix0, ix1 = _indice(oeste, -180.0, 180.0, bits_lon), _indice(este, -180.0, 180.0, bits_lon)
+        iy0, iy1 = _indice(sur, -90.0, 90.0, bits_lat), _indice(norte, -90.0, 90.0, bits_lat)
+        if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) <= MAX_CELDAS:
+            break
+
+    desplazamiento = BITS_CELDA - bits
+    codigos = sorted(
+        _entrelazar(ix, iy, bits)
+        for ix in range(ix0, ix1 + 1)
+        for iy in range(iy0, iy1 + 1)
+    )
+
+    rangos = []
+    for codigo in codigos:
+        inicio, fin = codigo << desplazamiento, (codigo + 1) << desplazamiento
+        if rangos and rangos[-1][1] == inicio:
+            rangos[-1][1] = fin
+        else:
+            rangos.append([inicio, fin])
+    return [tuple(r) for r in rangos]
+
+
+def bbox_radio(lat, lon, radio_km):
+    """Caja (sur, oeste, norte, este) que contiene el círculo de radio dado"""
+    d_lat = math.degrees(radio_km / RADIO_TIERRA_KM)
+    cos_lat = math.cos(math.radians(lat))
+    d_lon = 180.0 if cos_lat < 1e-9 else min(180.0, d_lat / cos_lat)
+    return (
+        max(lat - d_lat, -90.0), max(lon - d_lon, -180.0),
+        min(lat + d_lat, 90.0), min(lon + d_lon, 180.0)
+    )
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    d_p = p2 - p1
+    d_l = math.radians(lon2 - lon1)
+    a = math.sin(d_p / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(d_l / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parsear_bbox(valor):
+    """bbox=oeste,sur,este,norte (orden GeoJSON) -> (sur, oeste, norte, este)"""
+    try:
+        oeste, sur, este, norte = (float(v) for v in valor.split(','))
+    except ValueError:
+        raise ValueError('bbox debe tener el formato oeste,sur,este,norte')
+    if not (-90 <= sur <= norte <= 90 and -180 <= oeste <= este <= 180):
+        raise ValueError('bbox fuera de rango')
+    return sur, oeste, norte, este
+
+
+def parsear_cercania(valor, radio_km):
+    """near=lat,lon y radius_km -> (lat, lon, radio_km)"""
+    try:
+        lat, lon = (float(v) for v in valor.split(','))
+        radio_km = float(radio_km) if radio_km else 1.0
+    except ValueError:
+        raise ValueError('near debe tener el formato lat,lon y radius_km debe ser numérico')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not 0 < radio_km < math.inf:
+        raise ValueError('near o radius_km fuera de rango')
+    return lat, lon, radio_km
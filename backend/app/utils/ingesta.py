@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.app import db
+from backend.app.models import Caso
+from backend.app.utils.cambios import registrar_cambios
+from backend.app.utils.duplicados import marcar_duplicados
+from backend.app.utils.resumen import registrar_lote_en_resumen
+from backend.app.utils.validacion import validar_caso
+
+MAX_LOTE_CASOS = 5000
+
+# Tamaño de los IN (...) al buscar identificaciones existentes
+TAMANO_CONSULTA = 1000
+
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+TIPOS_CSV = ('text/csv', 'application/csv')
+
+CAMPOS_BOOLEANOS = ('es_residencia_permanente', 'es_zona_rural')
+CAMPOS_JSON = ('sintomas', 'probabilidades')
+
+_tabla = Caso.__table__
+
+
+# ==================== LECTURA DEL LOTE ====================
+def _fila_csv(fila):
+    """Convierte una fila CSV (todo texto) a los tipos que espera validar_caso"""
+    registro = {}
+    for campo, valor in fila.items():
+        if campo is None or valor is None or not valor.strip():
+            continue
+        valor = valor.strip()
+        if campo in CAMPOS_BOOLEANOS:
+            valor = valor.lower() in ('true', '1', 'si', 'sí')
+        elif campo in CAMPOS_JSON:
+            # JSON completo o lista separada por ';'
+            if valor[0] in '[{':
+                valor = json.loads(valor)
+            else:
+                valor = [s.strip() for s in valor.split(';') if s.strip()]
+        registro[campo] = valor
+    return registro
+
+
+def leer_lote(request):
+    """Lee el cuerpo como arreglo JSON, NDJSON o CSV según el Content-Type"""
+    tipo = request.mimetype
+    texto = request.get_data(as_text=True)
+
+    try:
+        if tipo in TIPOS_NDJSON:
+            registros = [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+        elif tipo in TIPOS_CSV:
+            registros = [_fila_csv(fila) for fila in csv.DictReader(io.StringIO(texto))]
+        else:
+            registros = json.loads(texto) if texto else None
+            if isinstance(registros, dict):
+                registros = registros.get('casos')
+    except (ValueError, csv.Error) as e:
+        raise ValueError(f'No se pudo leer el lote: {e}')
+
+    if not isinstance(registros, list) or not all(isinstance(r, dict) for r in registros):
+        raise ValueError('El lote debe ser una lista de casos')
+    return registros
+
+
+# ==================== INSERCIÓN ====================
+def _identificaciones_existentes(identificaciones):
+    """Consulta por conjuntos qué identificaciones ya están registradas: {identificacion: id}"""
+    existentes = {}
+    identificaciones = list(identificaciones)
+    for i in range(0, len(identificaciones), TAMANO_CONSULTA):
+        bloque = identificaciones[i:i + TAMANO_CONSULTA]
+        existentes.update(db.session.execute(
+            db.select(Caso.identificacion, Caso.id).where(Caso.identificacion.in_(bloque))
+        ).all())
+    return existentes
+
+
+def _insertar(filas):
+    """Inserta las filas en un executemany y devuelve {identificacion: id} de las insertadas.
+
+    En PostgreSQL y SQLite se usa ON CONFLICT DO NOTHING, de modo que una
+    identificación registrada en paralelo por otra petición se omite sin abortar el lote.
+    """
+    dialecto = db.engine.dialect.name
+    if dialecto in ('postgresql', 'sqlite'):
+        insertar = postgresql.insert if dialecto == 'postgresql' else sqlite.insert
+        sentencia = insertar(_tabla).on_conflict_do_nothing(
+            index_elements=['identificacion']
+        ).returning(_tabla.c.id, _tabla.c.identificacion)
+        return {fila.identificacion: fila.id for fila in db.session.execute(sentencia, filas)}
+
+    db.session.execute(_tabla.insert(), filas)
+    identificaciones = [fila['identificacion'] for fila in filas]
+    return dict(db.session.execute(
+        db.select(Caso.identificacion, Caso.id).where(Caso.identificacion.in_(identificaciones))
+    ).all())
+
+
+def ingerir_lote(registros, marcas=None, confirmar=True):
+    """Valida, deduplica e inserta un lote de casos en una sola transacción.
+
+    Devuelve un resultado por fila, en el mismo orden del lote. Los rechazos por
+    identificación ya registrada llevan el caso_id existente; los aceptados que
+    parecen la misma persona que otro caso, duplicado_de. marcas da la hora
+    de captura de cada fila (None = ahora), para casos tomados sin conexión.
+    Con confirmar=False el commit queda a cargo de quien llama.
+    """
+    resultados = [None] * len(registros)
+    candidatos = {}
+
+    # 1. Mismas reglas que registrar_caso, más duplicados dentro del propio lote
+    for i, registro in enumerate(registros):
+        try:
+            valores = validar_caso(registro)
+        except ValueError as e:
+            resultados[i] = {'fila': i, 'estado': 'rechazado', 'error': str(e)}
+            continue
+
+        identificacion = valores['identificacion']
+        if identificacion in candidatos:
+            resultados[i] = {
+                'fila': i, 'estado': 'rechazado',
+                'error': f'Identificación {identificacion} repetida en el lote (fila {candidatos[identificacion][0]})'
+            }
+            continue
+        candidatos[identificacion] = (i, valores)
+
+    # 2. Duplicados contra la base de datos en una consulta por conjuntos
+    for identificacion, caso_id in _identificaciones_existentes(candidatos).items():
+        i, _ = candidatos.pop(identificacion)
+        resultados[i] = {
+            'fila': i, 'estado': 'rechazado', 'caso_id': caso_id,
+            'error': f'Ya existe un caso registrado con la identificación {identificacion}'
+        }
+
+    # 3. Inserción masiva y actualización del resumen diario
+    if candidatos:
+        ahora = datetime.utcnow()
+        filas = []
+        for i, valores in candidatos.values():
+            valores['timestamp'] = marcas[i] if marcas and marcas[i] else ahora
+            filas.append(valores)
+
+        insertados = _insertar(filas)
+        nuevos = [
+            SimpleNamespace(id=insertados[valores['identificacion']], **valores)
+            for valores in filas if valores['identificacion'] in insertados
+        ]
+        registrar_lote_en_resumen(nuevos)
+        duplicados = marcar_duplicados(nuevos)
+        registrar_cambios(sorted(insertados.values()), 'alta')
+
+        perdidas = {}
+        if len(insertados) < len(candidatos):
+            # Registradas en paralelo por otra petición entre la consulta y el INSERT
+            perdidas = _identificaciones_existentes(set(candidatos) - set(insertados))
+        if confirmar:
+            db.session.commit()
+
+        for identificacion, (i, _) in candidatos.items():
+            if identificacion in insertados:
+                caso_id = insertados[identificacion]
+                resultados[i] = {'fila': i, 'estado': 'aceptado', 'id': caso_id}
+                if caso_id in duplicados:
+                    resultados[i]['duplicado_de'] = duplicados[caso_id]['duplicado_de']
+            else:
+                resultados[i] = {
+                    'fila': i, 'estado': 'rechazado', 'caso_id': perdidas.get(identificacion),
+                    'error': f'Ya existe un caso registrado con la identificación {identificacion}'
+                }
+
+    return resultados
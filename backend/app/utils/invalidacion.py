@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from backend.app import db
+from backend.app.models import CambioCaso, Caso
+from backend.app.utils.cambios import ultimo_cambio
+from backend.app.utils.mapa import invalidar_teselas, vaciar_teselas
+from backend.app.utils.series import invalidar_series
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos un proceso revisa el registro de cambios
+CACHES_SONDEO = 2
+
+# Con más cambios pendientes que estos no se leen uno a uno: se descarta todo
+MAX_CAMBIOS_DETALLE = 500
+
+_lock = threading.Lock()
+_proxima_revision = 0.0
+_visto = None
+
+
+# ==================== CACHÉS ENTRE PROCESOS ====================
+def _descartar_todo():
+    invalidar_series()
+    vaciar_teselas()
+
+
+def _aplicar(cambios):
+    """Invalida lo que tocan los cambios escritos por otros procesos"""
+    hoy = datetime.utcnow().date()
+    for operacion, lat, lon, timestamp in cambios:
+        if operacion != 'alta' or lat is None:
+            # Modificación (también re-escoring) o baja: no se sabe qué había antes
+            _descartar_todo()
+            return
+        invalidar_teselas(lat, lon)
+        if timestamp is not None and timestamp.date() < hoy:
+            # Alta con fecha de captura pasada (sincronización): cae en una cubeta cerrada
+            invalidar_series()
+
+
+def sincronizar_caches(forzar=False):
+    """Aplica a las cachés de este proceso los cambios nuevos del registro.
+
+    Cada worker de gunicorn tiene sus propias cachés y una escritura solo las
+    invalida en el proceso que la atendió; los demás se enteran aquí, como
+    mucho CACHES_SONDEO segundos después.
+    """
+    global _proxima_revision, _visto
+
+    ahora = time.monotonic()
+    if not forzar and ahora < _proxima_revision:
+        return
+    with _lock:
+        if not forzar and ahora < _proxima_revision:
+            return
+        _proxima_revision = ahora + CACHES_SONDEO
+        try:
+            posicion = ultimo_cambio()
+            if _visto is None or posicion <= _visto:
+                # Al arrancar las cachés están vacías: solo importa lo que venga después
+                _visto = posicion
+                return
+            if posicion - _visto > MAX_CAMBIOS_DETALLE:
+                _descartar_todo()
+            else:
+                _aplicar(db.session.execute(
+                    db.select(CambioCaso.operacion, Caso.lat, Caso.lon, Caso.timestamp)
+                    .outerjoin(Caso, Caso.id == CambioCaso.caso_id)
+                    .where(CambioCaso.id > _visto, CambioCaso.id <= posicion)
+                ).all())
+            _visto = posicion
+        except Exception:
+            # Sin tabla de cambios (base anterior a crear-tablas) las cachés quedan con su TTL
+            db.session.rollback()
+            logger.warning('No se pudo revisar el registro de cambios', exc_info=True)
+
+
+def configurar_invalidacion(app):
+    """Revisa el registro de cambios antes de las peticiones (cada CACHES_SONDEO segundos)"""
+    global CACHES_SONDEO
+    CACHES_SONDEO = app.config.get('CACHES_SONDEO', CACHES_SONDEO)
+    app.before_request(_antes_de_peticion)
+
+
+def _antes_de_peticion():
+    sincronizar_caches()
@@ -0,0 +1,130 @@
+import atexit
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Logger del paquete: los módulos usan logging.getLogger(__name__)
+LOGGER_APP = 'backend.app'
+
+# Datos personales que nunca salen en claro en los logs
+CAMPOS_OCULTOS = {'nombre', 'apellido', 'telefono', 'nombre_zona_rural'}
+CAMPOS_HASH = {'identificacion'}
+CAMPOS_UBICACION = {'lat', 'lon'}
+
+# Valores de la fila que los errores de la base copian en el mensaje
+_PARAMETROS_SQL = re.compile(r'\[parameters: .*?\](?=\n|$)', re.S)
+_DETALLE_CLAVE = re.compile(r'(Key \(.*?\))=\(.*?\)(?= already exists| is not present|\n|$)')
+
+_listener = None
+_clave_hash = b''
+
+
+def _seudonimo(valor):
+    """HMAC corto con SECRET_KEY: correlaciona registros sin permitir probar documentos"""
+    return 'hmac:' + hmac.new(_clave_hash, str(valor).encode(), hashlib.sha256).hexdigest()[:12]
+
+
+def _limpiar_texto(texto):
+    """Quita de mensajes y trazas los parámetros SQL y los valores de claves duplicadas"""
+    texto = _PARAMETROS_SQL.sub('[parameters: ***]', texto)
+    return _DETALLE_CLAVE.sub(r'\1=(***)', texto)
+
+
+def _ocultar(datos):
+    """Copia de datos con la PII redactada (recursivo sobre dicts y listas)"""
+    if isinstance(datos, list):
+        return [_ocultar(valor) for valor in datos]
+    if not isinstance(datos, dict):
+        return datos
+
+    limpio = {}
+    for clave, valor in datos.items():
+        if valor is None:
+            limpio[clave] = None
+        elif clave in CAMPOS_OCULTOS:
+            limpio[clave] = '***'
+        elif clave in CAMPOS_HASH:
+            limpio[clave] = _seudonimo(valor)
+        elif clave in CAMPOS_UBICACION:
+            # ~1 km de precisión
+            try:
+                limpio[clave] = round(float(valor), 2)
+            except (TypeError, ValueError):
+                limpio[clave] = '***'
+        else:
+            limpio[clave] = _ocultar(valor)
+    return limpio
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro: ts, nivel, logger, mensaje, datos y traza"""
+
+    def format(self, record):
+        registro = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': _limpiar_texto(record.getMessage()),
+        }
+        datos = getattr(record, 'datos', None)
+        if datos:
+            registro['datos'] = _ocultar(datos)
+        traza = getattr(record, 'traza', None)
+        if traza:
+            registro['traza'] = _limpiar_texto(traza)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class ColaHandler(QueueHandler):
+    """Encola el registro sin formatearlo: el JSON y la redacción se hacen en el hilo del listener"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.traza = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+            record.exc_text = None
+        datos = getattr(record, 'datos', None)
+        if isinstance(datos, dict):
+            record.datos = dict(datos)
+        return record
+
+
+def configurar_logs(app):
+    """Conecta el logger de la app a una cola atendida por un hilo de salida.
+
+    El nivel se controla con LOG_LEVEL (INFO por defecto). Se llama una vez por
+    proceso; con gunicorn cada worker tiene su propio listener. Requiere
+    SECRET_KEY en app.config para seudonimizar las identificaciones.
+    """
+    global _listener, _clave_hash
+
+    _clave_hash = app.config['SECRET_KEY'].encode()
+
+    nivel = os.getenv('LOG_LEVEL', 'INFO').upper()
+    logger = logging.getLogger(LOGGER_APP)
+    logger.setLevel(nivel)
+    logger.propagate = False
+    app.config['LOG_LEVEL'] = nivel
+
+    if _listener is not None:
+        return
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoJSON())
+
+    cola = queue.SimpleQueue()
+    logger.handlers = [ColaHandler(cola)]
+    _listener = QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
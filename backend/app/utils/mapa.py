@@ -0,0 +1,155 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from backend.app import db
+from backend.app.models import Caso
+from backend.app.utils.geo import BITS_CELDA, rangos_bbox
+
+MAX_ZOOM = 20
+
+# Cada tesela se agrupa en aproximadamente 2^SUBDIVISION × 2^SUBDIVISION clusters
+SUBDIVISION = 3
+
+MAX_TESELAS_CACHE = 4096
+
+# _generacion cambia en cada invalidación: una tesela calculada mientras tanto no se guarda.
+# Las escrituras de otros workers llegan por el registro de cambios (utils/invalidacion.py).
+_lock = threading.Lock()
+_cache = OrderedDict()
+_generacion = 0
+
+
+# ==================== CONSULTAS ESPACIALES ====================
+def filtro_zona(sur, oeste, norte, este):
+    """Condición indexada (rangos de celda) más la caja exacta de lat/lon"""
+    rangos = rangos_bbox(sur, oeste, norte, este)
+    return db.and_(
+        db.or_(*[db.and_(Caso.celda >= inicio, Caso.celda < fin) for inicio, fin in rangos]),
+        Caso.lat.between(sur, norte),
+        Caso.lon.between(oeste, este)
+    )
+
+
+# ==================== TESELAS ====================
+def limites_tesela(z, x, y):
+    """(sur, oeste, norte, este) de la tesela z/x/y en la proyección web mercator"""
+    n = 1 << z
+
+    def latitud(fila):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * fila / n))))
+
+    return latitud(y + 1), x / n * 360.0 - 180.0, latitud(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tesela_de(lat, lon, z):
+    """Tesela (x, y) que contiene la coordenada en el zoom z"""
+    n = 1 << z
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _bits_cluster(z):
+    # Celdas de geohash con ~2^SUBDIVISION divisiones de longitud por tesela
+    return min(2 * (z + SUBDIVISION), BITS_CELDA)
+
+
+def calcular_tesela(z, x, y):
+    """Clusters de la tesela: conteo, centroide y desglose por estado y enfermedad"""
+    divisor = 1 << (BITS_CELDA - _bits_cluster(z))
+    grupo = (Caso.celda // divisor).label('grupo')
+
+    consulta = db.select(
+        grupo,
+        Caso.estado,
+        Caso.enfermedad_principal,
+        db.func.count().label('total'),
+        db.func.sum(Caso.lat).label('suma_lat'),
+        db.func.sum(Caso.lon).label('suma_lon')
+    ).where(filtro_zona(*limites_tesela(z, x, y))).group_by(
+        grupo, Caso.estado, Caso.enfermedad_principal
+    )
+
+    clusters = {}
+    for fila in db.session.execute(consulta):
+        cluster = clusters.setdefault(fila.grupo, {
+            'total': 0, 'suma_lat': 0.0, 'suma_lon': 0.0,
+            'por_estado': {}, 'por_enfermedad': {}
+        })
+        cluster['total'] += fila.total
+        cluster['suma_lat'] += fila.suma_lat
+        cluster['suma_lon'] += fila.suma_lon
+        estado = fila.estado or 'null'
+        cluster['por_estado'][estado] = cluster['por_estado'].get(estado, 0) + fila.total
+        if fila.enfermedad_principal:
+            enfermedad = fila.enfermedad_principal
+            cluster['por_enfermedad'][enfermedad] = cluster['por_enfermedad'].get(enfermedad, 0) + fila.total
+
+    resultado = []
+    for clave, cluster in clusters.items():
+        resultado.append({
+            'celda': clave,
+            'lat': round(cluster['suma_lat'] / cluster['total'], 6),
+            'lon': round(cluster['suma_lon'] / cluster['total'], 6),
+            'total': cluster['total'],
+            'por_estado': cluster['por_estado'],
+            'por_enfermedad': cluster['por_enfermedad']
+        })
+
+    return {
+        'z': z, 'x': x, 'y': y,
+        'total': sum(c['total'] for c in resultado),
+        'clusters': resultado
+    }
+
+
+def obtener_tesela(z, x, y):
+    """Devuelve (cuerpo JSON, etag) de la tesela desde la caché LRU con TTL"""
+    ttl = current_app.config.get('TESELAS_TTL', 300)
+    clave = (z, x, y)
+
+    with _lock:
+        entrada = _cache.get(clave)
+        if entrada and time.monotonic() < entrada['expira']:
+            _cache.move_to_end(clave)
+            return entrada['cuerpo'], entrada['etag']
+        generacion = _generacion
+
+    cuerpo = current_app.json.dumps(calcular_tesela(z, x, y))
+    entrada = {
+        'cuerpo': cuerpo,
+        'etag': hashlib.sha1(cuerpo.encode()).hexdigest(),
+        'expira': time.monotonic() + ttl
+    }
+
+    with _lock:
+        if generacion == _generacion:
+            _cache[clave] = entrada
+            _cache.move_to_end(clave)
+            while len(_cache) > MAX_TESELAS_CACHE:
+                _cache.popitem(last=False)
+    return entrada['cuerpo'], entrada['etag']
+
+
+def invalidar_teselas(lat, lon):
+    """Descarta las teselas de todos los zooms que contienen la coordenada"""
+    global _generacion
+    if lat is None or lon is None:
+        return
+    with _lock:
+        _generacion += 1
+        for z in range(MAX_ZOOM + 1):
+            x, y = tesela_de(lat, lon, z)
+            _cache.pop((z, x, y), None)
+
+
+def vaciar_teselas():
+    """Descarta todas las teselas (cambios sin ubicación conocida o masivos)"""
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _cache.clear()
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites (segundos) del histograma de latencia por ruta
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_rutas = {}
+_colecciones = {}
+
+
+class _MetricasPeticion:
+    """Acumuladores de la petición en curso (viven en flask.g)"""
+    __slots__ = ('inicio', 'consultas', 'db', 'filas', 'tramos')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.db = 0.0
+        self.filas = 0
+        self.tramos = {}
+
+
+def _nueva_ruta():
+    return {
+        'buckets': [0] * (len(BUCKETS) + 1),
+        'suma': 0.0,
+        'conteo': 0,
+        'codigos': {},
+        'consultas': 0,
+        'db': 0.0,
+        'filas': 0,
+        'bytes': 0,
+        'tramos': {}
+    }
+
+
+# ==================== HOOKS DE SQLALCHEMY ====================
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicios_consulta', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info['inicios_consulta'].pop()
+    if not has_request_context():
+        return
+    actual = g.get('metricas')
+    if actual is None:
+        return
+    actual.consultas += 1
+    actual.db += duracion
+    # rowcount de SELECT lo informan drivers como psycopg2; SQLite devuelve -1
+    if cursor.rowcount and cursor.rowcount > 0 and statement.lstrip()[:6].upper() == 'SELECT':
+        actual.filas += cursor.rowcount
+
+
+# ==================== MIDDLEWARE ====================
+@contextmanager
+def tramo(nombre):
+    """Mide un tramo de la petición (p. ej. serialización) para Server-Timing y /api/metricas"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        actual = g.get('metricas') if has_request_context() else None
+        if actual is not None:
+            actual.tramos[nombre] = actual.tramos.get(nombre, 0.0) + time.perf_counter() - inicio
+
+
+def _registrar(ruta, metodo, codigo, actual, tamano):
+    duracion = time.perf_counter() - actual.inicio
+    with _lock:
+        datos = _rutas.setdefault((ruta, metodo), _nueva_ruta())
+        datos['buckets'][bisect_left(BUCKETS, duracion)] += 1
+        datos['suma'] += duracion
+        datos['conteo'] += 1
+        datos['codigos'][codigo] = datos['codigos'].get(codigo, 0) + 1
+        datos['consultas'] += actual.consultas
+        datos['db'] += actual.db
+        datos['filas'] += actual.filas
+        datos['bytes'] += tamano
+        for nombre, segundos in actual.tramos.items():
+            datos['tramos'][nombre] = datos['tramos'].get(nombre, 0.0) + segundos
+
+
+def _antes_de_peticion():
+    g.metricas = _MetricasPeticion()
+
+
+def _despues_de_peticion(respuesta):
+    actual = g.get('metricas')
+    if actual is None:
+        return respuesta
+
+    total = (time.perf_counter() - actual.inicio) * 1000
+    partes = [f'db;dur={actual.db * 1000:.2f};desc="{actual.consultas} consultas"']
+    partes += [f'{nombre};dur={segundos * 1000:.2f}' for nombre, segundos in actual.tramos.items()]
+    partes.append(f'app;dur={max(total - actual.db * 1000, 0):.2f}')
+    partes.append(f'total;dur={total:.2f}')
+    respuesta.headers['Server-Timing'] = ', '.join(partes)
+
+    # Se registra al cerrar la respuesta para incluir el tiempo de las respuestas en streaming
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    metodo = request.method
+    codigo = str(respuesta.status_code)
+    tamano = 0 if respuesta.is_streamed else (respuesta.content_length or 0)
+    respuesta.call_on_close(lambda: _registrar(ruta, metodo, codigo, actual, tamano))
+    return respuesta
+
+
+def configurar_metricas(app):
+    """Activa la instrumentación por petición (desactivable con METRICAS=false)"""
+    if os.getenv('METRICAS', 'true').lower() != 'true':
+        return
+    app.before_request(_antes_de_peticion)
+    app.after_request(_despues_de_peticion)
+
+
+# ==================== EXPORTACIÓN ====================
+def registrar_coleccion(prefijo, funcion):
+    """Publica en /api/metricas los valores numéricos del dict que devuelve funcion()"""
+    _colecciones[prefijo] = funcion
+
+
+def _etiquetas(**valores):
+    return ','.join(f'{clave}="{valor}"' for clave, valor in valores.items())
+
+
+def exportar_prometheus():
+    """Métricas en formato de texto de Prometheus.
+
+    Son por proceso: con varios workers de gunicorn cada uno expone las suyas
+    (la etiqueta pid permite distinguirlas al agregar).
+    """
+    pid = os.getpid()
+    with _lock:
+        rutas = {clave: {**datos, 'buckets': list(datos['buckets']),
+                         'codigos': dict(datos['codigos']), 'tramos': dict(datos['tramos'])}
+                 for clave, datos in _rutas.items()}
+
+    lineas = [
+        '# HELP moskito_peticion_segundos Latencia de las peticiones por ruta',
+        '# TYPE moskito_peticion_segundos histogram'
+    ]
+    for (ruta, metodo), datos in sorted(rutas.items()):
+        acumulado = 0
+        for limite, n in zip(BUCKETS + ('+Inf',), datos['buckets']):
+            acumulado += n
+            lineas.append(f'moskito_peticion_segundos_bucket{{{_etiquetas(ruta=ruta, metodo=metodo, le=limite, pid=pid)}}} {acumulado}')
+        lineas.append(f'moskito_peticion_segundos_sum{{{_etiquetas(ruta=ruta, metodo=metodo, pid=pid)}}} {datos["suma"]:.6f}')
+        lineas.append(f'moskito_peticion_segundos_count{{{_etiquetas(ruta=ruta, metodo=metodo, pid=pid)}}} {datos["conteo"]}')
+
+    contadores = [
+        ('moskito_peticiones_total', 'Peticiones por ruta y código HTTP', None),
+        ('moskito_sql_consultas_total', 'Sentencias SQL ejecutadas', 'consultas'),
+        ('moskito_sql_segundos_total', 'Tiempo en la base de datos', 'db'),
+        ('moskito_sql_filas_total', 'Filas devueltas por SELECT (si el driver las informa)', 'filas'),
+        ('moskito_respuesta_bytes_total', 'Bytes de respuesta serializados (sin streaming)', 'bytes'),
+    ]
+    for nombre, ayuda, campo in contadores:
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} counter')
+        for (ruta, metodo), datos in sorted(rutas.items()):
+            if campo is None:
+                for codigo, n in sorted(datos['codigos'].items()):
+                    lineas.append(f'{nombre}{{{_etiquetas(ruta=ruta, metodo=metodo, codigo=codigo, pid=pid)}}} {n}')
+            else:
+                lineas.append(f'{nombre}{{{_etiquetas(ruta=ruta, metodo=metodo, pid=pid)}}} {datos[campo]}')
+
+    lineas.append('# HELP moskito_tramo_segundos_total Tiempo por tramo medido dentro de la ruta')
+    lineas.append('# TYPE moskito_tramo_segundos_total counter')
+    for (ruta, metodo), datos in sorted(rutas.items()):
+        for tramo_nombre, segundos in sorted(datos['tramos'].items()):
+            lineas.append(f'moskito_tramo_segundos_total{{{_etiquetas(ruta=ruta, metodo=metodo, tramo=tramo_nombre, pid=pid)}}} {segundos:.6f}')
+
+    for prefijo, funcion in sorted(_colecciones.items()):
+        for clave, valor in funcion().items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                lineas.append(f'# TYPE moskito_{prefijo}_{clave} gauge')
+                lineas.append(f'moskito_{prefijo}_{clave}{{{_etiquetas(pid=pid)}}} {valor}')
+
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,207 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from backend.app import db
+from backend.app.models import Caso, ModeloPesos
+from backend.app.utils.cambios import avisar_cambios, registrar_cambios
+from backend.app.utils.mapa import vaciar_teselas
+from backend.app.utils.series import invalidar_series
+from backend.app.utils.scoring import (
+    ENFERMEDADES, VERSION_BASE, cargar_pesos, enfermedad_principal, modelo_actual, puntajes_lote
+)
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos un proceso revisa si cambió el modelo activo
+MODELO_TTL = 30
+
+TAMANO_LOTE_REESCORING = 5000
+
+_lock = threading.Lock()
+_proxima_revision = 0.0
+
+
+# ==================== REGISTRO DE VERSIONES ====================
+def validar_pesos(enfermedades):
+    """Comprueba la forma {enfermedad: {sintoma: peso > 0}}; lanza ValueError"""
+    if not isinstance(enfermedades, dict) or not enfermedades:
+        raise ValueError('Se requiere un objeto {enfermedad: {síntoma: peso}}')
+    for enfermedad, pesos in enfermedades.items():
+        if not isinstance(enfermedad, str) or not enfermedad or len(enfermedad) > 30:
+            raise ValueError(f'Nombre de enfermedad no válido: {enfermedad!r}')
+        if not isinstance(pesos, dict) or not pesos:
+            raise ValueError(f'{enfermedad}: se requiere al menos un síntoma con peso')
+        for sintoma, peso in pesos.items():
+            if isinstance(peso, bool) or not isinstance(peso, (int, float)) or peso <= 0:
+                raise ValueError(f'{enfermedad}.{sintoma}: el peso debe ser un número positivo')
+    return enfermedades
+
+
+def leer_archivo(ruta):
+    """Lee un modelo desde JSON: {"version": "...", "enfermedades": {...}}"""
+    with open(ruta, encoding='utf-8') as archivo:
+        datos = json.load(archivo)
+    version = str(datos.get('version') or '').strip()
+    if not version or len(version) > 40:
+        raise ValueError('El archivo debe incluir "version" (máximo 40 caracteres)')
+    return version, validar_pesos(datos.get('enfermedades'))
+
+
+def publicar_modelo(version, enfermedades, activar=True):
+    """Guarda una versión nueva de los pesos y, si se pide, la deja activa"""
+    validar_pesos(enfermedades)
+    if version == VERSION_BASE or db.session.execute(
+        db.select(ModeloPesos.id).where(ModeloPesos.version == version)
+    ).first():
+        raise ValueError(f'La versión {version} ya existe')
+
+    db.session.add(ModeloPesos(version=version, enfermedades=enfermedades))
+    db.session.flush()
+    if activar:
+        activar_modelo(version)
+    db.session.commit()
+
+
+def activar_modelo(version):
+    """Marca la versión como activa (VERSION_BASE vuelve a los pesos del código)"""
+    if version != VERSION_BASE and not db.session.execute(
+        db.select(ModeloPesos.id).where(ModeloPesos.version == version)
+    ).first():
+        raise ValueError(f'La versión {version} no existe')
+
+    db.session.execute(db.update(ModeloPesos).where(ModeloPesos.activo).values(activo=False))
+    if version != VERSION_BASE:
+        db.session.execute(
+            db.update(ModeloPesos).where(ModeloPesos.version == version)
+            .values(activo=True, activado=datetime.utcnow())
+        )
+    db.session.commit()
+
+
+def modelo_activo():
+    """(versión, pesos) del modelo activo en la base; los del código si no hay ninguno"""
+    fila = db.session.execute(
+        db.select(ModeloPesos.version, ModeloPesos.enfermedades).where(ModeloPesos.activo).limit(1)
+    ).first()
+    if fila is None:
+        return VERSION_BASE, ENFERMEDADES
+    return fila.version, fila.enfermedades
+
+
+# ==================== RECARGA EN CALIENTE ====================
+def sincronizar_modelo(forzar=False):
+    """Carga en este proceso el modelo activo si cambió (como mucho cada MODELO_TTL s)"""
+    global _proxima_revision
+
+    ahora = time.monotonic()
+    if not forzar and ahora < _proxima_revision:
+        return modelo_actual()
+    with _lock:
+        if not forzar and ahora < _proxima_revision:
+            return modelo_actual()
+        _proxima_revision = ahora + MODELO_TTL
+        try:
+            version, enfermedades = modelo_activo()
+        except Exception:
+            # Sin tabla (base anterior a crear-tablas) se siguen usando los pesos cargados
+            db.session.rollback()
+            logger.warning('No se pudo leer el modelo activo', exc_info=True)
+            return modelo_actual()
+        if version != modelo_actual().version:
+            cargar_pesos(enfermedades, version)
+            logger.info('Modelo de pesos cargado', extra={'datos': {'version': version}})
+    return modelo_actual()
+
+
+def configurar_modelos(app):
+    """Revisa el modelo activo antes de las peticiones (cada MODELO_TTL segundos)"""
+    global MODELO_TTL
+    MODELO_TTL = app.config.get('MODELO_TTL', MODELO_TTL)
+    app.before_request(_antes_de_peticion)
+
+
+def _antes_de_peticion():
+    sincronizar_modelo()
+
+
+# ==================== RE-ESCORING ====================
+def _guardar_puntajes(valores, version):
+    if db.engine.dialect.name == 'postgresql':
+        # Un solo UPDATE por lote: executemany de psycopg2 haría un viaje por fila
+        db.session.execute(
+            db.text(
+                'UPDATE casos AS c SET probabilidades = v.p::json, enfermedad_principal = v.e, '
+                'modelo_version = :version '
+                'FROM unnest(CAST(:ids AS integer[]), CAST(:probs AS text[]), CAST(:enfs AS text[])) '
+                'AS v(id, p, e) WHERE c.id = v.id'
+            ),
+            {
+                'version': version,
+                'ids': [v['caso_id'] for v in valores],
+                'probs': [json.dumps(v['probabilidades']) for v in valores],
+                'enfs': [v['enfermedad_principal'] for v in valores]
+            }
+        )
+    else:
+        tabla = Caso.__table__
+        db.session.execute(
+            db.update(tabla).where(tabla.c.id == db.bindparam('caso_id')),
+            [dict(v, modelo_version=version) for v in valores]
+        )
+
+
+def reescorar_casos(lote=TAMANO_LOTE_REESCORING, pausa=0.0, al_avanzar=None):
+    """Recalcula probabilidades de los casos con otra versión del modelo.
+
+    Avanza por id en transacciones cortas de `lote` casos, así que la API
+    sigue atendiendo mientras corre. Si se activa otra versión a mitad de
+    camino, vuelve a empezar con ella. Cada lote queda en el registro de
+    cambios como modificación: los clientes SSE y las cachés de los workers
+    (series por enfermedad, teselas) lo ven aunque esto corra en otro proceso.
+    Devuelve el número de casos actualizados.
+    """
+    modelo = sincronizar_modelo(forzar=True)
+    total = 0
+    ultimo_id = 0
+    while True:
+        pendientes = db.or_(Caso.modelo_version.is_(None), Caso.modelo_version != modelo.version)
+        filas = db.session.execute(
+            db.select(Caso.id, Caso.sintomas).where(pendientes, Caso.id > ultimo_id)
+            .order_by(Caso.id).limit(lote)
+        ).all()
+        if not filas:
+            break
+
+        puntajes = puntajes_lote(
+            [f.sintomas if isinstance(f.sintomas, list) else [] for f in filas], modelo
+        )
+        valores = []
+        for fila, puntaje in zip(filas, puntajes):
+            probabilidades = modelo.a_dict(puntaje)
+            valores.append({
+                'caso_id': fila.id,
+                'probabilidades': probabilidades,
+                'enfermedad_principal': enfermedad_principal(probabilidades)
+            })
+        _guardar_puntajes(valores, modelo.version)
+        registrar_cambios([v['caso_id'] for v in valores], 'modificacion')
+        db.session.commit()
+        avisar_cambios()
+        invalidar_series()
+        vaciar_teselas()
+
+        ultimo_id = filas[-1].id
+        total += len(filas)
+        if al_avanzar:
+            al_avanzar(total, ultimo_id)
+        if pausa:
+            time.sleep(pausa)
+
+        # Otra versión activada mientras tanto: se reinicia el recorrido con ella
+        if sincronizar_modelo().version != modelo.version:
+            modelo = modelo_actual()
+            ultimo_id = 0
+
+    return total
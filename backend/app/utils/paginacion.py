@@ -0,0 +1,66 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+from backend.app.models import Caso
+
+# Mismo orden de claves que Caso.to_dict()
+CAMPOS_CASO = [
+    'id', 'identificacion', 'nombre', 'apellido', 'telefono', 'edad', 'genero',
+    'eps', 'sintomas', 'probabilidades', 'modelo_version', 'estado',
+    'lat', 'lon', 'municipio', 'barrio', 'es_residencia_permanente',
+    'es_zona_rural', 'nombre_zona_rural', 'duplicado_de', 'timestamp'
+]
+
+# Columnas necesarias para construir el cursor aunque no se pidan
+CAMPOS_CURSOR = ['timestamp', 'id']
+
+TAMANO_PAGINA = 100
+TAMANO_PAGINA_MAX = 1000
+TAMANO_LOTE_STREAM = 1000
+
+
+def parsear_campos(valor):
+    """Convierte el parámetro fields=a,b,c en una lista validada de campos"""
+    if not valor:
+        return list(CAMPOS_CASO)
+
+    campos = [c.strip() for c in valor.split(',') if c.strip()]
+    invalidos = [c for c in campos if c not in CAMPOS_CASO]
+    if invalidos:
+        raise ValueError(f"Campos no válidos: {', '.join(invalidos)}")
+
+    # Respetar el orden de to_dict() y eliminar repetidos
+    return [c for c in CAMPOS_CASO if c in campos]
+
+
+def columnas_para(campos, extra=()):
+    """Columnas a seleccionar: las pedidas más las del cursor y las extra"""
+    nombres = list(campos)
+    for campo in list(CAMPOS_CURSOR) + list(extra):
+        if campo not in nombres:
+            nombres.append(campo)
+    return [getattr(Caso, nombre) for nombre in nombres]
+
+
+def codificar_cursor(timestamp, caso_id):
+    crudo = f"{timestamp.isoformat()}|{caso_id}".encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        crudo = base64.urlsafe_b64decode(cursor + relleno).decode()
+        timestamp, caso_id = crudo.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(caso_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor no válido')
+
+
+def despues_de_cursor(timestamp, caso_id):
+    """Condición keyset para el orden (timestamp desc, id desc)"""
+    return or_(
+        Caso.timestamp < timestamp,
+        and_(Caso.timestamp == timestamp, Caso.id < caso_id)
+    )
+
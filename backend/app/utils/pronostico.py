@@ -0,0 +1,203 @@
+import hashlib
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import joblib
+import numpy as np
+from sklearn.linear_model import PoissonRegressor
+from backend.app import db
+from backend.app.models import Pronostico, ResumenCaso
+
+# Días de historia con los que se entrena cada municipio
+VENTANA_DIAS = 365
+HORIZONTE_DIAS = 14
+HORIZONTES = (7, 14)
+
+# Los rezagos usan hasta 28 días; con menos historia se usa la media móvil
+MIN_DIAS = 42
+REZAGO_MAX = 28
+
+# Orígenes del backtest del que salen los intervalos (últimos días de la serie)
+ORIGENES_BACKTEST = 21
+CUANTILES = (0.05, 0.95)
+
+
+# ==================== MODELO ====================
+def _caracteristicas(historia, fecha):
+    """Variables del día `fecha` a partir de los conteos anteriores (escala log)"""
+    dia_semana = np.zeros(6)
+    if fecha.weekday() < 6:
+        dia_semana[fecha.weekday()] = 1
+    return np.concatenate([
+        [np.log1p(historia[-1]), np.log1p(historia[-7:].mean()), np.log1p(historia[-REZAGO_MAX:].mean())],
+        dia_semana
+    ])
+
+
+def _matriz(conteos, inicio):
+    """(X, y) para los días con REZAGO_MAX días de historia"""
+    filas = [
+        _caracteristicas(conteos[:t], inicio + timedelta(days=t))
+        for t in range(REZAGO_MAX, len(conteos))
+    ]
+    return np.array(filas), conteos[REZAGO_MAX:]
+
+
+def _ajustar(conteos, inicio, previo=None):
+    """Regresión de Poisson; arranca desde los coeficientes del modelo anterior si existe"""
+    X, y = _matriz(conteos, inicio)
+    modelo = previo if previo is not None else PoissonRegressor(alpha=1e-3, max_iter=300)
+    modelo.set_params(warm_start=previo is not None)
+    return modelo.fit(X, y)
+
+
+def _proyectar(modelo, historia, fecha, dias):
+    """Pronóstico recursivo: cada día esperado alimenta los rezagos del siguiente"""
+    historia = list(historia)
+    esperados = []
+    for h in range(dias):
+        x = _caracteristicas(np.array(historia), fecha + timedelta(days=h))
+        esperado = float(modelo.predict(x[None, :])[0])
+        esperados.append(esperado)
+        historia.append(esperado)
+    return np.array(esperados)
+
+
+def _backtest(conteos, inicio):
+    """Errores (origen × horizonte) de pronosticar los últimos días con un modelo que no los vio"""
+    corte = len(conteos) - ORIGENES_BACKTEST - HORIZONTE_DIAS + 1
+    modelo = _ajustar(conteos[:corte], inicio)
+    errores = []
+    for origen in range(corte, corte + ORIGENES_BACKTEST):
+        esperados = _proyectar(modelo, conteos[:origen], inicio + timedelta(days=origen), HORIZONTE_DIAS)
+        errores.append(conteos[origen:origen + HORIZONTE_DIAS] - esperados)
+    return np.array(errores)
+
+
+def entrenar_municipio(tarea):
+    """Entrena un municipio y devuelve su pronóstico. Corre en los procesos del pool.
+
+    No toca la base de datos: recibe la serie ya leída y solo escribe el archivo
+    joblib del modelo.
+    """
+    conteos = np.asarray(tarea['conteos'], dtype=np.float64)
+    inicio = tarea['inicio']
+    primer_dia = inicio + timedelta(days=len(conteos))
+    fechas = [(primer_dia + timedelta(days=h)).isoformat() for h in range(HORIZONTE_DIAS)]
+
+    # Historia corta: media de la última semana con intervalo de Poisson
+    activos = np.flatnonzero(conteos)
+    if len(conteos) - (activos[0] if len(activos) else len(conteos)) < MIN_DIAS + ORIGENES_BACKTEST:
+        media = float(conteos[-7:].mean())
+        margen = 1.645 * np.sqrt(media)
+        return {
+            'municipio': tarea['municipio'],
+            'huella': tarea['huella'],
+            'modelo': 'media_movil',
+            'predicciones': [
+                {'fecha': f, 'esperado': round(media, 2),
+                 'inferior': round(max(media - margen, 0.0), 2), 'superior': round(media + margen, 2)}
+                for f in fechas
+            ],
+            'error_medio': None
+        }
+
+    errores = _backtest(conteos, inicio)
+    inferior, superior = np.quantile(errores, CUANTILES, axis=0)
+
+    previo = None
+    if tarea.get('archivo') and os.path.exists(tarea['archivo']):
+        try:
+            previo = joblib.load(tarea['archivo'])['modelo']
+        except Exception:
+            previo = None
+    modelo = _ajustar(conteos, inicio, previo)
+    if tarea.get('archivo'):
+        joblib.dump({'modelo': modelo, 'hasta': tarea['hasta'], 'huella': tarea['huella']}, tarea['archivo'])
+
+    esperados = _proyectar(modelo, conteos, primer_dia, HORIZONTE_DIAS)
+    return {
+        'municipio': tarea['municipio'],
+        'huella': tarea['huella'],
+        'modelo': 'poisson',
+        'predicciones': [
+            {'fecha': f, 'esperado': round(float(e), 2),
+             'inferior': round(max(float(e + i), 0.0), 2), 'superior': round(max(float(e + s), 0.0), 2)}
+            for f, e, i, s in zip(fechas, esperados, inferior, superior)
+        ],
+        'error_medio': [round(float(v), 2) for v in np.abs(errores).mean(axis=0)]
+    }
+
+
+# ==================== ENTRENAMIENTO ====================
+def _series_municipios(hasta):
+    """{municipio: conteos diarios} de los VENTANA_DIAS días que terminan en hasta"""
+    inicio = hasta - timedelta(days=VENTANA_DIAS - 1)
+    filas = db.session.execute(
+        db.select(ResumenCaso.municipio, ResumenCaso.fecha, db.func.sum(ResumenCaso.total))
+        .where(ResumenCaso.fecha >= inicio, ResumenCaso.fecha <= hasta, ResumenCaso.municipio.isnot(None))
+        .group_by(ResumenCaso.municipio, ResumenCaso.fecha)
+    ).all()
+
+    series = {}
+    for municipio, fecha, total in filas:
+        if not total:
+            continue
+        conteos = series.setdefault(municipio, np.zeros(VENTANA_DIAS))
+        conteos[(fecha - inicio).days] += total
+    return inicio, series
+
+
+def _archivo(directorio, municipio):
+    nombre = re.sub(r'[^a-z0-9]+', '_', municipio.lower()).strip('_') or 'municipio'
+    huella = hashlib.sha1(municipio.encode()).hexdigest()[:8]
+    return os.path.join(directorio, f'{nombre}_{huella}.joblib')
+
+
+def entrenar_pronosticos(directorio, procesos=None, completo=False):
+    """Reentrena los municipios cuya serie cambió y guarda sus pronósticos.
+
+    Las series llegan hasta ayer (el día en curso está incompleto). Un
+    municipio sin casos nuevos ni cambio de día conserva su pronóstico.
+    """
+    hasta = datetime.utcnow().date() - timedelta(days=1)
+    inicio, series = _series_municipios(hasta)
+    os.makedirs(directorio, exist_ok=True)
+
+    anteriores = dict(db.session.execute(db.select(Pronostico.municipio, Pronostico.huella)).all())
+    tareas = []
+    for municipio, conteos in series.items():
+        huella = hashlib.sha1(hasta.isoformat().encode() + conteos.tobytes()).hexdigest()
+        if not completo and anteriores.get(municipio) == huella:
+            continue
+        tareas.append({
+            'municipio': municipio, 'conteos': conteos, 'inicio': inicio, 'hasta': hasta,
+            'huella': huella, 'archivo': _archivo(directorio, municipio)
+        })
+
+    if procesos == 1 or len(tareas) <= 1:
+        resultados = [entrenar_municipio(tarea) for tarea in tareas]
+    else:
+        # spawn: los hijos no heredan el pool de conexiones ni los hilos (logs, difusor) del padre
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+            resultados = list(pool.map(entrenar_municipio, tareas))
+
+    existentes = {
+        p.municipio: p for p in db.session.execute(
+            db.select(Pronostico).where(Pronostico.municipio.in_([r['municipio'] for r in resultados]))
+        ).scalars()
+    } if resultados else {}
+    for resultado in resultados:
+        pronostico = existentes.get(resultado['municipio']) or Pronostico(municipio=resultado['municipio'])
+        pronostico.hasta = hasta
+        pronostico.modelo = resultado['modelo']
+        pronostico.huella = resultado['huella']
+        pronostico.predicciones = resultado['predicciones']
+        pronostico.error_medio = resultado['error_medio']
+        pronostico.generado = datetime.utcnow()
+        db.session.add(pronostico)
+    db.session.commit()
+
+    return {'municipios': len(series), 'entrenados': len(resultados), 'sin_cambios': len(series) - len(tareas)}
@@ -0,0 +1,116 @@
+from backend.app import db
+from backend.app.models import Caso, ResumenCaso
+
+DIMENSIONES = ['municipio', 'estado', 'genero', 'eps', 'es_zona_rural']
+
+_tabla = ResumenCaso.__table__
+
+
+def clave_caso(caso):
+    """Combinación de dimensiones del resumen a la que pertenece un caso"""
+    clave = {dim: getattr(caso, dim) for dim in DIMENSIONES}
+    clave['fecha'] = caso.timestamp.date()
+    return clave
+
+
+def _aplicar_delta(clave, total, suma_edad, con_edad):
+    """Agrega una fila con los contadores a sumar (negativos para restar).
+
+    Nunca se actualizan filas existentes: con varias filas por combinación un
+    UPDATE las sumaría todas. Las lecturas suman y compactar_resumen las junta.
+    """
+    if total or suma_edad or con_edad:
+        db.session.execute(
+            _tabla.insert().values(total=total, suma_edad=suma_edad, con_edad=con_edad, **clave)
+        )
+
+
+def _delta_caso(caso, signo):
+    edad = caso.edad
+    return signo, signo * (edad or 0), signo * (1 if edad is not None else 0)
+
+
+def registrar_en_resumen(caso):
+    _aplicar_delta(clave_caso(caso), *_delta_caso(caso, 1))
+
+
+def retirar_de_resumen(caso, clave=None):
+    _aplicar_delta(clave or clave_caso(caso), *_delta_caso(caso, -1))
+
+
+def registrar_lote_en_resumen(casos):
+    """Agrupa los casos por combinación y aplica un solo delta por fila del resumen"""
+    deltas = {}
+    for caso in casos:
+        clave = tuple(sorted(clave_caso(caso).items()))
+        total, suma_edad, con_edad = deltas.get(clave, (0, 0, 0))
+        d_total, d_suma, d_con = _delta_caso(caso, 1)
+        deltas[clave] = (total + d_total, suma_edad + d_suma, con_edad + d_con)
+
+    for clave, delta in deltas.items():
+        _aplicar_delta(dict(clave), *delta)
+
+
+def mover_en_resumen(caso, clave_anterior):
+    """Refleja un cambio de estado/EPS: resta de la fila vieja y suma a la nueva"""
+    clave_nueva = clave_caso(caso)
+    if clave_nueva != clave_anterior:
+        retirar_de_resumen(caso, clave_anterior)
+        registrar_en_resumen(caso)
+
+
+def reconstruir_resumen():
+    """Recalcula el resumen completo desde casos y devuelve el número de filas"""
+    fecha = db.func.date(Caso.timestamp)
+    columnas = [getattr(Caso, dim) for dim in DIMENSIONES]
+    origen = db.select(
+        fecha,
+        *columnas,
+        db.func.count(Caso.id),
+        db.func.coalesce(db.func.sum(Caso.edad), 0),
+        db.func.count(Caso.edad)
+    ).group_by(fecha, *columnas)
+
+    db.session.execute(_tabla.delete())
+    db.session.execute(
+        _tabla.insert().from_select(
+            ['fecha'] + DIMENSIONES + ['total', 'suma_edad', 'con_edad'],
+            origen
+        )
+    )
+    db.session.commit()
+    return db.session.execute(db.select(db.func.count()).select_from(_tabla)).scalar()
+
+
+def compactar_resumen():
+    """Junta las filas de cada combinación en una sola y devuelve cuántas quedaron menos.
+
+    Borra con RETURNING exactamente las filas que suma: los deltas que se
+    confirman durante la compactación se conservan aparte, sin perderse.
+    """
+    tope = db.session.execute(db.select(db.func.max(_tabla.c.id))).scalar()
+    if tope is None:
+        return 0
+
+    columnas = ['fecha'] + DIMENSIONES
+    borradas = db.session.execute(
+        _tabla.delete().where(_tabla.c.id <= tope).returning(
+            *[_tabla.c[col] for col in columnas], _tabla.c.total, _tabla.c.suma_edad, _tabla.c.con_edad
+        )
+    ).all()
+
+    sumas = {}
+    for fila in borradas:
+        clave = tuple(getattr(fila, col) for col in columnas)
+        total, suma_edad, con_edad = sumas.get(clave, (0, 0, 0))
+        sumas[clave] = (total + fila.total, suma_edad + fila.suma_edad, con_edad + fila.con_edad)
+
+    filas = [
+        dict(zip(columnas, clave), total=total, suma_edad=suma_edad, con_edad=con_edad)
+        for clave, (total, suma_edad, con_edad) in sumas.items()
+        if total or suma_edad or con_edad
+    ]
+    if filas:
+        db.session.execute(_tabla.insert(), filas)
+    db.session.commit()
+    return len(borradas) - len(filas)
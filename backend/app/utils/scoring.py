@@ -1,3 +1,8 @@
+import itertools
+import os
+from functools import lru_cache
+import numpy as np
+
 ENFERMEDADES = {
     'dengue': {'fiebre_alta': 2, 'dolor_cabeza': 1, 'erupciones': 2, 'dolor_muscular': 2, 'nauseas': 1},
     'zika': {'fiebre_baja': 2, 'erupciones': 3, 'conjuntivitis': 2, 'dolor_articular': 1},
@@ -7,11 +12,171 @@ ENFERMEDADES = {
 }
 MAX_PUNTOS = {enf: sum(pesos.values()) for enf, pesos in ENFERMEDADES.items()}
 
+# ==================== MATRIZ DE PESOS PRECOMPILADA ====================
+# Con hasta MAX_SINTOMAS_TABLA síntomas se precalculan todas las combinaciones
+# posibles (2^n filas); por encima, cada combinación se calcula al pedirla.
+MAX_SINTOMAS_TABLA = 16
+TAMANO_CACHE = int(os.getenv('SCORING_CACHE', '4096'))
+
+
+# Versión de los pesos escritos en este módulo (ver utils/modelos.py)
+VERSION_BASE = 'base'
+
+
+class MatrizPesos:
+    """Tablas de pesos compiladas a NumPy. Inmutable: cambiar pesos crea otra."""
+
+    _generaciones = itertools.count(1)
+
+    def __init__(self, enfermedades, version=VERSION_BASE):
+        # version identifica el modelo; generacion, esta compilación (clave de la caché)
+        self.version = version
+        self.generacion = next(self._generaciones)
+        self.nombres = list(enfermedades)
+        self.sintomas = sorted({sint for pesos in enfermedades.values() for sint in pesos})
+        self.indice = {sint: i for i, sint in enumerate(self.sintomas)}
+
+        # pesos[s, e] = peso del síntoma s en la enfermedad e
+        self.pesos = np.zeros((len(self.sintomas), len(self.nombres)), dtype=np.float64)
+        for e, enf in enumerate(self.nombres):
+            for sint, peso in enfermedades[enf].items():
+                self.pesos[self.indice[sint], e] = peso
+        self.max_puntos = np.array(
+            [sum(enfermedades[enf].values()) for enf in self.nombres], dtype=np.float64
+        )
+
+        # tabla[mascara] = probabilidades de ese conjunto de síntomas (bit i = síntoma i)
+        self.tabla = None
+        if len(self.sintomas) <= MAX_SINTOMAS_TABLA:
+            mascaras = np.arange(1 << len(self.sintomas))
+            bits = (mascaras[:, None] >> np.arange(len(self.sintomas))) & 1
+            self.tabla = self.porcentajes(bits.astype(np.float64))
+
+    def porcentajes(self, conteos):
+        """Probabilidades (casos × enfermedades) en porcentaje a partir de los conteos"""
+        puntos = conteos @ self.pesos
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.max_puntos > 0, (puntos / self.max_puntos) * 100, 0.0)
+
+    def mascara(self, sintomas):
+        """Bitmask canónico del conjunto de síntomas, o None si alguno se repite.
+
+        Los desconocidos se ignoran. Los repetidos suman varias veces en el
+        cálculo original, así que no tienen forma canónica como conjunto.
+        """
+        mascara = 0
+        for sint in sintomas:
+            i = self.indice.get(sint)
+            if i is not None:
+                bit = 1 << i
+                if mascara & bit:
+                    return None
+                mascara |= bit
+        return mascara
+
+    def fila_mascara(self, mascara):
+        if self.tabla is not None:
+            return self.tabla[mascara]
+        bits = [(mascara >> i) & 1 for i in range(len(self.sintomas))]
+        return self.porcentajes(np.array([bits], dtype=np.float64))[0]
+
+    def a_dict(self, fila):
+        return {
+            self.nombres[e]: round(float(fila[e]), 2)
+            for e in np.flatnonzero(fila > 0)
+        }
+
+
+_modelo = MatrizPesos(ENFERMEDADES)
+_sin_cache = 0
+
+
+def cargar_pesos(enfermedades, version=VERSION_BASE):
+    """Sustituye las tablas de pesos; la tabla precalculada y la caché se renuevan solas"""
+    global _modelo
+    _modelo = MatrizPesos(enfermedades, version)
+    _resultado_cacheado.cache_clear()
+    return _modelo
+
+
+def modelo_actual():
+    return _modelo
+
+
+def matriz_sintomas(lote, modelo=None):
+    """Matriz (casos × síntomas) con el número de veces que aparece cada síntoma.
+
+    Los síntomas desconocidos se ignoran y los repetidos cuentan varias veces,
+    igual que en el cálculo original síntoma a síntoma.
+    """
+    modelo = modelo or _modelo
+    filas, columnas = [], []
+    for i, sintomas in enumerate(lote):
+        for sint in sintomas:
+            j = modelo.indice.get(sint)
+            if j is not None:
+                filas.append(i)
+                columnas.append(j)
+
+    conteos = np.zeros((len(lote), len(modelo.sintomas)), dtype=np.float64)
+    np.add.at(conteos, (filas, columnas), 1)
+    return conteos
+
+
+def puntajes_lote(lote, modelo=None):
+    """Probabilidades (casos × enfermedades) en porcentaje, sin redondear"""
+    modelo = modelo or _modelo
+    return modelo.porcentajes(matriz_sintomas(lote, modelo))
+
+
+def calcular_probabilidades_lote(lote):
+    """Calcula las probabilidades de una lista de listas de síntomas en una sola operación"""
+    modelo = _modelo
+    return [modelo.a_dict(fila) for fila in puntajes_lote(lote, modelo)]
+
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def _resultado_cacheado(generacion, mascara):
+    # La generación va en la clave: un resultado calculado con pesos viejos nunca se sirve
+    modelo = _modelo
+    if modelo.generacion != generacion:
+        raise LookupError('Pesos cambiados durante el cálculo')
+    return modelo.a_dict(modelo.fila_mascara(mascara))
+
+
 def calcular_probabilidades(sintomas):
-    probabilidades = {}
-    for enf, pesos in ENFERMEDADES.items():
-        puntos = sum(pesos.get(sint, 0) for sint in sintomas)
-        prob = (puntos / MAX_PUNTOS[enf]) * 100 if MAX_PUNTOS[enf] > 0 else 0
-        if prob > 0:
-            probabilidades[enf] = round(prob, 2)
-    return probabilidades
+    """Probabilidades de un caso, servidas desde la caché por conjunto de síntomas"""
+    global _sin_cache
+    modelo = _modelo
+    mascara = modelo.mascara(sintomas)
+    if mascara is None:
+        _sin_cache += 1
+        return modelo.a_dict(puntajes_lote([sintomas], modelo)[0])
+    try:
+        # Copia: quien la recibe puede modificarla (p. ej. al guardarla en el caso)
+        return dict(_resultado_cacheado(modelo.generacion, mascara))
+    except LookupError:
+        return calcular_probabilidades(sintomas)
+
+
+def estadisticas_cache():
+    info = _resultado_cacheado.cache_info()
+    return {
+        'aciertos': info.hits,
+        'fallos': info.misses,
+        'tamano': info.currsize,
+        'tamano_max': info.maxsize,
+        'sin_cache': _sin_cache,
+        'generacion_pesos': _modelo.generacion,
+        'tabla_precalculada': int(_modelo.tabla is not None)
+    }
+
+
+def enfermedad_principal(probabilidades):
+    """Enfermedad con mayor probabilidad (la primera en caso de empate)"""
+    if not probabilidades or not isinstance(probabilidades, dict):
+        return None
+    try:
+        return max(probabilidades.items(), key=lambda item: item[1])[0]
+    except TypeError:
+        return None
@@ -0,0 +1,60 @@
+import gzip
+import json
+from datetime import date, datetime
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson está en requirements.txt
+    orjson = None
+
+# Filas por bloque escrito en las respuestas en streaming
+LINEAS_POR_BLOQUE = 500
+
+
+def _por_defecto(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f'No serializable: {type(valor).__name__}')
+
+
+if orjson is not None:
+    def dumps(datos):
+        """JSON compacto en bytes; orjson escribe datetime igual que isoformat()"""
+        return orjson.dumps(datos)
+else:
+    def dumps(datos):
+        """JSON compacto en bytes (respaldo con la librería estándar)"""
+        return json.dumps(datos, ensure_ascii=False, separators=(',', ':'), default=_por_defecto).encode()
+
+
+def filas_a_dicts(filas, campos):
+    """Filas de un select de columnas a dicts con las claves de Caso.to_dict().
+
+    Las columnas deben venir en el orden de campos (las extra, al final, se
+    descartan). El timestamp queda como datetime: lo convierte dumps().
+    """
+    return [dict(zip(campos, fila)) for fila in filas]
+
+
+def respuesta_json(datos, status=200, comprimir=False):
+    """Response JSON codificada con dumps() en lugar de jsonify; comprimir=True la envía en gzip"""
+    cuerpo = dumps(datos)
+    if not comprimir:
+        return Response(cuerpo, status=status, mimetype='application/json')
+    respuesta = Response(gzip.compress(cuerpo, 6), status=status, mimetype='application/json')
+    respuesta.headers['Content-Encoding'] = 'gzip'
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    return respuesta
+
+
+def lineas_ndjson(filas, campos):
+    """Una línea JSON por fila, agrupadas en bloques para reducir escrituras"""
+    bloque = []
+    for fila in filas:
+        bloque.append(dumps(dict(zip(campos, fila))))
+        if len(bloque) >= LINEAS_POR_BLOQUE:
+            yield b'\n'.join(bloque) + b'\n'
+            bloque = []
+    if bloque:
+        yield b'\n'.join(bloque) + b'\n'
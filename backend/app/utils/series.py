@@ -0,0 +1,200 @@
+import hashlib
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from backend.app import db
+from backend.app.models import Caso
+from backend.app.utils.scoring import modelo_actual
+from backend.app.utils.serializacion import dumps
+
+GRANULARIDADES = ('dia', 'semana')
+FILTROS_SERIE = ('municipio', 'estado', 'eps', 'zona_rural')
+
+MAX_ENTRADAS_CACHE = 128
+
+# Cubetas por respuesta: sin desde, la serie empieza en la más antigua que cabe
+MAX_CUBETAS = 3660
+FECHA_MINIMA = date(1900, 1, 1)
+
+# Cubetas cerradas por (granularidad, filtros, versión del modelo):
+# {'corte': inicio de la cubeta abierta, 'cubetas': {inicio: {...}}, 'expira': ...}
+# Las entradas no se modifican una vez guardadas. _generacion cambia al invalidar:
+# lo calculado antes de una invalidación no se guarda. Las escrituras atendidas
+# por otros workers llegan por el registro de cambios (utils/invalidacion.py).
+_lock = threading.Lock()
+_cerradas = {}
+_generacion = 0
+
+
+# ==================== CUBETAS ====================
+def inicio_cubeta(fecha, granularidad):
+    """Primer día de la cubeta que contiene la fecha (semanas epidemiológicas de domingo a sábado)"""
+    if granularidad == 'semana':
+        return fecha - timedelta(days=(fecha.weekday() + 1) % 7)
+    return fecha
+
+
+def semana_epidemiologica(inicio):
+    """Etiqueta AAAA-Sss: la semana 1 es la que tiene al menos cuatro días del año nuevo"""
+    anio = (inicio + timedelta(days=3)).year
+    enero_4 = date(anio, 1, 4)
+    primera = inicio_cubeta(enero_4, 'semana')
+    return f'{anio}-S{(inicio - primera).days // 7 + 1:02d}'
+
+
+def _siguiente(inicio, granularidad):
+    return inicio + timedelta(days=7 if granularidad == 'semana' else 1)
+
+
+def _expresion_cubeta(granularidad):
+    if db.engine.dialect.name == 'postgresql':
+        if granularidad == 'semana':
+            # date_trunc('week') empieza en lunes; se corre un día para empezar en domingo
+            un_dia = db.literal_column("INTERVAL '1 day'")
+            return db.func.date_trunc('week', Caso.timestamp + un_dia) - un_dia
+        return db.func.date_trunc('day', Caso.timestamp)
+
+    if granularidad == 'semana':
+        # strftime('%w'): 0 = domingo
+        return db.func.date(Caso.timestamp, db.func.printf('-%d days', db.func.strftime('%w', Caso.timestamp)))
+    return db.func.date(Caso.timestamp)
+
+
+def _a_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _condiciones(filtros):
+    condiciones = []
+    for campo in ('municipio', 'estado', 'eps'):
+        if filtros.get(campo):
+            condiciones.append(getattr(Caso, campo) == filtros[campo])
+    if filtros.get('zona_rural'):
+        # Literal para que aplique el índice parcial de zona rural
+        rural = filtros['zona_rural'].lower() == 'true'
+        condiciones.append(Caso.es_zona_rural == (db.true() if rural else db.false()))
+    return condiciones
+
+
+def _agregar(granularidad, filtros, desde=None, hasta=None):
+    """{inicio: {'total', 'por_enfermedad'}} para los casos con desde <= timestamp < hasta"""
+    cubeta = _expresion_cubeta(granularidad).label('cubeta')
+    consulta = db.select(
+        cubeta, Caso.enfermedad_principal, db.func.count(Caso.id)
+    ).where(*_condiciones(filtros)).group_by(cubeta, Caso.enfermedad_principal)
+    if desde:
+        consulta = consulta.where(Caso.timestamp >= datetime.combine(desde, datetime.min.time()))
+    if hasta:
+        consulta = consulta.where(Caso.timestamp < datetime.combine(hasta, datetime.min.time()))
+
+    cubetas = {}
+    for valor, enfermedad, total in db.session.execute(consulta):
+        datos = cubetas.setdefault(_a_fecha(valor), {'total': 0, 'por_enfermedad': {}})
+        datos['total'] += total
+        clave = 'null' if enfermedad is None else enfermedad
+        datos['por_enfermedad'][clave] = datos['por_enfermedad'].get(clave, 0) + total
+    return cubetas
+
+
+# ==================== CACHÉ DE CUBETAS CERRADAS ====================
+def _cubetas_cerradas(granularidad, filtros, corte):
+    """Cubetas anteriores a corte; solo se consulta lo que se cerró desde la última vez.
+
+    La consulta corre fuera del lock: una serie lenta no frena a las demás.
+    """
+    ttl = current_app.config.get('SERIES_TTL', 3600)
+    clave = (granularidad, tuple(sorted(filtros.items())), modelo_actual().version)
+
+    with _lock:
+        entrada = _cerradas.get(clave)
+        if entrada and time.monotonic() >= entrada['expira']:
+            entrada = None
+        if entrada and entrada['corte'] >= corte:
+            return entrada['cubetas']
+        generacion = _generacion
+
+    if entrada is None:
+        nueva = {'corte': corte, 'cubetas': _agregar(granularidad, filtros, hasta=corte),
+                 'expira': time.monotonic() + ttl}
+    else:
+        cubetas = dict(entrada['cubetas'])
+        cubetas.update(_agregar(granularidad, filtros, desde=entrada['corte'], hasta=corte))
+        nueva = dict(entrada, corte=corte, cubetas=cubetas)
+
+    with _lock:
+        # Otro hilo pudo guardar la misma entrada mientras tanto
+        actual = _cerradas.get(clave)
+        if actual and actual['corte'] >= corte and time.monotonic() < actual['expira']:
+            return actual['cubetas']
+        if generacion == _generacion:
+            if clave not in _cerradas and len(_cerradas) >= MAX_ENTRADAS_CACHE:
+                _cerradas.clear()
+            _cerradas[clave] = nueva
+    return nueva['cubetas']
+
+
+def invalidar_series():
+    """Descarta las cubetas cerradas; se llama cuando cambia un caso ya existente"""
+    global _generacion
+    with _lock:
+        _cerradas.clear()
+        _generacion += 1
+
+
+def calcular_serie(granularidad, filtros, desde=None, hasta=None):
+    """Curva epidémica: una entrada por cubeta (con ceros) entre desde y hasta.
+
+    Lanza ValueError si el rango pedido supera MAX_CUBETAS cubetas.
+    """
+    hoy = datetime.utcnow().date()
+    corte = inicio_cubeta(hoy, granularidad)
+    paso = 7 if granularidad == 'semana' else 1
+    if (desde and desde < FECHA_MINIMA) or (hasta and hasta < FECHA_MINIMA):
+        raise ValueError(f'Las fechas deben ser posteriores a {FECHA_MINIMA.isoformat()}')
+    if desde is not None and (min(hasta or hoy, hoy) - desde).days // paso + 1 > MAX_CUBETAS:
+        raise ValueError(f'El rango supera {MAX_CUBETAS} cubetas; acorta desde/hasta o usa granularidad=semana')
+
+    cubetas = dict(_cubetas_cerradas(granularidad, filtros, corte))
+    cubetas.update(_agregar(granularidad, filtros, desde=corte))
+
+    hasta = min(hasta or hoy, hoy)
+    if desde is None:
+        desde = min(cubetas) if cubetas else corte
+        if (hasta - desde).days // paso + 1 > MAX_CUBETAS:
+            desde = hasta - timedelta(days=paso * (MAX_CUBETAS - 1))
+    inicio = inicio_cubeta(desde, granularidad)
+    ultimo = inicio_cubeta(hasta, granularidad)
+
+    serie = []
+    total = 0
+    while inicio <= ultimo:
+        datos = cubetas.get(inicio, {'total': 0, 'por_enfermedad': {}})
+        entrada = {'inicio': inicio.isoformat()}
+        if granularidad == 'semana':
+            entrada['semana_epidemiologica'] = semana_epidemiologica(inicio)
+        entrada['total'] = datos['total']
+        entrada['por_enfermedad'] = datos['por_enfermedad']
+        serie.append(entrada)
+        total += datos['total']
+        inicio = _siguiente(inicio, granularidad)
+
+    return {
+        'granularidad': granularidad,
+        'desde': serie[0]['inicio'] if serie else None,
+        'hasta': hasta.isoformat(),
+        'filtros': filtros,
+        'modelo_version': modelo_actual().version,
+        'total': total,
+        'serie': serie
+    }
+
+
+def obtener_serie(granularidad, filtros, desde=None, hasta=None):
+    """Devuelve (cuerpo JSON, etag)"""
+    cuerpo = dumps(calcular_serie(granularidad, filtros, desde, hasta))
+    return cuerpo, hashlib.sha1(cuerpo).hexdigest()
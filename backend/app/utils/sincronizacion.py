@@ -0,0 +1,310 @@
+import base64
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.app import db
+from backend.app.models import CambioCaso, Caso, ClaveSincronizacion
+from backend.app.utils.cambios import CambiosPurgados, ultimo_cambio
+from backend.app.utils.ingesta import TAMANO_CONSULTA, ingerir_lote
+from backend.app.utils.paginacion import parsear_campos
+from backend.app.utils.scoring import calcular_probabilidades, modelo_actual
+from backend.app.utils.validacion import validar_caso
+
+# Tope del cuerpo ya descomprimido (protege de bombas de compresión)
+MAX_BYTES_SINCRONIZACION = 20 * 1024 * 1024
+
+# Cambios del registro que se resumen por respuesta (varios de un caso cuentan como uno al enviarlos)
+TAMANO_PAGINA_SINCRONIZACION = 5000
+
+# Campos por defecto en las bajadas: lo que una brigada necesita en campo
+CAMPOS_SINCRONIZACION = [
+    'id', 'identificacion', 'nombre', 'apellido', 'edad', 'estado', 'eps',
+    'lat', 'lon', 'municipio', 'barrio', 'es_zona_rural', 'nombre_zona_rural', 'timestamp'
+]
+
+MAX_CLAVE = 64
+
+
+# ==================== PETICIÓN ====================
+def leer_cuerpo(request):
+    """JSON del cuerpo; admite Content-Encoding gzip o deflate"""
+    datos = request.get_data()
+    codificacion = (request.headers.get('Content-Encoding') or 'identity').lower()
+    if codificacion in ('gzip', 'deflate'):
+        # wbits 32 + MAX_WBITS: detecta gzip o zlib por la cabecera
+        descompresor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        try:
+            datos = descompresor.decompress(datos, MAX_BYTES_SINCRONIZACION)
+        except zlib.error as e:
+            raise ValueError(f'Cuerpo comprimido no válido: {e}')
+        if descompresor.unconsumed_tail:
+            raise ValueError(f'El cuerpo descomprimido supera {MAX_BYTES_SINCRONIZACION // (1024 * 1024)} MB')
+    elif codificacion != 'identity':
+        raise ValueError(f'Content-Encoding no soportado: {codificacion}')
+
+    try:
+        cuerpo = json.loads(datos) if datos else {}
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'JSON no válido: {e}')
+    if not isinstance(cuerpo, dict):
+        raise ValueError('El cuerpo debe ser un objeto')
+    return cuerpo
+
+
+def codificar_token(posicion):
+    return base64.urlsafe_b64encode(f'v1|{posicion}'.encode()).decode().rstrip('=')
+
+
+def decodificar_token(token):
+    """Posición en el registro de cambios guardada en el token"""
+    try:
+        relleno = '=' * (-len(token) % 4)
+        version, posicion = base64.urlsafe_b64decode(token + relleno).decode().split('|')
+        if version != 'v1':
+            raise ValueError
+        return int(posicion)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError('Token de sincronización no válido')
+
+
+def _marca_captura(valor, ahora):
+    """Hora de captura del dispositivo en UTC sin zona; nunca posterior a ahora"""
+    if not valor:
+        return None
+    try:
+        marca = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'capturado no es una fecha ISO 8601: {valor}')
+    if marca.tzinfo is not None:
+        marca = marca.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(marca, ahora)
+
+
+# ==================== SUBIDA ====================
+def _claves_conocidas(claves):
+    conocidas = {}
+    claves = list(claves)
+    for i in range(0, len(claves), TAMANO_CONSULTA):
+        conocidas.update(db.session.execute(
+            db.select(ClaveSincronizacion.clave, ClaveSincronizacion.resultado)
+            .where(ClaveSincronizacion.clave.in_(claves[i:i + TAMANO_CONSULTA]))
+        ).all())
+    return conocidas
+
+
+def _guardar_claves(dispositivo, resultados):
+    filas = [
+        {'clave': r['clave'], 'dispositivo': dispositivo, 'caso_id': r.get('caso_id'),
+         'resultado': {k: v for k, v in r.items() if k != 'clave'}, 'creado': datetime.utcnow()}
+        for r in resultados
+    ]
+    if not filas:
+        return
+    tabla = ClaveSincronizacion.__table__
+    dialecto = db.engine.dialect.name
+    if dialecto in ('postgresql', 'sqlite'):
+        # Dos reintentos simultáneos de la misma clave: se queda el primero
+        insertar = postgresql.insert if dialecto == 'postgresql' else sqlite.insert
+        db.session.execute(insertar(tabla).on_conflict_do_nothing(index_elements=['clave']), filas)
+    else:
+        db.session.execute(tabla.insert(), filas)
+
+
+def _casos_por_id(ids, campos):
+    casos = {}
+    ids = list(ids)
+    columnas = [getattr(Caso, campo) for campo in campos]
+    for i in range(0, len(ids), TAMANO_CONSULTA):
+        for fila in db.session.execute(db.select(*columnas).where(Caso.id.in_(ids[i:i + TAMANO_CONSULTA]))):
+            caso = dict(zip(campos, fila))
+            casos[caso['id']] = caso
+    return casos
+
+
+def subir_casos(dispositivo, registros, campos=CAMPOS_SINCRONIZACION):
+    """Registra los casos que el dispositivo tenía en cola, en una transacción.
+
+    Cada registro trae una clave de idempotencia: un reintento devuelve el
+    resultado de la primera vez sin volver a insertar. Los conflictos por
+    identificación se resuelven por conjuntos:
+      - dentro del lote gana la captura válida más antigua;
+      - contra la base gana el caso ya registrado.
+    El perdedor queda como 'conflicto' con el caso ganador (caso_id y caso).
+    Si la captura ganadora no llega a registrarse, las demás quedan como
+    'reintentar': su clave no se guarda y el dispositivo las vuelve a enviar.
+
+    Devuelve (resultados en el orden del lote, {id insertado: (lat, lon)}, hay capturas de días anteriores).
+    """
+    ahora = datetime.utcnow()
+    resultados = [None] * len(registros)
+    pendientes = {}
+
+    # 1. Forma del registro y claves repetidas dentro del lote
+    for i, registro in enumerate(registros):
+        clave = registro.get('clave') if isinstance(registro, dict) else None
+        if not isinstance(clave, str) or not clave.strip() or len(clave) > MAX_CLAVE:
+            resultados[i] = {'clave': clave if isinstance(clave, str) else None, 'estado': 'rechazado',
+                             'error': f'Cada caso requiere "clave" (texto de hasta {MAX_CLAVE} caracteres)'}
+        elif clave in pendientes:
+            resultados[i] = {'clave': clave, 'estado': 'rechazado',
+                             'error': f'Clave repetida en el lote (fila {pendientes[clave]})'}
+        else:
+            pendientes[clave] = i
+
+    # 2. Claves ya procesadas: mismo resultado que la primera vez
+    for clave, resultado in _claves_conocidas(pendientes).items():
+        resultados[pendientes.pop(clave)] = dict(resultado, clave=clave, repetido=True)
+    nuevas = list(pendientes.values())
+
+    # 3. Hora de captura y probabilidades de los casos evaluados sin conexión
+    filas, marcas, indices = [], [], []
+    for clave, i in pendientes.items():
+        registro = dict(registros[i])
+        try:
+            marca = _marca_captura(registro.pop('capturado', None), ahora)
+        except ValueError as e:
+            resultados[i] = {'clave': clave, 'estado': 'rechazado', 'error': str(e)}
+            continue
+        if registro.get('sintomas') and not registro.get('probabilidades') and isinstance(registro['sintomas'], list):
+            registro['modelo_version'] = modelo_actual().version
+            registro['probabilidades'] = calcular_probabilidades(registro['sintomas'])
+        filas.append(registro)
+        marcas.append(marca or ahora)
+        indices.append(i)
+
+    # 4. Misma identificación varias veces en el lote: gana la captura válida más antigua.
+    # Las inválidas se rechazan con su propio error y no le quitan el lugar a una válida.
+    por_fila = {}
+    identificaciones = {}
+    for j, fila in enumerate(filas):
+        try:
+            identificaciones[j] = validar_caso(fila)['identificacion']
+        except ValueError as e:
+            por_fila[j] = {'clave': registros[indices[j]]['clave'], 'estado': 'rechazado', 'error': str(e)}
+    ganadores = {}
+    for j in sorted(identificaciones, key=lambda j: marcas[j]):
+        ganadores.setdefault(identificaciones[j], j)
+    unicos = sorted(ganadores.values())
+
+    # 5. Inserción por conjuntos; lo ya registrado en la base queda como conflicto
+    ingeridos = ingerir_lote([filas[j] for j in unicos], [marcas[j] for j in unicos], confirmar=False)
+    for j, resultado in zip(unicos, ingeridos):
+        clave = registros[indices[j]]['clave']
+        if resultado['estado'] == 'aceptado':
+            por_fila[j] = {'clave': clave, 'estado': 'aceptado', 'caso_id': resultado['id']}
+            if 'duplicado_de' in resultado:
+                por_fila[j]['duplicado_de'] = resultado['duplicado_de']
+        elif resultado.get('caso_id'):
+            por_fila[j] = {'clave': clave, 'estado': 'conflicto', 'caso_id': resultado['caso_id'],
+                           'error': resultado['error']}
+        else:
+            por_fila[j] = {'clave': clave, 'estado': 'rechazado', 'error': resultado['error']}
+
+    for j, identificacion in identificaciones.items():
+        if j in por_fila:
+            continue
+        ganador = por_fila[ganadores[identificacion]]
+        clave = registros[indices[j]]['clave']
+        if ganador.get('caso_id'):
+            por_fila[j] = {'clave': clave, 'estado': 'conflicto', 'caso_id': ganador['caso_id'],
+                           'error': 'La identificación se registró con una captura anterior del mismo lote'}
+        else:
+            por_fila[j] = {'clave': clave, 'estado': 'reintentar',
+                           'error': f'No se registró la captura anterior con la misma identificación: {ganador["error"]}'}
+
+    for j, resultado in por_fila.items():
+        resultados[indices[j]] = resultado
+
+    # 6. Resultados por clave y commit único con los casos
+    _guardar_claves(dispositivo, [resultados[i] for i in nuevas if resultados[i]['estado'] != 'reintentar'])
+    db.session.commit()
+
+    # El caso ganador de cada conflicto, para que el dispositivo reemplace su copia
+    conflictos = {r['caso_id'] for r in resultados if r['estado'] == 'conflicto'}
+    if conflictos:
+        casos = _casos_por_id(conflictos, campos)
+        for resultado in resultados:
+            if resultado['estado'] == 'conflicto':
+                resultado['caso'] = casos.get(resultado['caso_id'])
+
+    insertados = {
+        r['caso_id']: (float(filas[j]['lat']), float(filas[j]['lon']))
+        for j, r in por_fila.items() if r['estado'] == 'aceptado'
+    }
+    hoy = ahora.date()
+    atrasados = any(marcas[j].date() < hoy for j, r in por_fila.items() if r['estado'] == 'aceptado')
+    return resultados, insertados, atrasados
+
+
+# ==================== BAJADA ====================
+def bajar_cambios(token, campos=CAMPOS_SINCRONIZACION, municipio=None, excluir_altas=(),
+                  limite=TAMANO_PAGINA_SINCRONIZACION):
+    """Estado actual de los casos que cambiaron desde el token, un registro por caso.
+
+    Sin token solo devuelve la posición actual. Las altas de excluir_altas (las
+    que el dispositivo acaba de subir) no se le devuelven.
+    Lanza CambiosPurgados si el token es anterior a lo que se conserva.
+    """
+    if not token:
+        return {'casos': [], 'bajas': [], 'token': codificar_token(ultimo_cambio()), 'hay_mas': False}
+
+    desde = decodificar_token(token)
+    primero = db.session.execute(db.select(db.func.min(CambioCaso.id))).scalar()
+    if desde and primero and desde < primero - 1:
+        raise CambiosPurgados(f'Los cambios anteriores a {primero} ya no se conservan; descarga de nuevo los casos')
+
+    # Fin de la página: el cambio número `limite` después del token
+    siguientes = db.session.execute(
+        db.select(CambioCaso.id).where(CambioCaso.id > desde)
+        .order_by(CambioCaso.id).offset(limite - 1).limit(2)
+    ).scalars().all()
+    hasta = siguientes[0] if siguientes else ultimo_cambio()
+    hay_mas = len(siguientes) == 2
+
+    # Último cambio de cada caso en (desde, hasta]: lo intermedio no se envía
+    condiciones = [CambioCaso.id > desde, CambioCaso.id <= hasta]
+    if excluir_altas:
+        condiciones.append(db.not_(db.and_(
+            CambioCaso.operacion == 'alta', CambioCaso.caso_id.in_(list(excluir_altas))
+        )))
+    ultimos = (
+        db.select(db.func.max(CambioCaso.id).label('id'))
+        .where(*condiciones).group_by(CambioCaso.caso_id).subquery()
+    )
+    consulta = (
+        db.select(CambioCaso.caso_id, CambioCaso.operacion, *[getattr(Caso, campo) for campo in campos])
+        .join(ultimos, ultimos.c.id == CambioCaso.id)
+        .outerjoin(Caso, Caso.id == CambioCaso.caso_id)
+    )
+    if municipio:
+        consulta = consulta.where(db.or_(CambioCaso.operacion == 'baja', Caso.municipio == municipio))
+
+    casos, bajas = [], []
+    for fila in db.session.execute(consulta):
+        datos = fila[2:]
+        # Un alta o modificación de un caso ya borrado también es una baja
+        if fila.operacion == 'baja' or datos[0] is None:
+            bajas.append(fila.caso_id)
+        else:
+            casos.append(dict(zip(campos, datos)))
+
+    return {'casos': casos, 'bajas': bajas, 'token': codificar_token(hasta), 'hay_mas': hay_mas}
+
+
+def campos_sincronizacion(valor):
+    """Campos pedidos (lista o texto separado por comas); id siempre va incluido"""
+    if not valor:
+        return list(CAMPOS_SINCRONIZACION)
+    campos = parsear_campos(','.join(valor) if isinstance(valor, list) else str(valor))
+    return campos if 'id' in campos else ['id'] + campos
+
+
+def purgar_claves(dias):
+    """Borra las claves de idempotencia de más de `dias` días"""
+    limite = datetime.utcnow() - timedelta(days=dias)
+    borradas = db.session.execute(
+        db.delete(ClaveSincronizacion).where(ClaveSincronizacion.creado < limite)
+    ).rowcount
+    db.session.commit()
+    return borradas
@@ -0,0 +1,304 @@
+import inspect
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from backend.app import db
+from backend.app.models import Trabajo
+
+logger = logging.getLogger(__name__)
+
+# Un trabajo en curso sin latido durante este tiempo se considera abandonado
+TIEMPO_SIN_LATIDO = timedelta(minutes=5)
+
+# Espera antes del reintento n: REINTENTO_BASE * 2^(n-1)
+REINTENTO_BASE = timedelta(seconds=10)
+
+# Como mucho una escritura de progreso por trabajo cada este número de segundos
+INTERVALO_PROGRESO = 1.0
+INTERVALO_LATIDO = 60
+
+TAREAS = {}
+
+MAX_LOTE_HTTP = 50000
+
+
+def _lote_http(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool) and 1 <= valor <= MAX_LOTE_HTTP
+
+
+# Tipos y parámetros que acepta POST /api/trabajos, con su validación. El resto
+# (p. ej. detectar_brotes con reiniciar, que borra todos los brotes) solo por la CLI.
+PARAMETROS_HTTP = {
+    'reescorar': {'lote': _lote_http},
+    'reconstruir_resumen': {},
+    'compactar_resumen': {},
+    'agrupar_duplicados': {},
+    'detectar_brotes': {},
+    'entrenar_pronosticos': {'completo': lambda valor: isinstance(valor, bool)},
+}
+
+
+def tarea(nombre):
+    """Registra una función como tipo de trabajo: funcion(progreso, **parametros) -> resultado JSON"""
+    def registrar(funcion):
+        TAREAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+class Progreso:
+    """Publica avance y latido del trabajo en una conexión aparte de la sesión de la tarea"""
+
+    def __init__(self, trabajo_id):
+        self.trabajo_id = trabajo_id
+        self._ultima = 0.0
+        # El hilo de latido no tiene contexto de app: se guarda el engine
+        self._engine = db.engine
+
+    def _guardar(self, **valores):
+        # El avance es informativo: un fallo al escribirlo no interrumpe la tarea
+        try:
+            with self._engine.begin() as conexion:
+                conexion.execute(
+                    db.update(Trabajo.__table__).where(Trabajo.__table__.c.id == self.trabajo_id)
+                    .values(latido=datetime.utcnow(), **valores)
+                )
+        except Exception:
+            logger.warning('No se pudo guardar el avance del trabajo', exc_info=True,
+                           extra={'datos': {'trabajo_id': self.trabajo_id}})
+
+    def latir(self, detenido):
+        """Mantiene el latido de tareas largas que no informan avance"""
+        while not detenido.wait(INTERVALO_LATIDO):
+            self._guardar()
+
+    def avanzar(self, hechos, total=None, mensaje=None):
+        ahora = time.monotonic()
+        if ahora - self._ultima < INTERVALO_PROGRESO:
+            return
+        self._ultima = ahora
+        valores = {}
+        if total:
+            valores['progreso'] = min(hechos / total, 1.0)
+        if mensaje:
+            valores['mensaje'] = mensaje[:200]
+        self._guardar(**valores)
+
+
+# ==================== COLA ====================
+def encolar(tipo, parametros=None, max_intentos=3):
+    """Crea un trabajo pendiente; lanza ValueError si el tipo no existe"""
+    if tipo not in TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}. Disponibles: {', '.join(sorted(TAREAS))}")
+    if parametros is not None and not isinstance(parametros, dict):
+        raise ValueError('parametros debe ser un objeto')
+    try:
+        inspect.signature(TAREAS[tipo]).bind(None, **(parametros or {}))
+    except TypeError as e:
+        raise ValueError(f'Parámetros no válidos para {tipo}: {e}')
+    trabajo = Trabajo(tipo=tipo, parametros=parametros or {}, max_intentos=max_intentos)
+    db.session.add(trabajo)
+    db.session.commit()
+    return trabajo
+
+
+def validar_http(tipo, parametros):
+    """Lanza ValueError si el tipo o los parámetros no se pueden encolar por la API"""
+    if tipo not in PARAMETROS_HTTP:
+        raise ValueError(f"Tipo de trabajo no disponible por la API: {tipo}. "
+                         f"Disponibles: {', '.join(sorted(PARAMETROS_HTTP))}")
+    if parametros is not None and not isinstance(parametros, dict):
+        raise ValueError('parametros debe ser un objeto')
+    permitidos = PARAMETROS_HTTP[tipo]
+    for nombre, valor in (parametros or {}).items():
+        if nombre not in permitidos:
+            raise ValueError(f'Parámetro no admitido por la API para {tipo}: {nombre}')
+        if not permitidos[nombre](valor):
+            raise ValueError(f'Valor no válido para {tipo}.{nombre}')
+
+
+def _recuperar_abandonados():
+    """Devuelve a la cola los trabajos cuyo worker dejó de dar señales.
+
+    El intento ya se contó al reclamarlo: un trabajo que tumba a su worker
+    (memoria, señal) queda fallido al agotar max_intentos en vez de volver
+    a la cola para siempre.
+    """
+    ahora = datetime.utcnow()
+    abandonados = db.and_(Trabajo.estado == 'en_curso', Trabajo.latido < ahora - TIEMPO_SIN_LATIDO)
+    db.session.execute(
+        db.update(Trabajo)
+        .where(abandonados, Trabajo.intentos >= Trabajo.max_intentos)
+        .values(estado='fallido', worker=None, terminado=ahora,
+                error='El worker dejó de responder en el último intento')
+    )
+    db.session.execute(
+        db.update(Trabajo)
+        .where(abandonados)
+        .values(estado='pendiente', worker=None, mensaje='Reencolado: el worker dejó de responder')
+    )
+    db.session.commit()
+
+
+def reclamar(worker):
+    """Toma el siguiente trabajo disponible, o None.
+
+    En PostgreSQL FOR UPDATE SKIP LOCKED reparte los trabajos entre workers sin
+    esperas; en SQLite el UPDATE condicionado al estado evita que dos workers
+    tomen el mismo.
+    """
+    ahora = datetime.utcnow()
+    consulta = (
+        db.select(Trabajo.id)
+        .where(Trabajo.estado == 'pendiente', Trabajo.disponible_desde <= ahora)
+        .order_by(Trabajo.disponible_desde, Trabajo.id)
+        .limit(1)
+    )
+    if db.engine.dialect.name == 'postgresql':
+        consulta = consulta.with_for_update(skip_locked=True)
+
+    for _ in range(5):
+        trabajo_id = db.session.execute(consulta).scalar()
+        if trabajo_id is None:
+            db.session.commit()
+            return None
+        tomado = db.session.execute(
+            db.update(Trabajo)
+            .where(Trabajo.id == trabajo_id, Trabajo.estado == 'pendiente')
+            .values(estado='en_curso', worker=worker, iniciado=ahora, latido=ahora,
+                    intentos=Trabajo.intentos + 1)
+        ).rowcount
+        db.session.commit()
+        if tomado:
+            return db.session.get(Trabajo, trabajo_id)
+    return None
+
+
+def ejecutar(trabajo):
+    """Corre la tarea y deja el trabajo completado, reprogramado o fallido"""
+    progreso = Progreso(trabajo.id)
+    datos = {'trabajo_id': trabajo.id, 'tipo': trabajo.tipo, 'intento': trabajo.intentos}
+    logger.info('Trabajo iniciado', extra={'datos': datos})
+    inicio = time.perf_counter()
+    detenido = threading.Event()
+    threading.Thread(target=progreso.latir, args=(detenido,), daemon=True).start()
+    try:
+        resultado = TAREAS[trabajo.tipo](progreso, **(trabajo.parametros or {}))
+    except Exception as e:
+        detenido.set()
+        db.session.rollback()
+        trabajo = db.session.get(Trabajo, trabajo.id)
+        trabajo.error = ''.join(traceback.format_exception_only(type(e), e)).strip()[:2000]
+        trabajo.worker = None
+        if trabajo.intentos < trabajo.max_intentos:
+            trabajo.estado = 'pendiente'
+            trabajo.disponible_desde = datetime.utcnow() + REINTENTO_BASE * 2 ** (trabajo.intentos - 1)
+            trabajo.mensaje = f'Reintento {trabajo.intentos + 1} de {trabajo.max_intentos}'
+        else:
+            trabajo.estado = 'fallido'
+            trabajo.terminado = datetime.utcnow()
+        db.session.commit()
+        logger.exception('Trabajo con error', extra={'datos': datos})
+        return
+
+    detenido.set()
+    trabajo = db.session.get(Trabajo, trabajo.id)
+    trabajo.estado = 'completado'
+    trabajo.progreso = 1.0
+    trabajo.mensaje = None
+    trabajo.resultado = resultado
+    trabajo.error = None
+    trabajo.terminado = datetime.utcnow()
+    db.session.commit()
+    logger.info('Trabajo completado', extra={'datos': dict(datos, segundos=round(time.perf_counter() - inicio, 3))})
+
+
+# ==================== WORKERS ====================
+def bucle_trabajador(espera=1.0, detener=lambda: False):
+    """Reclama y ejecuta trabajos hasta que detener() sea verdadero"""
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    ultima_revision = 0.0
+    while not detener():
+        if time.monotonic() - ultima_revision > TIEMPO_SIN_LATIDO.total_seconds() / 2:
+            _recuperar_abandonados()
+            ultima_revision = time.monotonic()
+
+        trabajo = reclamar(worker)
+        if trabajo is None:
+            db.session.remove()
+            time.sleep(espera)
+            continue
+        ejecutar(trabajo)
+        db.session.remove()
+
+
+def proceso_trabajador(espera):
+    """Punto de entrada de cada proceso del pool: app propia y salida limpia con SIGTERM"""
+    from backend.app import create_app
+
+    detenido = []
+    signal.signal(signal.SIGTERM, lambda *_: detenido.append(True))
+    signal.signal(signal.SIGINT, lambda *_: detenido.append(True))
+
+    app = create_app(crear_tablas=False)
+    with app.app_context():
+        bucle_trabajador(espera, detener=lambda: bool(detenido))
+
+
+# ==================== TAREAS ====================
+@tarea('reescorar')
+def _tarea_reescorar(progreso, lote=5000):
+    from backend.app.models import Caso
+    from backend.app.utils.modelos import reescorar_casos, sincronizar_modelo
+
+    version = sincronizar_modelo(forzar=True).version
+    total = db.session.execute(
+        db.select(db.func.count(Caso.id))
+        .where(db.or_(Caso.modelo_version.is_(None), Caso.modelo_version != version))
+    ).scalar()
+    hechos = reescorar_casos(
+        lote=lote, al_avanzar=lambda n, _: progreso.avanzar(n, total, f'{n} de {total} casos')
+    )
+    return {'modelo_version': version, 'casos': hechos}
+
+
+@tarea('reconstruir_resumen')
+def _tarea_reconstruir_resumen(progreso):
+    from backend.app.utils.resumen import reconstruir_resumen
+
+    return {'filas': reconstruir_resumen()}
+
+
+@tarea('compactar_resumen')
+def _tarea_compactar_resumen(progreso):
+    from backend.app.utils.resumen import compactar_resumen
+
+    return {'filas_eliminadas': compactar_resumen()}
+
+
+@tarea('agrupar_duplicados')
+def _tarea_agrupar_duplicados(progreso):
+    from backend.app.utils.duplicados import agrupar_duplicados
+
+    return agrupar_duplicados(al_avanzar=lambda n, total: progreso.avanzar(n, total, f'{n} de {total} filas'))
+
+
+@tarea('detectar_brotes')
+def _tarea_detectar_brotes(progreso, reiniciar=False):
+    from backend.app.utils.brotes import detectar_brotes
+
+    return detectar_brotes(reiniciar=reiniciar)
+
+
+@tarea('entrenar_pronosticos')
+def _tarea_entrenar_pronosticos(progreso, completo=False):
+    from backend.app.utils.pronostico import entrenar_pronosticos
+
+    # Dentro de un worker del pool el entrenamiento no abre otro pool de procesos
+    return entrenar_pronosticos(current_app.config['PRONOSTICOS_DIR'], procesos=1, completo=completo)
@@ -0,0 +1,134 @@
+import math
+
+from backend.app.models import Caso
+
+# Campos que llegan como número desde hojas de cálculo y se guardan como texto
+CAMPOS_NUMERICOS = {'identificacion', 'telefono'}
+
+
+def _texto(data, campo, etiqueta):
+    """Texto de data[campo] sin espacios extremos, o None si falta.
+
+    Lanza ValueError si no es texto o no cabe en la columna de casos.
+    """
+    valor = data.get(campo)
+    if valor is None:
+        return None
+    if campo in CAMPOS_NUMERICOS and isinstance(valor, int) and not isinstance(valor, bool):
+        valor = str(valor)
+    if not isinstance(valor, str):
+        raise ValueError(f'{etiqueta} debe ser texto')
+    valor = valor.strip()
+    maximo = Caso.__table__.c[campo].type.length
+    if len(valor) > maximo:
+        raise ValueError(f'{etiqueta} no puede superar {maximo} caracteres')
+    return valor
+
+
+def _booleano(data, campo, por_defecto):
+    valor = data.get(campo)
+    if valor is None:
+        return por_defecto
+    if not isinstance(valor, bool):
+        raise ValueError(f'{campo} debe ser true o false')
+    return valor
+
+
+def validar_caso(data):
+    """Aplica las reglas de registro de un caso y devuelve los valores de sus columnas.
+
+    Lanza ValueError con el mensaje para el cliente si algún campo no es válido.
+    La duplicidad de la identificación se verifica aparte contra la base de datos.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Cada caso debe ser un objeto JSON')
+
+    # 1. Validar identificación (OBLIGATORIO)
+    identificacion = _texto(data, 'identificacion', 'La identificación')
+    if not identificacion:
+        raise ValueError('El número de identificación es requerido')
+
+    # 2. Validar nombre (OBLIGATORIO)
+    nombre = _texto(data, 'nombre', 'El nombre')
+    if not nombre:
+        raise ValueError('El nombre es requerido')
+
+    # 3. Validar edad (OBLIGATORIO)
+    edad = data.get('edad')
+    if not edad:
+        raise ValueError('La edad es requerida')
+
+    try:
+        edad = int(edad)
+    except (ValueError, TypeError):
+        raise ValueError('La edad debe ser un número válido')
+    if edad < 1 or edad > 120:
+        raise ValueError('La edad debe estar entre 1 y 120 años')
+
+    # 4. Validar coordenadas (OBLIGATORIO)
+    if not data.get('lat') or not data.get('lon'):
+        raise ValueError('Latitud y longitud son requeridas')
+
+    try:
+        lat = float(data.get('lat'))
+        lon = float(data.get('lon'))
+    except (ValueError, TypeError):
+        raise ValueError('Latitud y longitud deben ser números válidos')
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError('Latitud y longitud deben ser números finitos')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('Latitud debe estar entre -90 y 90 y longitud entre -180 y 180')
+
+    # 5. Validar síntomas (OBLIGATORIO)
+    if not data.get('sintomas'):
+        raise ValueError('Los síntomas son requeridos')
+    if not isinstance(data.get('sintomas'), list):
+        raise ValueError('Los síntomas deben ser una lista')
+    probabilidades = data.get('probabilidades')
+    if probabilidades is not None and not isinstance(probabilidades, dict):
+        raise ValueError('Las probabilidades deben ser un objeto')
+    for enfermedad, valor in (probabilidades or {}).items():
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+            raise ValueError(f'La probabilidad de {enfermedad} debe ser un número')
+
+    # 6. Validar teléfono (opcional pero con formato)
+    telefono = _texto(data, 'telefono', 'El teléfono') or None
+    if telefono and len(telefono) < 7:
+        raise ValueError('El teléfono debe tener al menos 7 dígitos')
+
+    # 7. Resto de textos: tipo y longitud de su columna
+    es_zona_rural = _booleano(data, 'es_zona_rural', False)
+    nombre_zona_rural = _texto(data, 'nombre_zona_rural', 'El nombre de la zona rural') if es_zona_rural else None
+
+    return {
+        # Identificación
+        'identificacion': identificacion,
+
+        # Datos personales
+        'nombre': nombre,
+        'apellido': _texto(data, 'apellido', 'El apellido') or None,
+        'telefono': telefono,
+        'edad': edad,
+        'genero': _texto(data, 'genero', 'El género') or None,
+
+        # Datos de salud
+        'eps': _texto(data, 'eps', 'La EPS'),
+        'sintomas': data.get('sintomas'),
+        'probabilidades': probabilidades,
+        # Versión devuelta por /evaluar-sintomas junto a esas probabilidades
+        'modelo_version': str(data.get('modelo_version'))[:40] if data.get('probabilidades') and data.get('modelo_version') else None,
+        'estado': _texto(data, 'estado', 'El estado') or 'pendiente',
+
+        # Ubicación GPS
+        'lat': lat,
+        'lon': lon,
+
+        # Ubicación geográfica
+        'municipio': _texto(data, 'municipio', 'El municipio') or 'Buenaventura',
+        'barrio': _texto(data, 'barrio', 'El barrio') or None,
+        'es_residencia_permanente': _booleano(data, 'es_residencia_permanente', True),
+
+        # Zona rural
+        'es_zona_rural': es_zona_rural,
+        'nombre_zona_rural': nombre_zona_rural or None
+    }
@@ -0,0 +1,128 @@
+"""Prueba de carga del servidor WSGI con distinto número de workers.
+
+Levanta gunicorn (gunicorn.conf.py + wsgi:app) para cada valor de --workers,
+lanza clientes concurrentes contra las rutas indicadas y reporta req/s, p50 y p99.
+
+    python benchmarks/carga_wsgi.py --workers 1 2 4 8 --duracion 15 \
+        --ruta /api/estadisticas --ruta "/api/casos?limit=50"
+
+Usa DATABASE_URL del entorno (o .env); la base debe tener las tablas creadas.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def esperar_servidor(puerto, limite=30):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=2)
+            conexion.request('GET', '/')
+            conexion.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def cliente(puerto, rutas, fin, latencias, errores):
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+    i = 0
+    while time.monotonic() < fin:
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            conexion.request('GET', ruta)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            if respuesta.status >= 500:
+                errores.append(respuesta.status)
+            latencias.append(time.perf_counter() - inicio)
+        except (OSError, http.client.HTTPException):
+            errores.append('conexion')
+            conexion.close()
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def medir(workers, args):
+    entorno = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(args.puerto),
+                   GUNICORN_THREADS=str(args.hilos), GUNICORN_ACCESSLOG='',
+                   GUNICORN_MAX_REQUESTS='0')
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not esperar_servidor(args.puerto):
+            raise RuntimeError('gunicorn no respondió a tiempo')
+
+        latencias, errores = [], []
+        fin = time.monotonic() + args.duracion
+        hilos = [
+            threading.Thread(target=cliente, args=(args.puerto, args.ruta, fin, latencias, errores))
+            for _ in range(args.concurrencia)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        return {
+            'workers': workers,
+            'hilos': args.hilos,
+            'concurrencia': args.concurrencia,
+            'peticiones': len(latencias),
+            'errores': len(errores),
+            'req_s': round(len(latencias) / args.duracion, 1),
+            'p50_ms': round(percentil(latencias, 50) * 1000, 2) if latencias else None,
+            'p99_ms': round(percentil(latencias, 99) * 1000, 2) if latencias else None,
+            'media_ms': round(statistics.mean(latencias) * 1000, 2) if latencias else None
+        }
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--hilos', type=int, default=4, help='GUNICORN_THREADS por worker')
+    parser.add_argument('--concurrencia', type=int, default=32, help='clientes simultáneos')
+    parser.add_argument('--duracion', type=float, default=10, help='segundos por medición')
+    parser.add_argument('--puerto', type=int, default=5055)
+    parser.add_argument('--ruta', action='append', help='ruta a consultar (repetible)')
+    parser.add_argument('--json', help='guardar los resultados en este archivo')
+    args = parser.parse_args()
+    args.ruta = args.ruta or ['/api/health']
+
+    resultados = []
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errores':>8}")
+    for workers in args.workers:
+        r = medir(workers, args)
+        resultados.append(r)
+        print(f"{r['workers']:>8} {r['req_s']:>10} {r['p50_ms']:>10} {r['p99_ms']:>10} {r['errores']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as archivo:
+            json.dump(resultados, archivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
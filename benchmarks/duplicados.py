@@ -0,0 +1,106 @@
+"""Detección de duplicados sobre datos sintéticos con duplicados conocidos.
+
+Siembra una base con benchmarks/generador.py inyectando --fraccion de casos
+que repiten a una persona con errores de digitación, y mide:
+
+  - al registrar: latencia p50/p99 de buscar_duplicados para un caso nuevo
+    (lo que agrega POST /api/casos) y cuántos de los duplicados detecta;
+  - en lote: duración y comparaciones de agrupar_duplicados, y su precisión
+    y exhaustividad (recall) contra los pares inyectados.
+
+    python benchmarks/duplicados.py --casos 200000 --fraccion 0.02
+
+Sin --database-url usa un SQLite temporal (la base debe estar vacía: los pares
+conocidos son solo los de esta siembra).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from carga_wsgi import percentil  # noqa: E402
+from generador import generar_casos  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='base de pruebas vacía (por defecto SQLite temporal)')
+    parser.add_argument('--casos', type=int, default=100000)
+    parser.add_argument('--fraccion', type=float, default=0.02, help='fracción de casos duplicados')
+    parser.add_argument('--muestra', type=int, default=1000, help='duplicados buscados uno a uno')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'duplicados.db')
+    os.environ.setdefault('METRICAS', 'false')
+
+    from backend.app import create_app, db
+    from backend.app.models import Caso
+    from backend.app.utils.duplicados import agrupar_duplicados, buscar_duplicados
+
+    app = create_app()
+    with app.app_context():
+        if db.session.execute(db.select(db.func.count(Caso.id))).scalar():
+            sys.exit('La base debe estar vacía')
+
+        pares = []
+        inicio = time.perf_counter()
+        generar_casos(db, Caso, args.casos, semilla=args.semilla, duplicados=args.fraccion, pares=pares)
+        print(f"Sembrados {args.casos} casos ({len(pares)} duplicados) en {time.perf_counter() - inicio:.1f} s")
+
+        ids = dict(db.session.execute(db.select(Caso.identificacion, Caso.id)).all())
+        pares = [(ids[duplicado], ids[original]) for duplicado, original in pares]
+
+        # Al registrar: cada duplicado solo se compara con los casos de id menor,
+        # los que ya estaban cuando llegó
+        columnas = [Caso.identificacion, Caso.nombre, Caso.apellido, Caso.edad, Caso.genero,
+                    Caso.telefono, Caso.lat, Caso.lon, Caso.timestamp]
+        latencias = []
+        detectados = 0
+        for duplicado, original in pares[:args.muestra]:
+            fila = db.session.execute(db.select(*columnas).where(Caso.id == duplicado)).one()
+            caso = SimpleNamespace(id=duplicado, **fila._mapping)
+            t = time.perf_counter()
+            encontrados = buscar_duplicados([caso])
+            latencias.append(time.perf_counter() - t)
+            if duplicado in encontrados:
+                detectados += 1
+        if latencias:
+            print(f"Al registrar: p50 {percentil(latencias, 50) * 1000:.2f} ms, "
+                  f"p99 {percentil(latencias, 99) * 1000:.2f} ms; "
+                  f"detectados {detectados} de {len(latencias)}")
+
+        # En lote: grupos de toda la tabla contra los pares conocidos
+        inicio = time.perf_counter()
+        resumen = agrupar_duplicados()
+        duracion = time.perf_counter() - inicio
+        grupos = dict(db.session.execute(
+            db.select(Caso.id, Caso.duplicado_de).where(Caso.duplicado_de.isnot(None))
+        ).all())
+
+        def grupo(caso_id):
+            return grupos.get(caso_id, caso_id)
+
+        encontrados = sum(1 for duplicado, original in pares if grupo(duplicado) == grupo(original))
+        # Un marcado es correcto si su grupo contiene a la persona con la que se generó
+        reales = {}
+        for duplicado, original in pares:
+            reales[duplicado] = reales.get(original, original)
+        correctos = sum(1 for caso_id, raiz in grupos.items()
+                        if reales.get(caso_id, caso_id) == reales.get(raiz, raiz))
+        print(f"En lote: {duracion:.2f} s, {resumen['comparaciones']} comparaciones "
+              f"({resumen['comparaciones'] / max(args.casos, 1):.1f} por caso), {resumen['grupos']} grupos")
+        print(f"  exhaustividad {encontrados / max(len(pares), 1):.3f} ({encontrados} de {len(pares)} pares), "
+              f"precisión {correctos / max(len(grupos), 1):.3f} ({correctos} de {len(grupos)} marcados)")
+
+
+if __name__ == '__main__':
+    main()
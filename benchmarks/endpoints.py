@@ -0,0 +1,298 @@
+"""Rendimiento de cada endpoint de routes.py sobre datos sintéticos.
+
+Siembra la base con benchmarks/generador.py (si tiene menos de --casos casos),
+mide cada endpoint con el cliente de pruebas de Flask (app + base, sin red) y
+reporta peticiones, req/s, p50, p99 y errores. Los resultados quedan en JSON
+junto con el commit, para comparar entre versiones:
+
+    python benchmarks/endpoints.py --casos 200000 --salida base.json
+    git checkout otra-rama
+    python benchmarks/endpoints.py --casos 200000 --salida nuevo.json --comparar base.json
+
+Sin --database-url usa un SQLite temporal. Los escenarios de escritura agregan
+casos (y borran los que crean con POST), así que conviene una base de pruebas.
+Termina con código 1 si hay errores o si --comparar encuentra un p50 peor que
+--umbral por ciento. Para medir el servidor WSGI con red usa carga_wsgi.py.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from carga_wsgi import percentil  # noqa: E402
+from generador import generar_casos  # noqa: E402
+
+VERSION_FORMATO = 1
+
+SINTOMAS = [
+    ['fiebre_alta', 'dolor_cabeza', 'dolor_muscular'],
+    ['fiebre_alta', 'escalofrios', 'sudoracion'],
+    ['dolor_articular', 'erupciones'],
+    ['fiebre_alta', 'ictericia', 'nauseas'],
+]
+
+
+def _caso(prefijo, i):
+    return {
+        'identificacion': f'{prefijo}-{i}',
+        'nombre': 'Prueba',
+        'apellido': 'Rendimiento',
+        'telefono': '3001234567',
+        'edad': 20 + i % 60,
+        'eps': 'Emssanar',
+        'sintomas': SINTOMAS[i % len(SINTOMAS)],
+        'lat': 3.8801 + (i % 50) * 0.001,
+        'lon': -77.0312 + (i % 50) * 0.001,
+        'municipio': 'Buenaventura'
+    }
+
+
+def escenarios(contexto):
+    """(nombre, método, función i -> (ruta, kwargs), estados esperados).
+
+    Lecturas primero (las escrituras invalidan cachés), escrituras después y
+    DELETE al final, sobre los casos que creó el POST.
+    """
+    ids = contexto['ids']
+    prefijo = contexto['prefijo']
+    x, y = contexto['tesela']
+    desde = (datetime.utcnow().date() - timedelta(days=90)).isoformat()
+    creados = contexto['creados']
+
+    def get(ruta):
+        return lambda i: (ruta, {})
+
+    return [
+        ('home', 'GET', get('/'), {200}),
+        ('health', 'GET', get('/api/health'), {200}),
+        ('modelo', 'GET', get('/api/modelo'), {200}),
+        ('evaluar_sintomas', 'POST',
+         lambda i: ('/evaluar-sintomas', {'json': {'sintomas': SINTOMAS[i % len(SINTOMAS)]}}), {200}),
+        ('evaluar_sintomas_lote', 'POST',
+         lambda i: ('/evaluar-sintomas/lote', {'json': {'lote': SINTOMAS * 250}}), {200}),
+        ('casos_pagina', 'GET', get('/api/casos?limit=50'), {200}),
+        ('casos_filtro', 'GET', get('/api/casos?municipio=Buenaventura&estado=confirmado&limit=50'), {200}),
+        ('casos_campos', 'GET', get('/api/casos?limit=500&fields=id,lat,lon,estado'), {200}),
+        ('casos_cercania', 'GET', get('/api/casos?near=3.88,-77.03&radius_km=2&limit=100'), {200}),
+        ('casos_ndjson', 'GET', get('/api/casos?formato=ndjson&limit=5000'), {200}),
+        ('caso_por_id', 'GET', lambda i: (f'/api/casos/{ids[i % len(ids)]}', {}), {200}),
+        ('caso_buscar', 'GET',
+         lambda i: (f"/api/casos/buscar/{contexto['identificaciones'][i % len(ids)]}", {}), {200}),
+        ('casos_cambios', 'GET', get('/api/casos/cambios?since=0&limit=100'), {200}),
+        ('casos_duplicados', 'GET', get('/api/casos/duplicados?limit=50'), {200}),
+        ('caso_similares', 'GET', lambda i: (f'/api/casos/{ids[i % len(ids)]}/similares', {}), {200}),
+        ('exportar_csv', 'GET', get(f'/api/casos/export?formato=csv&municipio=Guapi&desde={desde}'), {200}),
+        ('estadisticas', 'GET', get('/api/estadisticas'), {200}),
+        ('series_dia', 'GET', get(f'/api/series?granularidad=dia&desde={desde}'), {200}),
+        ('series_semana', 'GET', get('/api/series?granularidad=semana&municipio=Buenaventura'), {200}),
+        ('pronosticos', 'GET', get('/api/pronosticos?municipio=Buenaventura&horizonte=14'), {200, 404}),
+        ('tesela_z8', 'GET', get(f'/api/mapa/tiles/8/{x >> 4}/{y >> 4}'), {200}),
+        ('tesela_z12', 'GET', get(f'/api/mapa/tiles/12/{x}/{y}'), {200}),
+        ('brotes', 'GET', get('/api/brotes?estado=todos'), {200}),
+        ('trabajos', 'GET', get('/api/trabajos'), {200}),
+        ('metricas', 'GET', get('/api/metricas'), {200}),
+        ('registrar_caso', 'POST', lambda i: ('/api/casos', {'json': _caso(prefijo, i)}), {201}),
+        ('registrar_lote', 'POST',
+         lambda i: ('/api/casos/lote', {'json': [_caso(f'{prefijo}-lote{i}', j) for j in range(100)]}), {200}),
+        ('actualizar_caso', 'PATCH',
+         lambda i: (f'/api/casos/{creados[i % len(creados)]}', {'json': {'estado': 'en_revision'}}), {200}),
+        ('encolar_trabajo', 'POST',
+         lambda i: ('/api/trabajos', {'json': {'tipo': 'reconstruir_resumen'}}), {202}),
+        ('eliminar_caso', 'DELETE', lambda i: (f'/api/casos/{creados.pop()}', {}), {200}),
+    ]
+
+
+def medir(app, escenario, repeticiones, calentamiento, concurrencia):
+    nombre, metodo, peticion, esperados = escenario
+    latencias, errores, creados = [], [], []
+
+    def enviar(cliente_http, i):
+        ruta, kwargs = peticion(i)
+        inicio = time.perf_counter()
+        respuesta = cliente_http.open(ruta, method=metodo, **kwargs)
+        respuesta.get_data()
+        respuesta.close()
+        transcurrido = time.perf_counter() - inicio
+        if respuesta.status_code in esperados and nombre == 'registrar_caso':
+            creados.append(respuesta.get_json()['caso']['id'])
+        return respuesta.status_code, transcurrido
+
+    # Calentamiento fuera del tiempo medido (cachés, planes, conexiones)
+    with app.test_client() as cliente_http:
+        for i in range(calentamiento):
+            enviar(cliente_http, i)
+
+    contador = iter(range(calentamiento, calentamiento + repeticiones))
+    bloqueo = threading.Lock()
+
+    def cliente():
+        with app.test_client() as cliente_http:
+            while True:
+                with bloqueo:
+                    i = next(contador, None)
+                if i is None:
+                    return
+                estado, transcurrido = enviar(cliente_http, i)
+                latencias.append(transcurrido)
+                if estado not in esperados:
+                    errores.append(estado)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    return {
+        'metodo': metodo,
+        'peticiones': len(latencias),
+        'errores': len(errores),
+        'estados_inesperados': sorted({str(e) for e in errores}),
+        'req_s': round(len(latencias) / duracion, 1) if duracion else None,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 3) if latencias else None,
+        'p99_ms': round(percentil(latencias, 99) * 1000, 3) if latencias else None,
+        'media_ms': round(statistics.mean(latencias) * 1000, 3) if latencias else None
+    }, creados
+
+
+def commit_actual():
+    try:
+        salida = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, timeout=10)
+        sucio = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=RAIZ,
+                               capture_output=True, text=True, timeout=30)
+        return salida.stdout.strip() + ('-modificado' if sucio.stdout.strip() else '') or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(resultados, anterior, umbral):
+    """Imprime las diferencias de p50 y devuelve los endpoints que empeoraron más de umbral %"""
+    regresiones = []
+    print(f"\nComparación con {anterior.get('commit') or 'resultado anterior'} (umbral {umbral}%)")
+    print(f"{'endpoint':<24} {'p50 antes':>10} {'p50 ahora':>10} {'cambio':>8}")
+    for nombre, actual in resultados.items():
+        previo = anterior.get('resultados', {}).get(nombre)
+        if not previo or not previo.get('p50_ms') or actual['p50_ms'] is None:
+            continue
+        cambio = (actual['p50_ms'] - previo['p50_ms']) / previo['p50_ms'] * 100
+        marca = ''
+        if cambio > umbral:
+            marca = '  ✗'
+            regresiones.append(nombre)
+        print(f"{nombre:<24} {previo['p50_ms']:>10} {actual['p50_ms']:>10} {cambio:>+7.1f}%{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='base de pruebas (por defecto SQLite temporal)')
+    parser.add_argument('--casos', type=int, default=100000, help='casos mínimos en la base antes de medir')
+    parser.add_argument('--repeticiones', type=int, default=50, help='peticiones medidas por endpoint')
+    parser.add_argument('--calentamiento', type=int, default=3, help='peticiones previas sin medir')
+    parser.add_argument('--concurrencia', type=int, default=1, help='clientes simultáneos (hilos)')
+    parser.add_argument('--solo', help='expresión regular: solo los endpoints cuyo nombre coincida')
+    parser.add_argument('--salida', help='guardar los resultados en este archivo JSON')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=20.0, help='%% de p50 peor que cuenta como regresión')
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'endpoints.db')
+    os.environ.setdefault('METRICAS', 'false')
+
+    from backend.app import create_app, db
+    from backend.app.models import Caso
+    from backend.app.utils.mapa import tesela_de
+
+    app = create_app()
+    with app.app_context():
+        existentes = db.session.execute(db.select(db.func.count(Caso.id))).scalar()
+        if existentes < args.casos:
+            print(f"Sembrando {args.casos - existentes} casos...")
+            inicio = time.perf_counter()
+            generar_casos(db, Caso, args.casos - existentes)
+            print(f"  listo en {time.perf_counter() - inicio:.1f} s")
+
+        muestra = db.session.execute(
+            db.select(Caso.id, Caso.identificacion).order_by(db.func.random()).limit(1000)
+        ).all()
+        contexto = {
+            'ids': [fila.id for fila in muestra],
+            'identificaciones': [fila.identificacion for fila in muestra],
+            'prefijo': f'bench{int(time.time())}',
+            'tesela': tesela_de(3.8801, -77.0312, 12),
+            'creados': []
+        }
+        total = db.session.execute(db.select(db.func.count(Caso.id))).scalar()
+        dialecto = db.engine.dialect.name
+        db.session.remove()
+
+    filtro = re.compile(args.solo) if args.solo else None
+    resultados = {}
+    print(f"{'endpoint':<24} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errores':>8}")
+    for escenario in escenarios(contexto):
+        nombre = escenario[0]
+        if filtro and not filtro.search(nombre):
+            continue
+        repeticiones = args.repeticiones
+        if nombre in ('actualizar_caso', 'eliminar_caso'):
+            if not contexto['creados']:
+                continue
+            # DELETE: uno por caso creado, sin calentamiento
+            if nombre == 'eliminar_caso':
+                repeticiones = len(contexto['creados']) - args.calentamiento
+                if repeticiones <= 0:
+                    continue
+        r, creados = medir(app, escenario, repeticiones, args.calentamiento, args.concurrencia)
+        contexto['creados'].extend(creados)
+        resultados[nombre] = r
+        print(f"{nombre:<24} {r['req_s']:>9} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['errores']:>8}")
+
+    informe = {
+        'formato': VERSION_FORMATO,
+        'commit': commit_actual(),
+        'fecha': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'base_datos': dialecto,
+        'casos': total,
+        'repeticiones': args.repeticiones,
+        'concurrencia': args.concurrencia,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': resultados
+    }
+    if args.salida:
+        with open(args.salida, 'w') as archivo:
+            json.dump(informe, archivo, indent=2)
+
+    fallo = any(r['errores'] for r in resultados.values())
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            anterior = json.load(archivo)
+        for clave in ('base_datos', 'casos', 'concurrencia'):
+            if anterior.get(clave) != informe[clave]:
+                print(f"⚠ Corridas no comparables del todo: {clave} {anterior.get(clave)} frente a {informe[clave]}")
+        regresiones = comparar(resultados, anterior, args.umbral)
+        if regresiones:
+            print(f"✗ Regresiones: {', '.join(regresiones)}")
+            fallo = True
+    if fallo:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
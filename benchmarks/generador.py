@@ -0,0 +1,283 @@
+"""Generador de casos sintéticos con volumen y forma realistas.
+
+  - Coordenadas agrupadas en barrios de Buenaventura (y una fracción rural más
+    dispersa), más casos en otros municipios del Pacífico y el Valle.
+  - Síntomas sacados del perfil de una enfermedad "real" por caso, con ruido,
+    y probabilidades calculadas con calcular_probabilidades (el modelo activo).
+  - Fechas sesgadas: dos temporadas de lluvia por año, brotes puntuales y
+    crecimiento hacia el presente.
+  - Con --duplicados, una fracción de casos repite a una persona ya generada
+    con errores de digitación (para medir la detección de duplicados).
+
+    python benchmarks/generador.py --casos 1000000 --database-url postgresql://...
+
+Sin --database-url usa DATABASE_URL (o .env). Agrega casos a los existentes y
+reconstruye resumen_casos al terminar. También se importa desde otros
+benchmarks: generar_casos(db, Caso, total).
+"""
+import argparse
+import os
+import sys
+import time
+import unicodedata
+from datetime import datetime, timedelta
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# (municipio, lat, lon, peso)
+MUNICIPIOS = [
+    ('Buenaventura', 3.8801, -77.0312, 0.60),
+    ('Tumaco', 1.8067, -78.7647, 0.10),
+    ('Guapi', 2.5709, -77.8857, 0.05),
+    ('Dagua', 3.6566, -76.6917, 0.05),
+    ('Cali', 3.4516, -76.5320, 0.10),
+    ('Jamundí', 3.2612, -76.5396, 0.04),
+    ('Palmira', 3.5394, -76.3036, 0.03),
+    ('Tuluá', 4.0847, -76.1954, 0.03),
+]
+
+# Barrios de Buenaventura: (nombre, desplazamiento lat, desplazamiento lon)
+BARRIOS = [
+    ('La Independencia', 0.000, 0.000), ('Bellavista', 0.006, 0.012), ('El Cristal', -0.004, 0.020),
+    ('Juan XXIII', 0.010, 0.030), ('San Francisco', -0.008, 0.040), ('La Playita', 0.003, -0.008),
+    ('Lleras', 0.015, 0.050), ('Olímpico', -0.012, 0.060),
+]
+ZONAS_RURALES = ['Bajo Calima', 'Zacarías', 'Córdoba', 'Sabaletas', 'Cisneros', 'Juanchaco', 'Ladrilleros']
+
+# Enfermedad "real" de cada caso (None: síntomas inespecíficos)
+PREVALENCIA = {'dengue': 0.55, 'malaria': 0.15, 'chikungunya': 0.12, 'zika': 0.10, 'fiebre_amarilla': 0.01, None: 0.07}
+
+EPS = [('Emssanar', 0.25), ('Nueva EPS', 0.20), ('Coosalud', 0.15), ('Asmet Salud', 0.12),
+       ('Sura', 0.10), ('Sanitas', 0.08), (None, 0.10)]
+NOMBRES = [
+    'María', 'José', 'Luz', 'Carlos', 'Ana', 'Luis', 'Yolanda', 'Jhon', 'Diana', 'Andrés',
+    'Marleny', 'Wilson', 'Yesenia', 'Jairo', 'Nelly', 'Fredy', 'Yuliana', 'Hernán', 'Sandra', 'Édgar',
+    'Leidy', 'Jefferson', 'Rosa', 'Alexander', 'Carmen', 'Harold', 'Dora', 'Yeison', 'Gloria', 'Óscar',
+    'Paola', 'Brayan', 'Nubia', 'Jorge', 'Erika', 'Camilo', 'Ximena', 'Víctor', 'Marisol', 'Arley',
+]
+# Se usan dos por persona, como en los registros colombianos
+APELLIDOS = [
+    'Rentería', 'Mosquera', 'Valencia', 'Angulo', 'Riascos', 'Caicedo', 'Hurtado', 'Cuero',
+    'Cortés', 'Murillo', 'Palacios', 'Castillo', 'Grueso', 'Montaño', 'Quiñones', 'Solís',
+    'Obregón', 'Micolta', 'Sinisterra', 'Arboleda', 'Banguera', 'Carabalí', 'Lucumí', 'Torres',
+    'Rodríguez', 'González', 'Ramírez', 'Hinestroza', 'Perea', 'Asprilla', 'Córdoba', 'Estupiñán',
+]
+
+TAMANO_LOTE = 10000
+
+
+def _intensidad_diaria(dias, generador):
+    """Peso relativo de cada día: base + lluvias (abr-may, oct-nov) + brotes + tendencia"""
+    hoy = datetime.utcnow().date()
+    fechas = [hoy - timedelta(days=dias - 1 - i) for i in range(dias)]
+    dia_anio = np.array([f.timetuple().tm_yday for f in fechas])
+    lluvias = (np.exp(-((dia_anio - 125) / 25.0) ** 2) + np.exp(-((dia_anio - 300) / 25.0) ** 2))
+    tendencia = np.linspace(0.6, 1.2, dias)
+    brotes = np.zeros(dias)
+    for centro in generador.integers(0, dias, size=max(1, dias // 120)):
+        brotes += 2.5 * np.exp(-((np.arange(dias) - centro) / 6.0) ** 2)
+    intensidad = (1.0 + 1.5 * lluvias + brotes) * tendencia
+    return fechas, intensidad / intensidad.sum()
+
+
+def _sintomas(enfermedad, perfiles, todos, generador):
+    if enfermedad is None:
+        return list(generador.choice(todos, size=generador.integers(1, 3), replace=False))
+    sintomas = [s for s, peso in perfiles[enfermedad].items() if generador.random() < 0.35 + 0.1 * peso]
+    if not sintomas:
+        sintomas = [max(perfiles[enfermedad], key=perfiles[enfermedad].get)]
+    if generador.random() < 0.15:
+        ruido = str(generador.choice(todos))
+        if ruido not in sintomas:
+            sintomas.append(ruido)
+    generador.shuffle(sintomas)
+    return sintomas
+
+
+def _con_error(texto, generador):
+    """Un error de digitación: tilde perdida, letras transpuestas o una letra de menos"""
+    sin_tildes = unicodedata.normalize('NFD', texto).encode('ascii', 'ignore').decode('ascii')
+    tipo = generador.integers(3)
+    if tipo == 0 and sin_tildes != texto:
+        return sin_tildes
+    if len(texto) < 4:
+        return texto + texto[-1]
+    i = int(generador.integers(1, len(texto) - 2))
+    if tipo == 1:
+        return texto[:i] + texto[i + 1] + texto[i] + texto[i + 2:]
+    return texto[:i] + texto[i + 1:]
+
+
+def _duplicar(original, generador, usadas, ahora, celda_geo):
+    """Otro reporte de la misma persona, días después y con errores de digitación"""
+    if generador.random() < 0.5:
+        # Un dígito de más: no choca con las identificaciones de 10 dígitos
+        identificacion = original['identificacion'] + str(generador.integers(10))
+    else:
+        # Otro documento (o uno mal leído)
+        identificacion = '9' + ''.join(str(d) for d in generador.integers(0, 10, size=9))
+    if identificacion in usadas:
+        return None
+    usadas.add(identificacion)
+
+    copia = dict(original, identificacion=identificacion, estado='pendiente')
+    if generador.random() < 0.5:
+        campo = 'nombre' if generador.random() < 0.5 else 'apellido'
+        copia[campo] = _con_error(original[campo], generador)
+    if generador.random() < 0.3:
+        copia['edad'] = max(1, original['edad'] + int(generador.choice([-1, 1])))
+    if generador.random() < 0.5:
+        copia['telefono'] = '3' + ''.join(str(d) for d in generador.integers(0, 10, size=9))
+    copia['lat'] = original['lat'] + float(generador.normal(0, 0.002))
+    copia['lon'] = original['lon'] + float(generador.normal(0, 0.002))
+    copia['celda'] = celda_geo(copia['lat'], copia['lon'])
+    copia['timestamp'] = min(original['timestamp'] + timedelta(hours=float(generador.uniform(1, 120))), ahora)
+    return copia
+
+
+def generar_casos(db, Caso, total, dias=3 * 365, semilla=42, al_avanzar=None, duplicados=0.0, pares=None):
+    """Inserta `total` casos sintéticos por lotes y reconstruye el resumen.
+
+    Con duplicados > 0 esa fracción de casos repite a una persona anterior del
+    mismo lote; si se pasa la lista pares, se le agrega (identificación del
+    duplicado, identificación original) por cada uno.
+    """
+    from backend.app.utils.geo import celda_geo
+    from backend.app.utils.resumen import reconstruir_resumen
+    from backend.app.utils.scoring import ENFERMEDADES, calcular_probabilidades, enfermedad_principal, modelo_actual
+
+    generador = np.random.default_rng(semilla)
+    fechas, intensidad = _intensidad_diaria(dias, generador)
+    todos = sorted({s for pesos in ENFERMEDADES.values() for s in pesos})
+    version = modelo_actual().version
+    ahora = datetime.utcnow()
+    usadas = set()
+
+    base_id = (db.session.execute(db.select(db.func.max(Caso.id))).scalar() or 0) + 1
+    pesos_municipio = np.array([m[3] for m in MUNICIPIOS])
+    enfermedades = list(PREVALENCIA)
+    pesos_enfermedad = np.array(list(PREVALENCIA.values()))
+    pesos_eps = np.array([e[1] for e in EPS])
+
+    insertados = 0
+    while insertados < total:
+        n = min(TAMANO_LOTE, total - insertados)
+        municipios = generador.choice(len(MUNICIPIOS), size=n, p=pesos_municipio / pesos_municipio.sum())
+        dias_caso = generador.choice(dias, size=n, p=intensidad)
+        # Más registros en horario de consulta (7-19 h)
+        segundos = np.clip(generador.normal(13 * 3600, 3.5 * 3600, size=n), 0, 86399).astype(int)
+        reales = generador.choice(len(enfermedades), size=n, p=pesos_enfermedad / pesos_enfermedad.sum())
+        edades = np.clip(generador.gamma(2.2, 14.0, size=n), 1, 95).astype(int)
+        eps = generador.choice(len(EPS), size=n, p=pesos_eps / pesos_eps.sum())
+
+        lote = []
+        for i in range(n):
+            if duplicados and lote and generador.random() < duplicados:
+                original = lote[generador.integers(len(lote))]
+                copia = _duplicar(original, generador, usadas, ahora, celda_geo)
+                if copia:
+                    lote.append(copia)
+                    if pares is not None:
+                        pares.append((copia['identificacion'], original['identificacion']))
+                    continue
+
+            municipio, lat, lon, _ = MUNICIPIOS[municipios[i]]
+            rural = False
+            barrio = None
+            if municipio == 'Buenaventura' and generador.random() < 0.2:
+                rural = True
+                lat += generador.normal(0, 0.08)
+                lon += generador.normal(0, 0.08)
+            elif municipio == 'Buenaventura':
+                barrio, d_lat, d_lon = BARRIOS[generador.integers(len(BARRIOS))]
+                lat += d_lat + generador.normal(0, 0.003)
+                lon += d_lon + generador.normal(0, 0.003)
+            else:
+                lat += generador.normal(0, 0.02)
+                lon += generador.normal(0, 0.02)
+
+            timestamp = datetime.combine(fechas[dias_caso[i]], datetime.min.time()) + timedelta(seconds=int(segundos[i]))
+            timestamp = min(timestamp, ahora)
+            antiguedad = (ahora - timestamp).days
+            if antiguedad < 3:
+                estado = 'pendiente'
+            elif antiguedad < 14:
+                estado = str(generador.choice(['pendiente', 'en_revision', 'confirmado'], p=[0.3, 0.4, 0.3]))
+            else:
+                estado = str(generador.choice(['confirmado', 'descartado', 'en_revision'], p=[0.6, 0.35, 0.05]))
+
+            sintomas = _sintomas(enfermedades[reales[i]], ENFERMEDADES, todos, generador)
+            probabilidades = calcular_probabilidades(sintomas)
+            lote.append({
+                'identificacion': str(1000000000 + base_id + insertados + i),
+                'nombre': NOMBRES[generador.integers(len(NOMBRES))],
+                'apellido': f"{APELLIDOS[generador.integers(len(APELLIDOS))]} {APELLIDOS[generador.integers(len(APELLIDOS))]}",
+                'telefono': '3' + ''.join(str(d) for d in generador.integers(0, 10, size=9)),
+                'edad': int(edades[i]),
+                'genero': 'femenino' if generador.random() < 0.52 else 'masculino',
+                'eps': EPS[eps[i]][0],
+                'sintomas': sintomas,
+                'probabilidades': probabilidades,
+                'enfermedad_principal': enfermedad_principal(probabilidades),
+                'modelo_version': version,
+                'estado': estado,
+                'lat': float(lat),
+                'lon': float(lon),
+                'celda': celda_geo(float(lat), float(lon)),
+                'municipio': municipio,
+                'barrio': barrio,
+                'es_residencia_permanente': generador.random() < 0.9,
+                'es_zona_rural': rural,
+                'nombre_zona_rural': ZONAS_RURALES[generador.integers(len(ZONAS_RURALES))] if rural else None,
+                'timestamp': timestamp
+            })
+
+        db.session.execute(Caso.__table__.insert(), lote)
+        db.session.commit()
+        insertados += n
+        if al_avanzar:
+            al_avanzar(insertados)
+
+    reconstruir_resumen()
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text('ANALYZE casos'))
+    else:
+        db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+    return insertados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='base de destino (por defecto DATABASE_URL)')
+    parser.add_argument('--casos', type=int, default=100000)
+    parser.add_argument('--dias', type=int, default=3 * 365, help='días de historia hacia atrás')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--duplicados', type=float, default=0.0,
+                        help='fracción de casos que repiten a una persona con errores (0-1)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    os.environ.setdefault('METRICAS', 'false')
+
+    from backend.app import create_app, db
+    from backend.app.models import Caso
+
+    app = create_app()
+    with app.app_context():
+        inicio = time.perf_counter()
+
+        def progreso(n):
+            if n % (TAMANO_LOTE * 10) == 0 or n == args.casos:
+                transcurrido = time.perf_counter() - inicio
+                print(f"  {n} casos ({n / transcurrido:,.0f}/s)")
+
+        generar_casos(db, Caso, args.casos, args.dias, args.semilla, progreso, args.duplicados)
+        print(f"✓ {args.casos} casos generados en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Regresión de planes de consulta para los filtros de GET /api/casos.
+
+Siembra una tabla sintética grande, ejecuta cada combinación de filtros a través
+del endpoint real, captura el SQL emitido y verifica con EXPLAIN que:
+
+  - casos se lee por índice (sin Seq Scan / SCAN sin índice),
+  - el orden (timestamp desc, id desc) sale del índice (sin sort), salvo donde
+    se indica que el sort es esperado (búsquedas espaciales, identificación),
+  - la mediana de latencia queda por debajo del presupuesto.
+
+    python benchmarks/planes_consulta.py --casos 200000 --presupuesto-ms 50
+
+Sin --database-url usa un SQLite temporal. Termina con código 1 si algo falla.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MUNICIPIOS = ['Buenaventura', 'Cali', 'Tumaco', 'Guapi', 'Dagua', 'Jamundí', 'Palmira', 'Tuluá']
+ESTADOS = ['pendiente', 'en_revision', 'confirmado', 'descartado']
+EPS = ['Sura', 'Nueva EPS', 'Sanitas', 'Coosalud', 'Emssanar', 'Asmet Salud']
+
+# (nombre, query string, sort permitido)
+CONSULTAS = [
+    ('sin filtros', {}, False),
+    ('municipio', {'municipio': 'Tumaco'}, False),
+    ('estado', {'estado': 'confirmado'}, False),
+    ('eps', {'eps': 'Sanitas'}, False),
+    ('zona rural', {'zona_rural': 'true'}, False),
+    ('municipio + estado', {'municipio': 'Cali', 'estado': 'pendiente'}, False),
+    ('municipio + zona rural', {'municipio': 'Guapi', 'zona_rural': 'true'}, False),
+    ('estado + eps', {'estado': 'descartado', 'eps': 'Sura'}, False),
+    ('identificacion', {'identificacion': '1000123'}, True),
+    ('bbox', {'bbox': '-77.05,3.86,-77.00,3.90'}, True),
+    ('near 500 m', {'near': '3.88,-77.03', 'radius_km': '0.5'}, True),
+]
+
+
+def sembrar(db, Caso, total):
+    random.seed(42)
+    ahora = datetime.utcnow()
+    lote = []
+    for i in range(total):
+        lote.append({
+            'identificacion': str(1000000 + i),
+            'nombre': 'Paciente',
+            'edad': random.randint(1, 90),
+            'genero': random.choice(['masculino', 'femenino']),
+            'eps': random.choice(EPS),
+            'sintomas': ['fiebre_alta'],
+            'probabilidades': {'dengue': 25.0},
+            'estado': random.choice(ESTADOS),
+            'lat': 3.88 + random.gauss(0, 0.08),
+            'lon': -77.03 + random.gauss(0, 0.08),
+            'municipio': random.choice(MUNICIPIOS),
+            'es_zona_rural': random.random() < 0.15,
+            'timestamp': ahora - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        })
+        if len(lote) == 10000:
+            db.session.execute(Caso.__table__.insert(), lote)
+            lote = []
+    if lote:
+        db.session.execute(Caso.__table__.insert(), lote)
+    db.session.commit()
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text('ANALYZE casos'))
+    else:
+        db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def explicar(db, sql, parametros):
+    """Devuelve (usa_indice, tiene_sort, texto del plan)"""
+    if db.engine.dialect.name == 'postgresql':
+        filas = db.session.execute(db.text('EXPLAIN ' + sql), parametros).scalars().all()
+        plan = '\n'.join(filas)
+        usa_indice = 'Seq Scan on casos' not in plan
+        tiene_sort = any(linea.strip().startswith(('Sort', '->  Sort')) for linea in filas)
+        return usa_indice, tiene_sort, plan
+
+    conexion = db.session.connection().connection.driver_connection
+    filas = conexion.execute('EXPLAIN QUERY PLAN ' + sql, parametros).fetchall()
+    detalles = [fila[-1] for fila in filas]
+    plan = '\n'.join(detalles)
+    usa_indice = not any(d.startswith('SCAN casos') and 'INDEX' not in d for d in detalles)
+    tiene_sort = any('TEMP B-TREE' in d for d in detalles)
+    return usa_indice, tiene_sort, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='base vacía de pruebas (por defecto SQLite temporal)')
+    parser.add_argument('--casos', type=int, default=200000)
+    parser.add_argument('--presupuesto-ms', type=float, default=50.0)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'planes.db')
+
+    from sqlalchemy import event
+    from backend.app import create_app, db
+    from backend.app.models import Caso
+
+    app = create_app()
+    cliente = app.test_client()
+
+    with app.app_context():
+        if not db.session.execute(db.select(Caso.id).limit(1)).first():
+            print(f"Sembrando {args.casos} casos...")
+            sembrar(db, Caso, args.casos)
+
+        capturadas = []
+
+        def capturar(conn, cursor, sql, parametros, contexto, executemany):
+            if 'FROM casos' in sql:
+                capturadas.append((sql, parametros))
+
+        event.listen(db.engine, 'before_cursor_execute', capturar)
+
+        fallos = 0
+        print(f"{'consulta':<26} {'índice':>7} {'sort':>5} {'p50 ms':>8}  resultado")
+        for nombre, filtros, sort_permitido in CONSULTAS:
+            latencias = []
+            for _ in range(args.repeticiones):
+                capturadas.clear()
+                inicio = time.perf_counter()
+                respuesta = cliente.get('/api/casos', query_string=dict(filtros, limit=100))
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                if respuesta.status_code != 200:
+                    raise RuntimeError(f"{nombre}: HTTP {respuesta.status_code} {respuesta.get_data(as_text=True)}")
+
+            sql, parametros = capturadas[-1]
+            usa_indice, tiene_sort, plan = explicar(db, sql, parametros)
+            p50 = statistics.median(latencias)
+
+            problemas = []
+            if not usa_indice:
+                problemas.append('sin índice')
+            if tiene_sort and not sort_permitido:
+                problemas.append('sort')
+            if p50 > args.presupuesto_ms:
+                problemas.append(f'> {args.presupuesto_ms} ms')
+
+            print(f"{nombre:<26} {'sí' if usa_indice else 'NO':>7} {'sí' if tiene_sort else 'no':>5} "
+                  f"{p50:>8.2f}  {'OK' if not problemas else 'FALLA: ' + ', '.join(problemas)}")
+            if problemas:
+                fallos += 1
+                print('    ' + plan.replace('\n', '\n    '))
+
+        event.remove(db.engine, 'before_cursor_execute', capturar)
+
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Serialización de listados de casos: ruta ORM + to_dict() frente a la ruta rápida.
+
+Para cada tamaño compara:
+
+  - orm:    select(Caso) -> instancias -> to_dict() -> jsonify
+  - rapida: select de columnas -> tuplas -> filas_a_dicts() -> dumps()
+
+y verifica que ambos JSON decodifican a exactamente los mismos datos.
+
+    python benchmarks/serializacion.py --tamanos 10000 100000
+
+Sin --database-url usa un SQLite temporal. Termina con código 1 si las salidas difieren.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from planes_consulta import sembrar  # noqa: E402
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='base vacía de pruebas (por defecto SQLite temporal)')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'serializacion.db')
+    os.environ.setdefault('METRICAS', 'false')
+
+    from flask import jsonify
+    from backend.app import create_app, db
+    from backend.app.models import Caso
+    from backend.app.utils.paginacion import CAMPOS_CASO, columnas_para
+    from backend.app.utils.serializacion import dumps, filas_a_dicts, orjson
+
+    app = create_app()
+    maximo = max(args.tamanos)
+
+    with app.test_request_context():
+        existentes = db.session.execute(db.select(db.func.count(Caso.id))).scalar()
+        if existentes < maximo:
+            print(f"Sembrando {maximo - existentes} casos...")
+            sembrar(db, Caso, maximo - existentes)
+
+        orden = (Caso.timestamp.desc(), Caso.id.desc())
+        print(f"Codificador: {'orjson' if orjson else 'json (librería estándar)'}")
+        print(f"{'filas':>8} {'orm ms':>9} {'rápida ms':>10} {'x':>6}  salida")
+
+        diferencias = 0
+        for tamano in args.tamanos:
+            def ruta_orm():
+                casos = db.session.execute(db.select(Caso).order_by(*orden).limit(tamano)).scalars().all()
+                cuerpo = jsonify({'casos': [caso.to_dict() for caso in casos]}).get_data()
+                db.session.expunge_all()
+                return cuerpo
+
+            def ruta_rapida():
+                consulta = db.select(*columnas_para(CAMPOS_CASO)).order_by(*orden).limit(tamano)
+                filas = db.session.execute(consulta).all()
+                return dumps({'casos': filas_a_dicts(filas, CAMPOS_CASO)})
+
+            ms_orm, cuerpo_orm = medir(ruta_orm, args.repeticiones)
+            ms_rapida, cuerpo_rapido = medir(ruta_rapida, args.repeticiones)
+
+            iguales = json.loads(cuerpo_orm) == json.loads(cuerpo_rapido)
+            if not iguales:
+                diferencias += 1
+            print(f"{tamano:>8} {ms_orm:>9.1f} {ms_rapida:>10.1f} {ms_orm / ms_rapida:>5.1f}x  "
+                  f"{'idéntica' if iguales else 'DIFIERE'}")
+
+    sys.exit(1 if diferencias else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,10 @@ import { BrowserRouter as Router, Routes, Route } from 'react-router-dom';
 import Navbar from './components/Navbar';
 import SintomasForm from './components/SintomasForm';
 import CasosTable from './components/CasosTable';
+import { iniciarSincronizacion } from './sincronizacion';
+
+// Sube los casos guardados sin conexión al cargar y al reconectar
+iniciarSincronizacion();
 
 function App() {
   return (
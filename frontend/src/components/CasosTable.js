@@ -1,8 +1,11 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { Table, Card, Badge, Spinner, Alert, Button, Form, InputGroup, Dropdown } from 'react-bootstrap';
 import config from '../config';
 
+// Espera antes de abrir otro stream si el servidor rechazó la conexión
+const REINTENTO_STREAM_MS = 30000;
+
 const CasosTable = () => {
   const [casos, setCasos] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -13,26 +16,157 @@ const CasosTable = () => {
   const [filtroZonaRural, setFiltroZonaRural] = useState('');
   const [busqueda, setBusqueda] = useState('');
   const [actualizandoEstado, setActualizandoEstado] = useState(null);
+  const [siguiente, setSiguiente] = useState(null);
+  const [cargandoMas, setCargandoMas] = useState(false);
+  const [municipiosUnicos, setMunicipiosUnicos] = useState([]);
+  const [epsUnicos, setEpsUnicos] = useState([]);
+
+  // Los filtros se aplican en el servidor: la tabla solo tiene cargadas algunas páginas
+  const paramsFiltros = () => {
+    const params = {};
+    if (filtroMunicipio) params.municipio = filtroMunicipio;
+    if (filtroEstado) params.estado = filtroEstado;
+    if (filtroEPS) params.eps = filtroEPS;
+    if (filtroZonaRural) params.zona_rural = filtroZonaRural === 'rural' ? 'true' : 'false';
+    if (busqueda.trim()) params.q = busqueda.trim();
+    return params;
+  };
+
+  // Los cambios del feed (SSE) se comparan con los filtros vigentes, no con los del montaje
+  const coincideRef = useRef(() => true);
+  coincideRef.current = (caso) => {
+    const texto = busqueda.trim().toLowerCase();
+    return (filtroMunicipio === '' || caso.municipio === filtroMunicipio) &&
+      (filtroEstado === '' || caso.estado === filtroEstado) &&
+      (filtroEPS === '' || caso.eps === filtroEPS) &&
+      (filtroZonaRural === '' || (filtroZonaRural === 'rural') === Boolean(caso.es_zona_rural)) &&
+      (texto === '' ||
+        caso.nombre?.toLowerCase().includes(texto) ||
+        caso.apellido?.toLowerCase().includes(texto) ||
+        caso.identificacion?.toString().includes(texto) ||
+        caso.telefono?.includes(texto));
+  };
+  const cargarRef = useRef(null);
+  // Solo se aplica la respuesta de la última petición (los filtros pueden cambiar en medio)
+  const ultimaPeticion = useRef(0);
+
+  // Cargar casos al montar el componente y mantenerlos al día con el feed de cambios (SSE)
+  useEffect(() => {
+    if (!window.EventSource) {
+      cargarRef.current();
+      return undefined;
+    }
+    
+    let cargado = false;
+    const cargarUnaVez = () => {
+      if (!cargado) {
+        cargado = true;
+        cargarRef.current();
+      }
+    };
+    
+    // El listado se pide después de suscribirse: ningún cambio queda entre medias.
+    // Al reconectar, EventSource envía Last-Event-ID y el servidor reenvía lo perdido.
+    let fuente = null;
+    let reintento = null;
+    const conectar = (nueva) => {
+      fuente = new EventSource(`${config.API_URL}/api/casos/cambios/stream`);
+      // Una conexión nueva no trae Last-Event-ID: el listado se recarga completo
+      fuente.addEventListener('inicio', nueva ? () => cargarRef.current() : cargarUnaVez);
+      fuente.addEventListener('cambio', (evento) => aplicarCambio(JSON.parse(evento.data)));
+      fuente.addEventListener('reinicio', () => cargarRef.current());
+      fuente.onerror = () => {
+        cargarUnaVez();
+        // Con 503 (servidor sin streams libres) EventSource no reintenta solo
+        if (fuente.readyState === EventSource.CLOSED) {
+          reintento = setTimeout(() => conectar(true), REINTENTO_STREAM_MS * (1 + Math.random()));
+        }
+      };
+    };
+    conectar(false);
+    
+    return () => {
+      clearTimeout(reintento);
+      fuente.close();
+    };
+  }, []);
 
-  // Cargar casos al montar el componente
+  // Opciones de municipio y EPS de todos los casos, no solo de las páginas cargadas
   useEffect(() => {
-    cargarCasos();
+    axios.get(`${config.API_URL}/api/estadisticas`)
+      .then((response) => {
+        setMunicipiosUnicos(Object.keys(response.data.por_municipio || {}).filter(m => m !== 'null').sort());
+        setEpsUnicos(Object.keys(response.data.por_eps || {}).filter(e => e !== 'null').sort());
+      })
+      .catch((error) => console.error('❌ Error al cargar opciones de filtros:', error));
   }, []);
 
+  // Recargar desde la primera página al cambiar un filtro (la búsqueda espera a que se deje de escribir)
+  const montado = useRef(false);
+  useEffect(() => {
+    if (!montado.current) {
+      montado.current = true;
+      return undefined;
+    }
+    const espera = setTimeout(() => cargarRef.current(), 300);
+    return () => clearTimeout(espera);
+  }, [filtroMunicipio, filtroEstado, filtroEPS, filtroZonaRural, busqueda]);
+
+  // Aplicar un alta, modificación o baja recibida del servidor
+  const aplicarCambio = (cambio) => {
+    setCasos(prev => {
+      const existe = prev.some(caso => caso.id === cambio.caso_id);
+      if (cambio.operacion === 'baja' || !cambio.caso || !coincideRef.current(cambio.caso)) {
+        return existe ? prev.filter(caso => caso.id !== cambio.caso_id) : prev;
+      }
+      if (existe) {
+        return prev.map(caso => caso.id === cambio.caso_id ? cambio.caso : caso);
+      }
+      // Altas arriba: el listado va de los más recientes a los más antiguos
+      return cambio.operacion === 'alta' ? [cambio.caso, ...prev] : prev;
+    });
+  };
+
   const cargarCasos = async () => {
+    const peticion = ++ultimaPeticion.current;
     setLoading(true);
     setError(null);
     
     try {
       console.log('🔍 Cargando casos desde:', `${config.API_URL}/api/casos`);
-      const response = await axios.get(`${config.API_URL}/api/casos`);
+      const response = await axios.get(`${config.API_URL}/api/casos`, { params: paramsFiltros() });
+      if (peticion !== ultimaPeticion.current) return;
       console.log('✅ Casos cargados:', response.data);
       setCasos(response.data.casos || []);
+      setSiguiente(response.data.siguiente || null);
     } catch (error) {
+      if (peticion !== ultimaPeticion.current) return;
       console.error('❌ Error al cargar casos:', error);
       setError('Error al cargar los casos. Verifica la conexión con el servidor.');
     } finally {
-      setLoading(false);
+      if (peticion === ultimaPeticion.current) setLoading(false);
+    }
+  };
+  cargarRef.current = cargarCasos;
+
+  // Cargar la siguiente página usando el cursor devuelto por el servidor
+  const cargarMas = async () => {
+    if (!siguiente) return;
+    const peticion = ultimaPeticion.current;
+    setCargandoMas(true);
+    
+    try {
+      const response = await axios.get(`${config.API_URL}/api/casos`, {
+        params: { ...paramsFiltros(), cursor: siguiente }
+      });
+      if (peticion !== ultimaPeticion.current) return;
+      setCasos(prev => [...prev, ...(response.data.casos || [])]);
+      setSiguiente(response.data.siguiente || null);
+    } catch (error) {
+      console.error('❌ Error al cargar más casos:', error);
+      setError('Error al cargar más casos. Verifica la conexión con el servidor.');
+    } finally {
+      setCargandoMas(false);
     }
   };
 
@@ -66,28 +200,6 @@ const CasosTable = () => {
     }
   };
 
-  // Filtrar casos según búsqueda
-  const casosFiltrados = casos.filter(caso => {
-    const matchMunicipio = filtroMunicipio === '' || caso.municipio === filtroMunicipio;
-    const matchEstado = filtroEstado === '' || caso.estado === filtroEstado;
-    const matchEPS = filtroEPS === '' || caso.eps === filtroEPS;
-    const matchZonaRural = filtroZonaRural === '' || 
-      (filtroZonaRural === 'rural' && caso.es_zona_rural) ||
-      (filtroZonaRural === 'urbana' && !caso.es_zona_rural);
-    
-    const matchBusqueda = busqueda === '' || 
-      caso.nombre?.toLowerCase().includes(busqueda.toLowerCase()) ||
-      caso.apellido?.toLowerCase().includes(busqueda.toLowerCase()) ||
-      caso.identificacion?.toString().includes(busqueda) ||
-      caso.telefono?.includes(busqueda);
-    
-    return matchMunicipio && matchEstado && matchEPS && matchZonaRural && matchBusqueda;
-  });
-
-  // Obtener listas únicas para filtros
-  const municipiosUnicos = [...new Set(casos.map(c => c.municipio).filter(Boolean))];
-  const epsUnicos = [...new Set(casos.map(c => c.eps).filter(Boolean))];
-
   // Función para obtener color del badge según enfermedad
   const getEnfermedadColor = (probabilidades) => {
     if (!probabilidades) return 'secondary';
@@ -210,8 +322,7 @@ const CasosTable = () => {
           <div>
             <h3>📊 Casos Registrados</h3>
             <p className="text-muted mb-0">
-              Total: <strong>{casos.length}</strong> casos | 
-              Mostrando: <strong>{casosFiltrados.length}</strong>
+              Mostrando: <strong>{casos.length}</strong>{siguiente ? '+' : ''} casos
             </p>
           </div>
           <Button variant="primary" onClick={cargarCasos} disabled={loading}>
@@ -327,11 +438,11 @@ const CasosTable = () => {
             <Spinner animation="border" variant="primary" />
             <p className="mt-3 text-muted">Cargando casos...</p>
           </div>
-        ) : casosFiltrados.length === 0 ? (
+        ) : casos.length === 0 ? (
           <Alert variant="info">
-            {casos.length === 0 
-              ? '📋 No hay casos registrados aún.'
-              : '🔍 No se encontraron casos con los filtros aplicados.'}
+            {(busqueda || filtroMunicipio || filtroEstado || filtroEPS || filtroZonaRural)
+              ? '🔍 No se encontraron casos con los filtros aplicados.'
+              : '📋 No hay casos registrados aún.'}
           </Alert>
         ) : (
           <div className="table-responsive">
@@ -350,11 +461,16 @@ const CasosTable = () => {
                 </tr>
               </thead>
               <tbody>
-                {casosFiltrados.map((caso) => (
+                {casos.map((caso) => (
                   <tr key={caso.id}>
                     <td className="text-center">
                       <strong className="text-primary">{caso.identificacion}</strong>
                       <div><small className="text-muted">ID: #{caso.id}</small></div>
+                      {caso.duplicado_de && (
+                        <Badge bg="danger" className="mt-1" title="Parece la misma persona que otro caso reciente">
+                          ⚠️ Posible duplicado de #{caso.duplicado_de}
+                        </Badge>
+                      )}
                     </td>
                     <td>
                       <strong>{caso.nombre}</strong> {caso.apellido}
@@ -424,6 +540,20 @@ const CasosTable = () => {
                 ))}
               </tbody>
             </Table>
+            {siguiente && (
+              <div className="text-center">
+                <Button variant="outline-primary" onClick={cargarMas} disabled={cargandoMas}>
+                  {cargandoMas ? (
+                    <>
+                      <Spinner animation="border" size="sm" className="me-2" />
+                      Cargando...
+                    </>
+                  ) : (
+                    '⬇️ Cargar más casos'
+                  )}
+                </Button>
+              </div>
+            )}
           </div>
         )}
 
@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import axios from 'axios';
 import { Button, Form, Card, Alert, Spinner, Collapse } from 'react-bootstrap';
 import config from '../config';
+import { encolarCaso } from '../sincronizacion';
 
 const SintomasForm = () => {
   const [sintomas, setSintomas] = useState([]);
@@ -162,13 +163,14 @@ const SintomasForm = () => {
 
     navigator.geolocation.getCurrentPosition(
       async (pos) => {
+        let datosEnviar = null;
         try {
           const lat = pos.coords.latitude;
           const lon = pos.coords.longitude;
           
           console.log('✅ Ubicación obtenida:', { lat, lon });
           
-          const datosEnviar = {
+          datosEnviar = {
             identificacion: datosPersonales.identificacion.trim(),
             nombre: datosPersonales.nombre.trim(),
             apellido: datosPersonales.apellido.trim() || null,
@@ -178,6 +180,7 @@ const SintomasForm = () => {
             eps: datosPersonales.eps || null,
             sintomas,
             probabilidades: resultado.probabilidades,
+            modelo_version: resultado.modelo_version,
             lat,
             lon,
             municipio: datosPersonales.municipio,
@@ -199,6 +202,9 @@ const SintomasForm = () => {
           
           console.log('✅ Respuesta exitosa del servidor:', response.data);
           alert(`✅ Caso registrado exitosamente\n\nIdentificación: ${datosPersonales.identificacion}\nNombre: ${datosPersonales.nombre}\n\nGracias por reportar tus síntomas.`);
+          if (response.data.posible_duplicado) {
+            alert(`⚠️ Este registro se parece al caso #${response.data.posible_duplicado.similar_a}; quedó marcado para revisión como posible duplicado.`);
+          }
           
           // Limpiar todo
           setMostrarFormulario(false);
@@ -224,6 +230,13 @@ const SintomasForm = () => {
           console.error('❌ ERROR COMPLETO:', error);
           console.error('📋 Error.response.data:', error.response?.data);
           
+          // Sin respuesta del servidor (sin conexión): se guarda y se sube al reconectar
+          if (!error.response && datosEnviar) {
+            encolarCaso(datosEnviar);
+            alert('📴 Sin conexión: el caso quedó guardado en este dispositivo y se enviará automáticamente al recuperar la conexión.');
+            return;
+          }
+          
           const mensajeError = error.response?.data?.error || error.message || 'Error desconocido';
           alert(`❌ Error al registrar el caso:\n\n${mensajeError}`);
         }
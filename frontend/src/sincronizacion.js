@@ -0,0 +1,92 @@
+import axios from 'axios';
+import config from './config';
+
+// Cola local de casos registrados sin conexión; se sube en un solo POST /api/sync
+const CLAVE_COLA = 'moskito_cola_casos';
+const CLAVE_DISPOSITIVO = 'moskito_dispositivo';
+const MAX_LOTE = 5000;
+
+const nuevaClave = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
+const leerCola = () => {
+  try {
+    return JSON.parse(localStorage.getItem(CLAVE_COLA)) || [];
+  } catch (e) {
+    return [];
+  }
+};
+
+const guardarCola = (cola) => localStorage.setItem(CLAVE_COLA, JSON.stringify(cola));
+
+const dispositivo = () => {
+  let id = localStorage.getItem(CLAVE_DISPOSITIVO);
+  if (!id) {
+    id = nuevaClave();
+    localStorage.setItem(CLAVE_DISPOSITIVO, id);
+  }
+  return id;
+};
+
+export const casosPendientes = () => leerCola().length;
+
+// La clave hace que reintentar el envío no duplique el caso
+export const encolarCaso = (datos) => {
+  const cola = leerCola();
+  cola.push({ ...datos, clave: nuevaClave(), capturado: new Date().toISOString() });
+  guardarCola(cola);
+};
+
+// gzip en el navegador cuando hay CompressionStream
+const comprimir = async (texto) => {
+  if (!window.CompressionStream) return null;
+  const stream = new Blob([texto]).stream().pipeThrough(new CompressionStream('gzip'));
+  return new Response(stream).arrayBuffer();
+};
+
+let enCurso = null;
+
+export const sincronizar = () => {
+  if (enCurso) return enCurso;
+  enCurso = (async () => {
+    const lote = leerCola().slice(0, MAX_LOTE);
+    if (lote.length === 0) return [];
+
+    const texto = JSON.stringify({ dispositivo: dispositivo(), casos: lote });
+    const comprimido = await comprimir(texto);
+    const headers = { 'Content-Type': 'application/json' };
+    if (comprimido) headers['Content-Encoding'] = 'gzip';
+
+    const response = await axios.post(`${config.API_URL}/api/sync`, comprimido || texto, { headers });
+    const { resultados } = response.data;
+
+    // Aceptado, conflicto y rechazado son definitivos: salen de la cola. 'reintentar' se queda
+    const procesadas = new Set(
+      resultados.filter((r) => r.estado !== 'reintentar').map((r) => r.clave).filter(Boolean)
+    );
+    guardarCola(leerCola().filter((caso) => !procesadas.has(caso.clave)));
+
+    resultados
+      .filter((r) => r.estado !== 'aceptado')
+      .forEach((r) => console.warn('⚠️ Caso no sincronizado:', r));
+    console.log(`🔄 Sincronizados ${procesadas.size} casos pendientes`);
+    return resultados;
+  })().finally(() => {
+    enCurso = null;
+  });
+  return enCurso;
+};
+
+export const iniciarSincronizacion = () => {
+  const intentar = () => {
+    if (navigator.onLine && casosPendientes() > 0) {
+      sincronizar().catch((error) => console.error('❌ Error al sincronizar:', error));
+    }
+  };
+  window.addEventListener('online', intentar);
+  setInterval(intentar, 5 * 60 * 1000);
+  intentar();
+};
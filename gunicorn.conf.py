@@ -0,0 +1,38 @@
+# Configuración de gunicorn para `gunicorn -c gunicorn.conf.py wsgi:app`.
+# Todos los valores se pueden ajustar por variables de entorno.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Workers: WEB_CONCURRENCY (convención de Render/Heroku) o 2 × CPU + 1
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Con más de un hilo por worker se usa gthread: las peticiones esperan sobre
+# todo a la base de datos, así que los hilos rinden más que más procesos.
+# Cada hilo puede tomar una conexión: mantener threads <= DB_POOL_SIZE + DB_MAX_OVERFLOW.
+#
+# Cada stream abierto de /api/casos/cambios/stream retiene un hilo (no una
+# conexión) mientras el tablero siga abierto. Por eso cada worker acepta como
+# mucho CAMBIOS_MAX_STREAMS streams (por defecto la mitad de GUNICORN_THREADS)
+# y al resto responde 503 con Retry-After (CAMBIOS_REINTENTO segundos); el
+# tablero recarga el listado y reintenta. Capacidad de streams del despliegue:
+# workers × CAMBIOS_MAX_STREAMS. Para más tableros:
+#   - subir GUNICORN_THREADS y CAMBIOS_MAX_STREAMS juntos, dejando hilos libres
+#     para la API (threads > CAMBIOS_MAX_STREAMS), o
+#   - servir /api/casos/cambios/stream desde otra instancia de gunicorn con
+#     muchos hilos (p. ej. GUNICORN_THREADS=100 CAMBIOS_MAX_STREAMS=95) detrás
+#     del mismo proxy, para que los streams no compitan con el resto de la API.
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Reciclar workers periódicamente limita el crecimiento de memoria
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-') or None
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
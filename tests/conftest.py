@@ -0,0 +1,26 @@
+"""App de pruebas sobre un SQLite temporal, compartida por toda la sesión"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+
+@pytest.fixture(scope='session')
+def app():
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'pruebas.db')
+    os.environ.setdefault('METRICAS', 'false')
+    from backend.app import create_app
+
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
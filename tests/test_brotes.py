@@ -0,0 +1,34 @@
+"""Marca de agua del detector de brotes."""
+from datetime import datetime
+
+from backend.app import db
+from backend.app.models import Caso
+from backend.app.utils.brotes import detectar_brotes
+from backend.app.utils.cambios import registrar_cambios
+
+
+def _insertar(ids):
+    for caso_id in ids:
+        db.session.add(Caso(
+            id=caso_id, identificacion=f'BROTE-{caso_id}', nombre='Prueba', edad=30,
+            sintomas=['fiebre'], probabilidades={'dengue': 90}, lat=3.8801, lon=-77.0312,
+            timestamp=datetime.utcnow()
+        ))
+    db.session.flush()
+    registrar_cambios(ids, 'alta')
+    db.session.commit()
+
+
+def test_caso_confirmado_tarde_con_id_menor_se_procesa(app):
+    with app.app_context():
+        detectar_brotes(reiniciar=True)
+        _insertar([900000])
+        assert detectar_brotes()['casos_nuevos'] == 1
+
+        # Ids asignados antes que el último visto pero confirmados después
+        _insertar(list(range(800001, 800007)))
+        resumen = detectar_brotes()
+
+        assert resumen['casos_nuevos'] == 6
+        assert resumen['brotes_creados'] + resumen['brotes_actualizados'] == 1
+        assert detectar_brotes()['casos_nuevos'] == 0
@@ -0,0 +1,18 @@
+"""Tope de streams SSE por worker."""
+
+
+def test_stream_por_encima_del_tope_es_503(app, cliente, monkeypatch):
+    monkeypatch.setitem(app.config, 'CAMBIOS_MAX_STREAMS', 1)
+
+    abierto = cliente.get('/api/casos/cambios/stream', buffered=False)
+    assert abierto.status_code == 200
+
+    rechazado = cliente.get('/api/casos/cambios/stream', buffered=False)
+    assert rechazado.status_code == 503
+    assert rechazado.headers['Retry-After'] == str(app.config['CAMBIOS_REINTENTO'])
+    assert rechazado.get_data().startswith(b'retry: ')
+
+    abierto.close()
+    otro = cliente.get('/api/casos/cambios/stream', buffered=False)
+    assert otro.status_code == 200
+    otro.close()
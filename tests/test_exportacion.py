@@ -0,0 +1,34 @@
+"""Probabilidades no numéricas en el registro y en la exportación Parquet."""
+import io
+from datetime import datetime
+
+import pytest
+
+from backend.app import db
+from backend.app.models import Caso
+
+
+@pytest.mark.parametrize('probabilidades', [{'dengue': 'abc'}, {'dengue': True}, {'malaria': None}])
+def test_probabilidad_no_numerica_es_400(cliente, probabilidades):
+    respuesta = cliente.post('/api/casos', json={
+        'identificacion': 'EXP-400', 'nombre': 'Prueba', 'edad': 30, 'lat': 3.88, 'lon': -77.03,
+        'sintomas': ['fiebre'], 'probabilidades': probabilidades
+    })
+    assert respuesta.status_code == 400
+
+
+def test_parquet_con_probabilidades_previas_a_la_validacion(app, cliente):
+    pq = pytest.importorskip('pyarrow.parquet')
+    with app.app_context():
+        db.session.add(Caso(
+            identificacion='EXP-PARQUET', nombre='Prueba', edad=30, sintomas=['fiebre'],
+            probabilidades={'dengue': 'abc', 'malaria': 12.5}, lat=3.88, lon=-77.03,
+            timestamp=datetime.utcnow()
+        ))
+        db.session.commit()
+
+    respuesta = cliente.get('/api/casos/export', query_string={'formato': 'parquet', 'q': 'EXP-PARQUET'})
+
+    assert respuesta.status_code == 200
+    tabla = pq.read_table(io.BytesIO(respuesta.get_data())).to_pylist()
+    assert [(f['prob_dengue'], f['prob_malaria']) for f in tabla] == [(None, 12.5)]
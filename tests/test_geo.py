@@ -0,0 +1,34 @@
+"""Coordenadas no finitas en celdas y búsquedas por cercanía."""
+import pytest
+
+from backend.app.utils.geo import celda_geo, parsear_cercania
+
+
+@pytest.mark.parametrize('lat, lon', [
+    (float('nan'), -77.0), (3.9, float('inf')), (90.5, 0.0), (0.0, -181.0),
+])
+def test_celda_de_coordenada_invalida_es_none(lat, lon):
+    assert celda_geo(lat, lon) is None
+
+
+@pytest.mark.parametrize('near, radio', [
+    ('3.9,-77.0', 'inf'), ('3.9,-77.0', 'nan'), ('nan,-77.0', '1'), ('3.9,-77.0', '-1'),
+])
+def test_cercania_no_finita_se_rechaza(near, radio):
+    with pytest.raises(ValueError):
+        parsear_cercania(near, radio)
+
+
+@pytest.mark.parametrize('cuerpo', [
+    '{"identificacion": "GEO-1", "nombre": "A", "edad": 30, "lat": NaN, "lon": -77.0, "sintomas": ["fiebre"]}',
+    '{"identificacion": "GEO-2", "nombre": "A", "edad": 30, "lat": 3.9, "lon": Infinity, "sintomas": ["fiebre"]}',
+])
+def test_registrar_caso_no_finito_es_400(cliente, cuerpo):
+    respuesta = cliente.post('/api/casos', data=cuerpo, content_type='application/json')
+    assert respuesta.status_code == 400
+    assert 'INSERT' not in respuesta.get_data(as_text=True)
+
+
+def test_casos_cerca_con_radio_infinito_es_400(cliente):
+    respuesta = cliente.get('/api/casos', query_string={'near': '3.9,-77.0', 'radius_km': 'inf'})
+    assert respuesta.status_code == 400
@@ -0,0 +1,90 @@
+"""Escrituras de otro worker: las cachés de este proceso las ven por el registro de cambios."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import db
+from backend.app.models import Caso
+from backend.app.utils import invalidacion
+from backend.app.utils.cambios import registrar_cambios
+
+
+@pytest.fixture
+def sin_espera(monkeypatch):
+    monkeypatch.setattr(invalidacion, 'CACHES_SONDEO', 0)
+    monkeypatch.setattr(invalidacion, '_proxima_revision', 0.0)
+
+
+def _escritura_de_otro_worker(app, identificacion, timestamp):
+    # Sin pasar por las rutas: nada de este proceso se invalida al escribir
+    with app.app_context():
+        caso = Caso(
+            identificacion=identificacion, nombre='Prueba', edad=30, sintomas=['fiebre'],
+            lat=3.8801, lon=-77.0312, municipio='Invalidacion', timestamp=timestamp
+        )
+        db.session.add(caso)
+        db.session.flush()
+        registrar_cambios([caso.id], 'alta')
+        db.session.commit()
+
+
+def test_series_ven_un_alta_con_fecha_pasada(app, cliente, sin_espera):
+    consulta = {'granularidad': 'dia', 'municipio': 'Invalidacion',
+                'desde': (datetime.utcnow() - timedelta(days=5)).date().isoformat()}
+    antes = cliente.get('/api/series', query_string=consulta).get_json()['total']
+
+    _escritura_de_otro_worker(app, 'INV-SERIE', datetime.utcnow() - timedelta(days=3))
+
+    assert cliente.get('/api/series', query_string=consulta).get_json()['total'] == antes + 1
+
+
+def test_estadisticas_cambian_de_etag_con_la_escritura_de_otro_worker(app, cliente):
+    primera = cliente.get('/api/estadisticas')
+    assert cliente.get('/api/estadisticas', headers={'If-None-Match': primera.headers['ETag']}).status_code == 304
+
+    with app.app_context():
+        from backend.app.utils.resumen import registrar_lote_en_resumen
+        caso = Caso(
+            identificacion='INV-ESTADISTICAS', nombre='Prueba', edad=30, sintomas=['fiebre'],
+            lat=3.8801, lon=-77.0312, municipio='Invalidacion', timestamp=datetime.utcnow()
+        )
+        db.session.add(caso)
+        db.session.flush()
+        registrar_lote_en_resumen([caso])
+        registrar_cambios([caso.id], 'alta')
+        db.session.commit()
+
+    segunda = cliente.get('/api/estadisticas', headers={'If-None-Match': primera.headers['ETag']})
+    assert segunda.status_code == 200
+    assert segunda.get_json()['total_casos'] == primera.get_json()['total_casos'] + 1
+
+
+def _tesela(cliente, lat, lon, z=16):
+    from backend.app.utils.mapa import tesela_de
+    x, y = tesela_de(lat, lon, z)
+    return cliente.get(f'/api/mapa/tiles/{z}/{x}/{y}').get_json()
+
+
+def test_teselas_ven_altas_y_modificaciones_de_otro_worker(app, cliente, sin_espera):
+    lat, lon = 3.95, -76.95
+    antes = _tesela(cliente, lat, lon)['total']
+
+    with app.app_context():
+        caso = Caso(
+            identificacion='INV-TESELA', nombre='Prueba', edad=30, sintomas=['fiebre'],
+            probabilidades={'dengue': 80}, lat=lat, lon=lon, timestamp=datetime.utcnow()
+        )
+        db.session.add(caso)
+        db.session.flush()
+        registrar_cambios([caso.id], 'alta')
+        db.session.commit()
+        caso_id = caso.id
+    assert _tesela(cliente, lat, lon)['total'] == antes + 1
+
+    # Re-escoring en el proceso de trabajos: cambia la enfermedad principal
+    with app.app_context():
+        db.session.execute(db.update(Caso).where(Caso.id == caso_id).values(enfermedad_principal='malaria'))
+        registrar_cambios([caso_id], 'modificacion')
+        db.session.commit()
+    por_enfermedad = _tesela(cliente, lat, lon)['clusters'][0]['por_enfermedad']
+    assert por_enfermedad.get('malaria') == 1
@@ -0,0 +1,28 @@
+"""POST /api/casos/lote: una fila inválida se rechaza sola y el resto entra."""
+
+
+def _fila(identificacion, lat='3.88', lon='-77.03'):
+    return (
+        f'{{"identificacion": "{identificacion}", "nombre": "Prueba", "edad": 30, '
+        f'"lat": {lat}, "lon": {lon}, "sintomas": ["fiebre"]}}'
+    )
+
+
+def test_coordenadas_no_finitas_o_fuera_de_rango(cliente):
+    # JSON crudo: Infinity y NaN los acepta el parser de Flask pero no son coordenadas
+    cuerpo = '[' + ', '.join([
+        _fila('LOTE-001'),
+        _fila('LOTE-002', lat='Infinity'),
+        _fila('LOTE-003', lon='NaN'),
+        _fila('LOTE-004', lat='91'),
+        _fila('LOTE-005', lon='-180.5'),
+        _fila('LOTE-006'),
+    ]) + ']'
+
+    respuesta = cliente.post('/api/casos/lote', data=cuerpo, content_type='application/json')
+
+    assert respuesta.status_code == 200, respuesta.get_json()
+    datos = respuesta.get_json()
+    estados = [r['estado'] for r in datos['resultados']]
+    assert estados == ['aceptado', 'rechazado', 'rechazado', 'rechazado', 'rechazado', 'aceptado']
+    assert datos['aceptados'] == 2
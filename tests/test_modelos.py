@@ -0,0 +1,27 @@
+"""Re-escoring: cada lote queda en el registro de cambios."""
+from datetime import datetime
+
+from backend.app import db
+from backend.app.models import CambioCaso, Caso
+from backend.app.utils.cambios import ultimo_cambio
+from backend.app.utils.modelos import reescorar_casos
+
+
+def test_reescorar_registra_modificaciones(app):
+    with app.app_context():
+        db.session.add_all([
+            Caso(identificacion=f'REESCORAR-{i}', nombre='Prueba', edad=30, sintomas=['fiebre'],
+                 modelo_version='anterior', lat=3.88, lon=-77.03, timestamp=datetime.utcnow())
+            for i in range(3)
+        ])
+        db.session.commit()
+        posicion = ultimo_cambio()
+
+        total = reescorar_casos(lote=2)
+
+        modificados = db.session.execute(
+            db.select(CambioCaso.caso_id).where(CambioCaso.id > posicion, CambioCaso.operacion == 'modificacion')
+        ).scalars().all()
+        assert total >= 3
+        assert len(modificados) == total
+        assert len(set(modificados)) == total
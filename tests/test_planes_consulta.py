@@ -0,0 +1,44 @@
+"""Planes de GET /api/casos sobre una tabla pequeña: índice y orden sin sort.
+
+La corrida con volumen y presupuesto de latencia sigue en benchmarks/planes_consulta.py.
+"""
+import pytest
+from sqlalchemy import event
+
+from planes_consulta import CONSULTAS, explicar, sembrar
+
+CASOS = 3000
+
+
+@pytest.fixture(scope='module')
+def sembrada(app):
+    from backend.app import db
+    from backend.app.models import Caso
+
+    with app.app_context():
+        db.session.execute(db.delete(Caso))
+        sembrar(db, Caso, CASOS)
+    return app
+
+
+@pytest.mark.parametrize('nombre, filtros, sort_permitido', CONSULTAS, ids=[c[0] for c in CONSULTAS])
+def test_plan_usa_indice(sembrada, nombre, filtros, sort_permitido):
+    from backend.app import db
+
+    capturadas = []
+
+    def capturar(conn, cursor, sql, parametros, contexto, executemany):
+        if 'FROM casos' in sql:
+            capturadas.append((sql, parametros))
+
+    with sembrada.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capturar)
+        try:
+            respuesta = sembrada.test_client().get('/api/casos', query_string=dict(filtros, limit=100))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capturar)
+        assert respuesta.status_code == 200
+
+        usa_indice, tiene_sort, plan = explicar(db, *capturadas[-1])
+    assert usa_indice, plan
+    assert sort_permitido or not tiene_sort, plan
@@ -0,0 +1,13 @@
+"""POST /api/sync: validación del cuerpo."""
+import pytest
+
+
+@pytest.mark.parametrize('municipio', [['Buenaventura'], 5, {'nombre': 'Buenaventura'}])
+def test_municipio_que_no_es_texto_es_400(cliente, municipio):
+    respuesta = cliente.post('/api/sync', json={'dispositivo': 'prueba', 'municipio': municipio})
+    assert respuesta.status_code == 400
+
+
+def test_municipio_texto(cliente):
+    respuesta = cliente.post('/api/sync', json={'dispositivo': 'prueba', 'municipio': 'Buenaventura'})
+    assert respuesta.status_code == 200
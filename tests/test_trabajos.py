@@ -0,0 +1,45 @@
+"""Cola de trabajos: encolado por la API y trabajos abandonados."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import db
+from backend.app.models import Trabajo
+from backend.app.utils.trabajos import TIEMPO_SIN_LATIDO, _recuperar_abandonados
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {'tipo': 'detectar_brotes', 'parametros': {'reiniciar': True}},
+    {'tipo': 'reescorar', 'parametros': {'lote': 10 ** 9}},
+    {'tipo': 'reescorar', 'parametros': {'lote': '5000'}},
+    {'tipo': 'no_existe'},
+    ['detectar_brotes'],
+])
+def test_encolar_por_api_rechaza_tipos_y_parametros_no_admitidos(cliente, cuerpo):
+    assert cliente.post('/api/trabajos', json=cuerpo).status_code == 400
+
+
+def test_encolar_por_api(cliente):
+    respuesta = cliente.post('/api/trabajos', json={'tipo': 'reescorar', 'parametros': {'lote': 1000}})
+    assert respuesta.status_code == 202
+
+
+def test_abandonado_en_su_ultimo_intento_queda_fallido(app):
+    with app.app_context():
+        latido = datetime.utcnow() - TIEMPO_SIN_LATIDO - timedelta(minutes=1)
+        ultimo = Trabajo(tipo='detectar_brotes', parametros={}, estado='en_curso',
+                         intentos=3, max_intentos=3, latido=latido, worker='caido:1')
+        otro = Trabajo(tipo='detectar_brotes', parametros={}, estado='en_curso',
+                       intentos=1, max_intentos=3, latido=latido, worker='caido:1')
+        db.session.add_all([ultimo, otro])
+        db.session.commit()
+
+        _recuperar_abandonados()
+
+        db.session.refresh(ultimo)
+        db.session.refresh(otro)
+        assert (ultimo.estado, ultimo.worker) == ('fallido', None)
+        assert ultimo.terminado is not None
+        assert otro.estado == 'pendiente'
+        db.session.execute(db.delete(Trabajo).where(Trabajo.id.in_([ultimo.id, otro.id])))
+        db.session.commit()
@@ -0,0 +1,20 @@
+"""Punto de entrada WSGI para producción.
+
+    flask --app wsgi crear-tablas          # una vez por despliegue
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+crear-tablas es obligatorio antes de arrancar una versión nueva: agrega a casos
+las columnas que el modelo lee en toda consulta (modelo_version, celda, ...).
+En una base existente, completar después los valores con calcular-celdas,
+calcular-enfermedad-principal y calcular-claves-foneticas.
+"""
+import os
+from dotenv import load_dotenv
+
+# En producción las variables suelen venir del entorno; .env es opcional
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+from backend.app import create_app
+
+# Sin db.create_all(): el esquema no se toca en el arranque de cada worker
+app = create_app(crear_tablas=False)